@@ -0,0 +1,226 @@
+"""
+Бенчмарки пайплайна на синтетических данных в формате выгрузки ProThermDB.
+
+Сеть не нужна: add_sequences получает фейковый транспорт, который отвечает
+FASTA для пачек UniProt / RCSB (с задержкой --latency на запрос).
+
+    python benchmarks.py run --rows 10000,100000 --out baseline.json
+    python benchmarks.py compare baseline.json current.json --threshold 0.25
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import re
+import sys
+import time
+from urllib.parse import unquote
+
+import pandas as pd
+
+from src.cleaning.data_clean import data_clean
+from src.mutations.mutation_add import apply_mutations
+from src.sequences.add_sequences import add_sequences
+from src.sequences.fetcher import Response
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+ALNUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+class FakeTransport:
+    """
+    Отвечает на пачки UniProt и RCSB из словаря последовательностей
+    """
+
+    def __init__(self, uniprot: dict[str, str], pdb: dict[str, str], latency: float = 0.0):
+        self.uniprot = uniprot
+        self.pdb = pdb
+        self.latency = latency
+        self.requests = 0
+
+    async def get(self, url: str, timeout: float) -> Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if "rest.uniprot.org" in url:
+            ids = re.findall(r"accession:(\w+)", unquote(url))
+            if not ids:
+                ids = [url.rsplit("/", 1)[-1].removesuffix(".fasta")]
+            text = "".join(f">sp|{a}|BENCH\n{self.uniprot[a]}\n" for a in ids if a in self.uniprot)
+        else:
+            ids = url.rsplit("/", 1)[-1].split(",")
+            text = "".join(f">{p}_1|Chain A|BENCH\n{self.pdb[p]}\n" for p in ids if p in self.pdb)
+        return Response(200, text)
+
+
+def synthetic_frame(rows: int, proteins: int = 500, seed: int = 0):
+    """
+    Таблица в формате выгрузки ProThermDB и последовательности для транспорта.
+
+    Около 10% строк — дубликаты, 5% — дикий тип, 5% — неверный исходный
+    остаток, 3% — неразбираемая мутация; пропуски записаны как '-'.
+    """
+    rng = random.Random(seed)
+    uniprot, pdb = {}, {}
+    ids = []
+    for _ in range(proteins):
+        accession = f"P{rng.randrange(10)}{''.join(rng.choices(ALNUM, k=3))}{rng.randrange(10)}"
+        pdb_id = f"{rng.randrange(1, 10)}{''.join(rng.choices(ALNUM, k=3))}"
+        sequence = "".join(rng.choices(AMINO_ACIDS, k=rng.randrange(100, 500)))
+        uniprot[accession] = pdb[pdb_id] = sequence
+        ids.append((accession, pdb_id, sequence))
+
+    records = []
+    for _ in range(rows):
+        if records and rng.random() < 0.1:
+            records.append(dict(rng.choice(records)))
+            continue
+        accession, pdb_id, sequence = rng.choice(ids)
+        roll = rng.random()
+        if roll < 0.05:
+            mutation = "wild-type"
+        elif roll < 0.08:
+            mutation = "?"
+        else:
+            parts = []
+            for pos in rng.sample(range(1, len(sequence) + 1), rng.randrange(1, 4)):
+                wt = sequence[pos - 1]
+                if roll > 0.95:
+                    wt = "W" if wt != "W" else "A"
+                parts.append(f"{wt}{pos}{rng.choice(AMINO_ACIDS)}")
+            mutation = ", ".join(parts)
+        records.append({
+            "PROTEIN": f"Protein {accession}",
+            "ORGANISM": rng.choice(["Bacillus licheniformis", "Escherichia coli", "Homo sapiens"]),
+            "UniProt_ID": accession,
+            "PDB_wild": pdb_id,
+            "MUTATION": mutation,
+            "PDB_Chain_Mutation": "-" if rng.random() < 0.3 else mutation,
+            "pH": f"{rng.uniform(4, 9):.1f}",
+            "Tm_(C)": "-" if rng.random() < 0.5 else f"{rng.uniform(30, 90):.1f}",
+            "ddG_(kcal/mol)": "-" if rng.random() < 0.4 else f"{rng.uniform(-5, 5):.2f}",
+        })
+    return pd.DataFrame.from_records(records), uniprot, pdb
+
+
+def bench_rows(rows: int, repeat: int = 3, latency: float = 0.0, seed: int = 0) -> dict:
+    """
+    Лучшее время каждого этапа (<этап>_s) и строк в секунду (<этап>_rows_per_s)
+    """
+    raw, uniprot, pdb = synthetic_frame(rows, seed=seed)
+    stages = {
+        "data_clean": lambda df: data_clean(df),
+        "add_sequences": lambda df: add_sequences(
+            df, transport=FakeTransport(uniprot, pdb, latency), use_cache=False,
+            requests_per_second=1e6,
+        ),
+        "apply_mutations": lambda df: apply_mutations(df),
+    }
+    results = {}
+    df = raw
+    for name, stage in stages.items():
+        best = float("inf")
+        for _ in range(repeat):
+            frame = df.copy()
+            # этапы печатают прогресс — в бенчмарке он не нужен
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                out = stage(frame)
+                best = min(best, time.perf_counter() - start)
+        results[f"{name}_s"] = best
+        results[f"{name}_rows_per_s"] = len(df) / best
+        df = out
+    results["failed_mutations"] = int(df["mutation_reason"].notna().sum())
+    return results
+
+
+def run(sizes, repeat: int = 3, latency: float = 0.0, seed: int = 0) -> dict:
+    results = {}
+    for rows in sizes:
+        for metric, value in bench_rows(rows, repeat, latency, seed).items():
+            key = f"{rows}/{metric}"
+            results[key] = value
+            print(f"{key:<40} {value:14.4f}")
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "latency": latency,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25,
+            min_seconds: float = 1e-3) -> list[str]:
+    """
+    Ключи *_s, время которых выросло больше чем на threshold (строки в
+    секунду выводятся из них же и не сравниваются). Замеры короче
+    min_seconds слишком шумные и пропускаются.
+    """
+    regressions = []
+    old, new = baseline["results"], current["results"]
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        if key.endswith("_rows_per_s"):
+            continue
+        if key.endswith("_s"):
+            if max(before, after) < min_seconds:
+                continue
+            ratio = after / before if before else float("inf")
+        else:
+            # не время, а результат (например, число неудачных мутаций)
+            if before != after:
+                print(f"{key:<40} {before} -> {after}  РЕЗУЛЬТАТ ИЗМЕНИЛСЯ")
+            continue
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  РЕГРЕССИЯ"
+        print(f"{key:<40} {before:14.6g} -> {after:14.6g}  x{ratio:5.2f}{flag}")
+    for key in sorted(old.keys() - new.keys()):
+        print(f"{key:<40} нет в текущем запуске")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки пайплайна ProThermDB")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="замерить этапы и записать JSON")
+    run_cmd.add_argument("--rows", default="10000,100000")
+    run_cmd.add_argument("--repeat", type=int, default=3)
+    run_cmd.add_argument("--latency", type=float, default=0.0,
+                         help="задержка фейкового сервера на запрос, с")
+    run_cmd.add_argument("--seed", type=int, default=0)
+    run_cmd.add_argument("--out", help="файл для результатов")
+    cmp = commands.add_parser("compare", help="сравнить два JSON и найти регрессии")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run([int(n) for n in args.rows.split(",")], args.repeat, args.latency, args.seed)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    print(f"Регрессий: {len(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
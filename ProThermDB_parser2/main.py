@@ -1,13 +1,46 @@
 # scripts/run_parser.py
+import argparse
+from pathlib import Path
+
 import pandas as pd
-from src.parser.parser_protherm import pars_data
+from src.parser.parser_protherm import download_data
+from src.parser.protherm_http import ProThermDownloader, Query, read_queries
 from src.cleaning.data_clean import data_clean
 from src.sequences.add_sequences import add_sequences
+from src.utils.checkpoint import StageCache, file_hash
+from src.utils.metrics import METRICS, setup_from_env
 from src.utils.paths import RAW_DATA_DIR, FINAL_DATA_DIR
 from src.mutations.mutation_add import apply_mutations
 
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Пайплайн ProThermDB")
+    parser.add_argument("--stream", action="store_true",
+                        help="потоковая обработка TSV по частям с записью в Parquet/Feather")
+    parser.add_argument("--input", default=None,
+                        help="готовый TSV вместо скачивания")
+    parser.add_argument("--format", choices=["parquet", "feather"], default="parquet")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--query", action="append", default=[],
+                        help='запрос "организм;белок" (можно повторять)')
+    parser.add_argument("--queries", default=None,
+                        help="файл с запросами, по одному \"организм;белок\" в строке")
+    parser.add_argument("--experimental-http", action="store_true",
+                        help="экспериментально: скачивать по HTTP без браузера; адрес выгрузки "
+                             "и её параметры не сверены с сайтом")
+    parser.add_argument("--parallel", type=int, default=4,
+                        help="сколько запросов к ProThermDB выполнять одновременно "
+                             "(с --experimental-http)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="не брать результаты этапов из кэша (data/cache/stages)")
+    parser.add_argument("--metrics", default=None,
+                        help="записать метрики запуска в JSON")
+    parser.add_argument("--trace", default=None,
+                        help="записать Chrome trace (chrome://tracing, Perfetto)")
+    return parser.parse_args()
+
+
+def ask_query():
     while True:
         print("Введите")
         org_name = input("Название организма или None (пример - Bacillus licheniformis): ")
@@ -16,45 +49,172 @@ def main():
             break
         else:
             print('Нужно ввести хотя бы одно значение!')
+    return org_name, prot_name
 
-    # 1. Парсинг данных
-    print("Парсинг данных из ProThermDB...")
-    df_raw = pars_data(org_name=org_name, prot_name=prot_name)  # ваша текущая функция
-    raw_path = RAW_DATA_DIR
-    print(f"Сырые данные сохранены: {raw_path}")
 
+def path_exists(path):
+    return path is not None and Path(path).exists()
+
+
+def download_with_browser(pairs, stages):
+    """
+    Скачивает запросы (организм, белок) по одному через Selenium; пути к TSV
+    для запросов, где есть данные. Уже скачанные выгрузки берутся из кэша этапов.
+    """
+    paths = []
+    for org_name, prot_name in pairs:
+        tsv_path, _ = stages.run(
+            "download", "", {"organism": org_name, "protein": prot_name, "browser": True},
+            lambda: download_data(org_name=org_name, prot_name=prot_name),
+            path_exists,
+        )
+        if tsv_path is not None:
+            paths.append(tsv_path)
+    return paths
+
+
+def download_queries(queries, parallel, stages):
+    """
+    Экспериментально: скачивает все запросы параллельно по HTTP; пути к TSV
+    для запросов, где есть данные. Уже скачанные выгрузки берутся из кэша этапов.
+    """
+    keys = {q: stages.key("download", "", {"organism": q.organism, "protein": q.protein})
+            for q in queries}
+    paths = {q: stages.load("download", keys[q], path_exists) for q in queries}
+    missing = [q for q, path in paths.items() if path is None]
+    print(f"Запросов: {len(paths)}, уже скачано: {len(paths) - len(missing)}")
+
+    if missing:
+        print(f"Скачивание {len(missing)} запросов из ProThermDB...")
+        downloader = ProThermDownloader(concurrency=parallel)
+        try:
+            with METRICS.stage("download"):
+                downloaded = downloader.download_all(missing)
+        finally:
+            downloader.close()
+        for query, path in downloaded.items():
+            stages.store("download", keys[query], path)
+            paths[query] = path
+    return [path for path in paths.values() if path is not None]
+
+
+def run_stream(tsv_path, args, stages, suffix=""):
+    from src.pipeline.stream import run_streaming
+
+    extension = "parquet" if args.format == "parquet" else "feather"
+    out_path = FINAL_DATA_DIR / f"protherm_with_mutation{suffix}.{extension}"
+    params = {"format": args.format, "out": str(out_path)}
+
+    def stream():
+        run_streaming(
+            tsv_path,
+            out_path,
+            fmt=args.format,
+            chunksize=args.chunksize,
+            concurrency=8,
+            requests_per_second=5.0,
+        )
+        return str(out_path)
+
+    stages.run("stream", file_hash(tsv_path), params, stream, path_exists)
+
+
+def clean(tsv_path):
+    with METRICS.stage("read"):
+        df = pd.read_csv(tsv_path, sep='\t')
+    with METRICS.stage("clean", rows=len(df)):
+        return data_clean(df)
+
+
+def run_in_memory(tsv_path, stages, suffix=""):
     # удаление дубликатов и замена пропусков
-    df_raw = data_clean(df_raw)
+    df_raw, key = stages.run(
+        "clean", file_hash(tsv_path), {},
+        lambda: clean(tsv_path),
+    )
 
     # 2. Добавление последовательностей
     print("\nДобавление последовательностей...")
-    df_with_seq = add_sequences(
-        df_raw,
-        pdb_mutation_col="PDB_Chain_Mutation",
-        pdb_col="PDB_wild",
-        uniprot_col="UniProt_ID",
-        seq_col="sequence",
-        sleep_time=0.5
+    df_with_seq, key = stages.run(
+        "sequences", key, {},
+        lambda: add_sequences(
+            df_raw,
+            pdb_mutation_col="PDB_Chain_Mutation",
+            pdb_col="PDB_wild",
+            uniprot_col="UniProt_ID",
+            seq_col="sequence",
+            concurrency=8,
+            requests_per_second=5.0,
+        ),
+        # с ключами, не загруженными из-за сбоев сети, этап не кэшируется
+        lambda df: not df.attrs.get("failed_keys"),
     )
 
     # Сохраняем обогащённые данные
-    enriched_path = RAW_DATA_DIR / "protherm_with_sequences.csv"
+    enriched_path = RAW_DATA_DIR / f"protherm_with_sequences{suffix}.csv"
 
     df_with_seq.to_csv(enriched_path, index=False)
     print(f"Данные с последовательностями сохранены: {enriched_path}")
 
-    df_with_mut = apply_mutations(
-        df_with_seq,
-        seq_col="sequence",
-        uni_mut_col="MUTATION",
-        pdb_mut_col="PDB_Chain_Mutation"
+    df_with_mut, key = stages.run(
+        "mutations", key, {},
+        lambda: apply_mutations(
+            df_with_seq,
+            seq_col="sequence",
+            uni_mut_col="MUTATION",
+            pdb_mut_col="PDB_Chain_Mutation"
+        ),
     )
 
     # Сохраняем обогащённые данные
-    enriched_path = FINAL_DATA_DIR / "protherm_with_mutation.csv"
+    enriched_path = FINAL_DATA_DIR / f"protherm_with_mutation{suffix}.csv"
     df_with_mut.to_csv(enriched_path, index=False)
     print(f"Данные с мутациями сохранены: {enriched_path}")
 
 
+def main():
+    args = parse_args()
+    setup_from_env()
+    stages = StageCache(enabled=not args.no_cache)
+
+    # 1. Парсинг данных
+    queries = [Query.parse(q) for q in args.query]
+    if args.queries:
+        queries += read_queries(args.queries)
+
+    if args.input:
+        tsv_paths = [args.input]
+    elif queries:
+        if args.experimental_http:
+            tsv_paths = download_queries(queries, args.parallel, stages)
+        else:
+            tsv_paths = download_with_browser(
+                [(q.organism or "", q.protein or "") for q in queries], stages)
+    else:
+        org_name, prot_name = ask_query()
+        print("Парсинг данных из ProThermDB...")
+        if args.experimental_http:
+            tsv_paths = download_queries([Query.parse(f"{org_name};{prot_name}")], args.parallel, stages)
+        else:
+            tsv_paths = download_with_browser([(org_name, prot_name)], stages)
+        print(f"Сырые данные сохранены: {RAW_DATA_DIR}")
+
+    # при нескольких запросах результаты каждого пишутся в свои файлы
+    for tsv_path in tsv_paths:
+        suffix = f"_{Path(tsv_path).stem}" if len(tsv_paths) > 1 else ""
+        if args.stream:
+            run_stream(tsv_path, args, stages, suffix)
+        else:
+            run_in_memory(tsv_path, stages, suffix)
+
+    if args.metrics:
+        METRICS.write_json(args.metrics)
+    if args.trace:
+        METRICS.write_chrome_trace(args.trace)
+    hit_rate = METRICS.report()["cache_hit_rate"]
+    if hit_rate is not None:
+        print(f"Доля попаданий в кэш последовательностей: {hit_rate:.0%}")
+
+
 if __name__ == "__main__":
     main()
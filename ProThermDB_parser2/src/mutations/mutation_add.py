@@ -1,17 +1,48 @@
-import re
+import numpy as np
 import pandas as pd
 
+from src.utils.metrics import METRICS
+
+# как и раньше: буква, позиция, буква в начале каждой мутации
+MUTATION_PATTERN = r"^([A-Za-z])(\d+)([A-Za-z])"
+WILD_TYPE_MARKS = ["wild-type", "none", "", "nan"]
+
+# значения колонки с причиной, по которой мутацию не удалось применить
+NO_SEQUENCE = "no_sequence"
+BAD_FORMAT = "bad_format"
+OUT_OF_RANGE = "out_of_range"
+WT_MISMATCH = "wt_mismatch"
+_REASONS = np.array([None, BAD_FORMAT, OUT_OF_RANGE, WT_MISMATCH], dtype=object)
+
+
+@METRICS.timed("apply_mutations")
 def apply_mutations(
         df,
         seq_col="sequence",
         uni_mut_col="MUTATION",
-        pdb_mut_col="PDB_Chain_Mutation"
+        pdb_mut_col="PDB_Chain_Mutation",
+        reason_col="mutation_reason",
+        source=None,
 ):
-
-    if df[pdb_mut_col].isna().any():
-        source = "UniProt"
-    else:
-        source = "PDB"
+    """
+    Строит колонку mutation_seq: последовательность с применёнными мутациями
+    ("A12G, K45R"), и колонку reason_col с причиной неудачи (None — успех).
+
+    Всё, кроме самой замены букв, векторизовано:
+    - строки мутаций разбираются в таблицу (строка, wt, позиция, mut);
+    - позиции и исходные остатки проверяются сразу для всей таблицы
+      по общему буферу уникальных исходных последовательностей;
+    - замены делаются в bytearray, один раз на каждую уникальную пару
+      (исходная последовательность, набор мутаций).
+
+    source ("PDB" / "UniProt") задаёт источник мутаций явно, как в add_sequences.
+    """
+
+    if source is None:
+        if df[pdb_mut_col].isna().any():
+            source = "UniProt"
+        else:
+            source = "PDB"
 
     if source == "PDB":
         mutation_col = pdb_mut_col
@@ -20,44 +51,113 @@ def apply_mutations(
 
     print(f"Источник мутаций: {mutation_col}")
 
-    def mutate_row(row):
-
-        seq = row[seq_col]
-        mut_field = str(row[mutation_col]).strip()
-
-        if pd.isna(seq):
-            return None
-
-        if mut_field.lower() in ["wild-type", "none", "", "nan"]:
-            return seq
-
-        mutations = [m.strip() for m in mut_field.split(",")]
-
-        mutated_seq = seq
-
-        for mut in mutations:
-
-            match = re.match(r"([A-Za-z])(\d+)([A-Za-z])", mut)
-            if not match:
-                return None
-
-            wt_aa, pos, mut_aa = match.groups()
-            pos = int(pos)
-
-            if pos < 1 or pos > len(mutated_seq):
-                return None
-
-            if mutated_seq[pos - 1] != wt_aa:
-                return None
-
-            mutated_seq = (
-                mutated_seq[:pos - 1] +
-                mut_aa +
-                mutated_seq[pos:]
+    n = len(df)
+    seqs = df[seq_col].reset_index(drop=True)
+    fields = df[mutation_col].fillna("nan").astype(str).str.strip().reset_index(drop=True)
+
+    no_seq = seqs.isna().to_numpy()
+    wild = fields.str.lower().isin(WILD_TYPE_MARKS).to_numpy()
+    todo_idx = np.flatnonzero(~no_seq & ~wild)
+
+    reason = np.full(n, None, dtype=object)
+    reason[no_seq] = NO_SEQUENCE
+    mutated = np.full(n, None, dtype=object)
+    keep_wild = wild & ~no_seq
+    mutated[keep_wild] = seqs[keep_wild].to_numpy()
+
+    if len(todo_idx):
+        #  1. Уникальные исходные последовательности в одном буфере
+        codes, parents = pd.factorize(seqs.iloc[todo_idx])
+        raw = [str(s).encode("ascii", errors="replace") for s in parents]
+        lengths = np.fromiter(map(len, raw), dtype=np.int64, count=len(raw))
+        offsets = np.zeros(len(raw), dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)[:-1]
+        buffer = np.frombuffer(b"".join(raw), dtype=np.uint8)
+        parent_of_row = np.full(n, -1, dtype=np.int64)
+        parent_of_row[todo_idx] = codes
+
+        #  2. Таблица мутаций (строка, wt, позиция, mut)
+        parts = fields.iloc[todo_idx].str.split(",").explode().str.strip()
+        table = parts.str.extract(MUTATION_PATTERN)
+        table.columns = ["wt", "pos", "mut"]
+        rows = table.index.to_numpy()
+        parsed = table["wt"].notna().to_numpy()
+        pos = pd.to_numeric(table["pos"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        wt = _letters(table["wt"])
+        mut = _letters(table["mut"])
+
+        #  3. Проверки для всей таблицы сразу
+        parent_id = parent_of_row[rows]
+        in_range = parsed & (pos >= 1) & (pos <= lengths[parent_id])
+        actual = np.zeros(len(rows), dtype=np.uint8)
+        actual[in_range] = buffer[offsets[parent_id[in_range]] + pos[in_range] - 1]
+        # повтор позиции в строке сверяется с уже изменённой последовательностью (ниже)
+        repeated = pd.DataFrame({"row": rows, "pos": pos}).duplicated().to_numpy()
+        matches = in_range & ((actual == wt) | repeated)
+        failure = np.select([~parsed, ~in_range, ~matches], [1, 2, 3], 0)
+
+        failing = failure > 0
+        first_failure = pd.Series(failure[failing], index=rows[failing]).groupby(level=0).first()
+        reason[first_failure.index.to_numpy()] = _REASONS[first_failure.to_numpy()]
+
+        #  4. Замены в строках без ошибок
+        ok_row = np.zeros(n, dtype=bool)
+        ok_row[todo_idx] = True
+        ok_row[first_failure.index.to_numpy()] = False
+        ok_idx = np.flatnonzero(ok_row)
+        if len(ok_idx):
+            _apply_substitutions(
+                ok_idx, ok_row[rows], rows, pos, wt, mut, repeated,
+                parent_of_row, raw, fields, mutated, reason,
             )
 
-        return mutated_seq
-
-    df["mutation_seq"] = df.apply(mutate_row, axis=1)
+    # object-колонки: None остаётся None, а не превращается в NaN строкового dtype
+    df["mutation_seq"] = pd.Series(mutated, index=df.index, dtype=object)
+    df[reason_col] = pd.Series(reason, index=df.index, dtype=object)
 
     return df
+
+
+def _apply_substitutions(ok_idx, keep, rows, pos, wt, mut, repeated,
+                         parent_of_row, raw, fields, mutated, reason):
+    """
+    Замены для строк ok_idx: одна на каждую уникальную пару (исходная, мутации)
+    """
+    rows_k = rows[keep]
+    pos_k = pos[keep].tolist()
+    wt_k = wt[keep].tolist()
+    mut_k = mut[keep].tolist()
+    repeated_k = repeated[keep].tolist()
+
+    combo_codes, combos = pd.factorize(
+        pd.Series(parent_of_row[ok_idx]).astype(str) + "|" + fields.iloc[ok_idx].to_numpy()
+    )
+    # factorize нумерует по первому появлению, так что первые вхождения идут по порядку кодов
+    first_rows = ok_idx[pd.Series(combo_codes).drop_duplicates().index.to_numpy()]
+    # мутации одной строки лежат в таблице подряд
+    starts = np.flatnonzero(np.r_[True, rows_k[1:] != rows_k[:-1]])
+    ends = np.r_[starts[1:], len(rows_k)]
+    segment = np.searchsorted(rows_k[starts], first_rows)
+
+    results = np.full(len(combos), None, dtype=object)
+    combo_failed = np.zeros(len(combos), dtype=bool)
+    for c, (row, seg) in enumerate(zip(first_rows, segment)):
+        buf = bytearray(raw[parent_of_row[row]])
+        for i in range(starts[seg], ends[seg]):
+            p = pos_k[i] - 1
+            if repeated_k[i] and buf[p] != wt_k[i]:
+                combo_failed[c] = True
+                break
+            buf[p] = mut_k[i]
+        else:
+            results[c] = buf.decode("ascii")
+
+    mutated[ok_idx] = results[combo_codes]
+    reason[ok_idx[combo_failed[combo_codes]]] = WT_MISMATCH
+
+
+def _letters(column: pd.Series) -> np.ndarray:
+    """
+    Однобуквенная колонка → коды ASCII, по одному на строку (0 на месте пропуска)
+    """
+    return column.str[0].map(ord, na_action="ignore").fillna(0).to_numpy(dtype=np.uint8)
@@ -8,6 +8,21 @@ from src.utils.paths import RAW_DATA_DIR
 
 
 def pars_data(org_name, prot_name):
+    """
+    Скачивает выгрузку ProThermDB и читает её в DataFrame
+    (None, если по запросу ничего не нашлось)
+    """
+    path = download_data(org_name, prot_name)
+    if path is None:
+        return None
+    return pd.read_csv(path, sep='\t')
+
+
+def download_data(org_name, prot_name):
+    """
+    Скачивает выгрузку ProThermDB в RAW_DATA_DIR и возвращает путь к TSV
+    (None, если по запросу ничего не нашлось)
+    """
 
     org_name = org_name.capitalize()
     prot_name = prot_name.capitalize()
@@ -93,9 +108,8 @@ def pars_data(org_name, prot_name):
     else:
         print("Файл не появился после 20 секунд ожидания.")
 
-    df = pd.read_csv(new_path, sep='\t')
-
-    # ПРОВЕРКА НА ПУСТУЮ ТАБЛИЦУ
+    # ПРОВЕРКА НА ПУСТУЮ ТАБЛИЦУ (читаем только первую строку)
+    df = pd.read_csv(new_path, sep='\t', nrows=1)
     if df.empty:
         print(
             "По данному запросу данные не найдены.\n"
@@ -105,4 +119,4 @@ def pars_data(org_name, prot_name):
         os.remove(new_path)
         return None
 
-    return df
+    return new_path
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+from urllib.parse import urlencode
+
+from src.sequences.fetcher import RequestsTransport, Transport, request_with_retries, run_sync
+from src.utils.paths import RAW_DATA_DIR
+
+# Адрес выгрузки в TSV, восстановленный по форме поиска на search.html; с живым
+# сайтом не сверен, поэтому загрузчик включается только --experimental-http.
+# Меняется параметром download_url, если сайт перенесёт обработчик.
+DOWNLOAD_URL = "https://web.iitm.ac.in/bioinfo2/prothermdb/download.php"
+
+# колонки, которые парсер на Selenium отмечал галочками cb1 ... cb33
+FIELDS = ["cb1", "cb7", "cb8", "cb18", "cb23", "cb27", "cb28", "cb29", "cb31", "cb32", "cb33"]
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    Один поиск по ProThermDB; пустое поле — без фильтра
+    """
+
+    organism: str | None = None
+    protein: str | None = None
+
+    @classmethod
+    def parse(cls, text: str) -> "Query":
+        """
+        "Bacillus licheniformis;Alpha-amylase" → Query(...);
+        пустая часть или "None" — без фильтра
+        """
+        organism, _, protein = text.partition(";")
+        return cls(_clean(organism), _clean(protein))
+
+    def file_name(self) -> str:
+        # то же имя, что давал парсер на Selenium
+        org = self.organism.capitalize() if self.organism else None
+        prot = self.protein.capitalize() if self.protein else None
+        if prot and org:
+            name = f"ProTherm_{prot}_{org}.csv"
+        elif prot:
+            name = f"ProTherm_{prot}.csv"
+        else:
+            name = f"ProTherm_{org}.csv"
+        return name.replace("/", "-")
+
+    def normalized(self) -> tuple[str, str]:
+        """
+        Ключ без учёта регистра: парсер на Selenium вводил названия через
+        capitalize(), так что такие запросы давали одну и ту же выгрузку
+        """
+        return (self.organism or "").casefold(), (self.protein or "").casefold()
+
+
+def read_queries(path) -> list[Query]:
+    """
+    Запросы из файла: по одному "организм;белок" в строке,
+    пустые строки и строки с '#' пропускаются
+    """
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                queries.append(Query.parse(line))
+    return queries
+
+
+class ProThermDownloader:
+    """
+    Скачивает выгрузки ProThermDB напрямую по HTTP, без браузера
+    (экспериментально: DOWNLOAD_URL и FIELDS не сверены с сайтом).
+
+    - запросы выполняются параллельно, не больше concurrency одновременно;
+    - 429/5xx и сетевые ошибки повторяются с экспоненциальной задержкой;
+    - ответ сначала пишется во временный файл в out_dir и переименовывается
+      (os.replace) — незаконченных файлов в папке не бывает, и ждать
+      появления файла не нужно;
+    - пустая выгрузка (только заголовок) не сохраняется.
+
+    transport — тот же интерфейс, что у SequenceFetcher: в тестах вместо
+    сети подставляется локальный сервер-заглушка. Транспорт, созданный
+    самим загрузчиком, закрывается в close().
+    """
+
+    def __init__(
+            self,
+            transport: Transport | None = None,
+            out_dir: str | Path = RAW_DATA_DIR,
+            concurrency: int = 4,
+            retries: int = 3,
+            backoff: float = 1.0,
+            timeout: float = 60.0,
+            download_url: str = DOWNLOAD_URL,
+            fields: Iterable[str] = FIELDS,
+    ):
+        self._own_transport = transport is None
+        self.transport = transport if transport is not None else RequestsTransport(pool_size=concurrency)
+        self.out_dir = Path(out_dir)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.download_url = download_url
+        self.fields = list(fields)
+
+    def close(self) -> None:
+        """
+        Закрывает сессию и пул соединений, если транспорт создан здесь
+        """
+        if self._own_transport:
+            self.transport.close()
+
+    def url(self, query: Query) -> str:
+        params = [(field, "on") for field in self.fields]
+        params.append(("organism", query.organism or ""))
+        params.append(("protein", query.protein or ""))
+        return f"{self.download_url}?{urlencode(params)}"
+
+    def download_all(self, queries: Iterable[Query]) -> dict[Query, Path | None]:
+        """
+        Синхронная обёртка над download_many
+        """
+        return run_sync(self.download_many(queries))
+
+    async def download_many(self, queries: Iterable[Query]) -> dict[Query, Path | None]:
+        """
+        {запрос: путь к TSV или None, если данных нет или загрузка не удалась}
+
+        Запросы, отличающиеся только регистром, скачиваются один раз и
+        получают общий файл; у разных запросов с совпавшим именем файла
+        (например, "a/b" и "a-b") к имени добавляется _2, _3, ...
+        """
+        groups: dict[tuple[str, str], list[Query]] = {}
+        for query in dict.fromkeys(queries):
+            groups.setdefault(query.normalized(), []).append(query)
+        first = [group[0] for group in groups.values()]
+        names = _unique_names(first)
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        paths = await asyncio.gather(*(self._download(q, name, semaphore)
+                                       for q, name in zip(first, names)))
+        return {query: path for group, path in zip(groups.values(), paths) for query in group}
+
+    async def _download(self, query: Query, name: str,
+                        semaphore: asyncio.Semaphore) -> Path | None:
+        response = await request_with_retries(
+            self.transport, self.url(query), query, semaphore,
+            retries=self.retries, backoff=self.backoff, timeout=self.timeout,
+        )
+        if response is None:
+            return None
+        if response.status != 200:
+            print(f"Ошибка для {query}: HTTP {response.status}")
+            return None
+        return self._save(query, name, response.text)
+
+    def _save(self, query: Query, name: str, text: str) -> Path | None:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) < 2:
+            print(f"По запросу {query} данные не найдены.")
+            return None
+
+        path = self.out_dir / name
+        fd, tmp = tempfile.mkstemp(dir=self.out_dir, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        print(f"Файл сохранён: {path}")
+        return path
+
+
+def _unique_names(queries: list[Query]) -> list[str]:
+    # без учёта регистра: на Windows и macOS "A.csv" и "a.csv" — один файл
+    taken: set[str] = set()
+    names = []
+    for query in queries:
+        name = query.file_name()
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while name.casefold() in taken:
+            n += 1
+            name = f"{stem}_{n}{ext}"
+        taken.add(name.casefold())
+        names.append(name)
+    return names
+
+
+def _clean(value: str) -> str | None:
+    value = value.strip()
+    return None if value in ("", "None") else value
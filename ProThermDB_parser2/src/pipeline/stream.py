@@ -0,0 +1,182 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.mutations.mutation_add import apply_mutations
+from src.sequences.add_sequences import add_sequences
+from src.sequences.cache import SequenceCache
+from src.utils.metrics import METRICS
+
+# пропуски в выгрузке ProThermDB обозначены '-'; заменяем их ещё при чтении
+NA_VALUES = ["-"]
+
+# повторяющиеся ID и названия — категории (словарь + коды в файле)
+CATEGORY_COLUMNS = [
+    "PROTEIN", "ORGANISM", "UniProt_ID", "PDB_wild", "SOURCE", "mutation_reason",
+]
+
+# числовые колонки выгрузки; нечисловые значения становятся NaN
+NUMERIC_COLUMNS = [
+    "pH", "T_(C)", "Tm_(C)", "dTm_(C)", "dG_(kcal/mol)", "ddG_(kcal/mol)",
+    "dH_(kcal/mol)", "dHvH_(kcal/mol)", "dCp_(kcal/mol/K)", "Cm_(M)", "m_(kcal/mol/M)",
+]
+
+
+def detect_source(tsv_path, pdb_mutation_col="PDB_Chain_Mutation", chunksize=100_000):
+    """
+    Источник последовательностей и мутаций для всего файла, как в add_sequences:
+    "UniProt", если в PDB_Chain_Mutation есть хоть один пропуск, иначе "PDB".
+    Читает только одну колонку.
+    """
+    for chunk in pd.read_csv(tsv_path, sep="\t", usecols=[pdb_mutation_col],
+                             na_values=NA_VALUES, chunksize=chunksize):
+        if chunk[pdb_mutation_col].isna().any():
+            return "UniProt"
+    return "PDB"
+
+
+def drop_seen(chunk: pd.DataFrame, seen: set) -> pd.DataFrame:
+    """
+    Убирает строки, уже встречавшиеся в этом или предыдущих кусках.
+    Хранятся только 64-битные хэши строк, а не сами строки.
+    """
+    hashes = pd.util.hash_pandas_object(chunk, index=False).tolist()
+    keep = np.zeros(len(hashes), dtype=bool)
+    for i, h in enumerate(hashes):
+        if h not in seen:
+            seen.add(h)
+            keep[i] = True
+    return chunk[keep]
+
+
+def arrow_schema(columns, dictionaries: bool = True) -> pa.Schema:
+    """
+    Явные типы колонок, одинаковые для всех кусков
+    """
+    fields = []
+    for col in columns:
+        if col in NUMERIC_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        elif col in CATEGORY_COLUMNS and dictionaries:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def to_arrow(chunk: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    chunk = chunk.copy()
+    for col in chunk.columns:
+        if col in NUMERIC_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        elif col in CATEGORY_COLUMNS:
+            chunk[col] = chunk[col].astype("category")
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    return table.select(schema.names).cast(schema)
+
+
+class _ParquetSink:
+    def __init__(self, path, schema):
+        self.writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, table):
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+class _FeatherSink:
+    # в файле Arrow IPC словари не могут меняться между кусками,
+    # поэтому категории здесь пишутся обычными строками
+    def __init__(self, path, schema):
+        self.sink = pa.OSFile(str(path), "wb")
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        self.writer = pa.ipc.new_file(self.sink, schema, options=options)
+
+    def write(self, table):
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+SINKS = {"parquet": (_ParquetSink, True), "feather": (_FeatherSink, False)}
+
+
+def run_streaming(
+        tsv_path,
+        out_path,
+        fmt: str = "parquet",
+        chunksize: int = 50_000,
+        cache: SequenceCache | None = None,
+        **sequence_options,
+) -> int:
+    """
+    Потоковый режим пайплайна: TSV читается кусками по chunksize строк,
+    каждый кусок проходит очистку → последовательности → мутации и сразу
+    дописывается в Parquet/Feather. В памяти одновременно только один кусок
+    (плюс хэши строк для удаления дубликатов), поэтому пиковая память не
+    зависит от размера выгрузки.
+
+    cache — общий для всех кусков SequenceCache; без него открывается кэш
+    по умолчанию (data/cache) и закрывается в конце.
+
+    Файл пишется во временный и переименовывается в out_path в конце.
+    Возвращает число записанных строк.
+    """
+    if fmt not in SINKS:
+        raise ValueError(f"fmt должен быть одним из {sorted(SINKS)}")
+    sink_cls, dictionaries = SINKS[fmt]
+
+    source = detect_source(tsv_path, sequence_options.get("pdb_mutation_col", "PDB_Chain_Mutation"))
+    print(f"Источник для всего файла: {source}")
+
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(out_path.name + ".part")
+    seen: set = set()
+    sink = None
+    written = 0
+
+    own_cache = cache is None
+    if own_cache:
+        cache = SequenceCache()
+    try:
+        for chunk in pd.read_csv(tsv_path, sep="\t", dtype=str, na_values=NA_VALUES,
+                                 chunksize=chunksize):
+            # 1. Очистка: пропуски уже заменены при чтении, остаются дубликаты
+            with METRICS.stage("dedup", rows=len(chunk)):
+                chunk = drop_seen(chunk, seen)
+            if chunk.empty:
+                continue
+
+            # 2. Последовательности (общий кэш: каждый ID загружается один раз)
+            chunk = add_sequences(chunk, cache=cache, source=source, **sequence_options)
+
+            # 3. Мутации
+            chunk = apply_mutations(chunk, source=source)
+
+            if sink is None:
+                schema = arrow_schema(chunk.columns, dictionaries=dictionaries)
+                sink = sink_cls(tmp_path, schema)
+            with METRICS.stage("write", rows=len(chunk)):
+                sink.write(to_arrow(chunk, schema))
+            written += len(chunk)
+            print(f"Обработано строк: {written}")
+    finally:
+        if sink is not None:
+            sink.close()
+        if own_cache:
+            cache.close()
+
+    if sink is None:
+        print("Нет строк для записи.")
+        return 0
+    os.replace(tmp_path, out_path)
+    print(f"Данные с мутациями сохранены: {out_path}")
+    return written
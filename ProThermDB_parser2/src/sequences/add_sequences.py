@@ -1,95 +1,137 @@
 import pandas as pd
-import re
-import time
-from .pdb import fetch_pdb_sequence, fetch_alphafold_sequence
-from .uniprot import fetch_uniprot_sequence
+from .cache import SequenceCache
+from .fetcher import SequenceFetcher, Transport
+from src.utils.metrics import METRICS
 
+PDB_ID_PATTERN = r"^[0-9][A-Za-z0-9]{3}$"
 
-def add_sequences(
+
+def sequence_keys(
         df: pd.DataFrame,
         pdb_mutation_col: str = "PDB_Chain_Mutation",
         pdb_col: str = "PDB_wild",
         uniprot_col: str = "UniProt_ID",
-        seq_col: str = "sequence",
-        sleep_time: float = 0.5,
-) -> pd.DataFrame:
+        source: str | None = None,
+) -> pd.Series:
     """
-    Добавляет аминокислотные последовательности в таблицу.
+    Ключ последовательности для каждой строки ("PDB:1ABC", "AF:...",
+    "UniProt:P12345") или None, если загружать нечего.
 
     Логика:
     - если в PDB_Chain_Mutation нет пропусков → используем PDB_wild
     - иначе → используем UniProt_ID
-
+    source ("PDB" / "UniProt") задаёт источник явно — например, когда
+    таблица обрабатывается по частям и решение принято для всего файла.
     """
+    keys = pd.Series(None, index=df.index, dtype=object)
 
-    #  1. Определяем источник для ВСЕЙ таблицы
-    total_rows = len(df)
-
-    if df[pdb_mutation_col].isna().any():
-        source = "UniProt"
-    else:
-        source = "PDB"
+    if source is None:
+        if df[pdb_mutation_col].isna().any():
+            source = "UniProt"
+        else:
+            source = "PDB"
 
     print(f"Источник последовательностей: {source}")
 
-    #  2. Словарь для кэширования
-    sequence_cache: dict[str, str | None] = {}
-
-    sequences = []
-
-    #  3. Основной цикл
-    for _, row in df.iterrows():
-
-        seq = None
-        cache_key = None
-
-        if source == "PDB":
-            pdb_raw = row.get(pdb_col)
-
-            if pd.notna(pdb_raw):
-                pdb_raw = str(pdb_raw)
-
-                if re.match(r"^[0-9][A-Za-z0-9]{3}$", pdb_raw):
-                    cache_key = f"PDB:{pdb_raw}"
-
-                    if cache_key not in sequence_cache:
-                        sequence_cache[cache_key] = fetch_pdb_sequence(pdb_raw)
-                        time.sleep(sleep_time)
+    if source == "PDB":
+        raw = df[pdb_col]
+        ids = raw[raw.notna()].astype(str)
+        is_pdb = ids.str.match(PDB_ID_PATTERN)
+        is_af = ~is_pdb & ids.str.startswith("AF-")
+        keys[is_pdb[is_pdb].index] = "PDB:" + ids[is_pdb]
+        keys[is_af[is_af].index] = "AF:" + ids[is_af]
+    else:  # UniProt
+        raw = df[uniprot_col]
+        ids = raw[raw.notna()].astype(str)
+        keys[ids.index] = "UniProt:" + ids
 
-                elif pdb_raw.startswith("AF-"):
-                    cache_key = f"AF:{pdb_raw}"
+    return keys
 
-                    if cache_key not in sequence_cache:
-                        sequence_cache[cache_key] = fetch_alphafold_sequence(pdb_raw)
-                        time.sleep(sleep_time)
 
-        else:  # UniProt
-            uniprot_id = row.get(uniprot_col)
-
-            if pd.notna(uniprot_id):
-                uniprot_id = str(uniprot_id)
-                cache_key = f"UniProt:{uniprot_id}"
+@METRICS.timed("add_sequences")
+def add_sequences(
+        df: pd.DataFrame,
+        pdb_mutation_col: str = "PDB_Chain_Mutation",
+        pdb_col: str = "PDB_wild",
+        uniprot_col: str = "UniProt_ID",
+        seq_col: str = "sequence",
+        sleep_time: float | None = None,
+        concurrency: int = 8,
+        requests_per_second: float = 5.0,
+        batch_size: int = 100,
+        transport: Transport | None = None,
+        cache: SequenceCache | None = None,
+        use_cache: bool = True,
+        source: str | None = None,
+        checkpoint_every: int = 1000,
+) -> pd.DataFrame:
+    """
+    Добавляет аминокислотные последовательности в таблицу.
 
-                if cache_key not in sequence_cache:
-                    sequence_cache[cache_key] = fetch_uniprot_sequence(uniprot_id)
-                    time.sleep(sleep_time)
+    Сначала собираются уникальные ID, затем они загружаются параллельно,
+    пачками по batch_size ID на запрос (см. SequenceFetcher). sleep_time оставлен для совместимости: если он
+    задан, частота запросов к хосту ограничивается 1 / sleep_time в секунду.
 
-        if cache_key is not None:
-            seq = sequence_cache.get(cache_key)
+    Загруженное сохраняется в SequenceCache (по умолчанию data/cache), так что
+    повторный запуск по тем же ID не обращается к сети; use_cache=False
+    отключает кэш. Загруженное записывается в кэш каждые checkpoint_every ID,
+    поэтому оборванный запуск продолжается с того места, где остановился.
+    """
 
-        sequences.append(seq)
+    #  1. Ключи для всех строк и уникальные ID
+    keys = sequence_keys(df, pdb_mutation_col, pdb_col, uniprot_col, source)
+    unique_keys = keys.dropna().unique()
+    print(f"Уникальных ID для загрузки: {len(unique_keys)}")
+
+    #  2. Что уже есть в кэше
+    failed: set[str] = set()
+    own_cache = use_cache and cache is None
+    if own_cache:
+        cache = SequenceCache()
+    fetcher = None
+    try:
+        sequences = cache.get_many(unique_keys) if use_cache else {}
+        missing = [key for key in unique_keys if key not in sequences]
+        print(f"Найдено в кэше: {len(sequences)}, загрузить: {len(missing)}")
+        if use_cache:
+            METRICS.count("cache.hits", len(sequences))
+            METRICS.count("cache.misses", len(missing))
+
+        #  3. Параллельная загрузка остального
+        if missing:
+            if sleep_time:
+                requests_per_second = 1 / sleep_time
+            fetcher = SequenceFetcher(
+                transport=transport,
+                concurrency=concurrency,
+                requests_per_second=requests_per_second,
+                batch_size=batch_size,
+            )
+            step = checkpoint_every if use_cache else len(missing)
+            for start in range(0, len(missing), step):
+                part = missing[start:start + step]
+                with METRICS.stage("fetch", rows=len(part)):
+                    fetched = fetcher.fetch_all(part)
+                sequences.update(fetched)
+                failed |= fetcher.failed
+                if use_cache:
+                    # сбои сети не кэшируем, только ответы сервера
+                    cache.put_many({k: v for k, v in fetched.items() if k not in fetcher.failed})
+                    print(f"Загружено {min(start + step, len(missing))} из {len(missing)}")
+    finally:
+        # сессия requests и файл кэша закрываются и при ошибке
+        if fetcher is not None:
+            fetcher.close()
+        if own_cache:
+            cache.close()
 
     #  4. Добавляем колонку
-    df[seq_col] = sequences
+    df[seq_col] = keys.map(sequences, na_action="ignore")
+    # ключи, не загруженные из-за сбоев сети (а не «не найдено»)
+    df.attrs["failed_keys"] = sorted(failed)
 
     #  5. Статистика пропусков
     n_missing = df[seq_col].isna().sum()
     print(f"Пропусков в колонке '{seq_col}': {n_missing} из {len(df)}")
 
-    df[seq_col] = sequences
-
-    #  3. Считаем пропуски
-    n_missing = df[seq_col].isna().sum()
-    print(f"Количество пропусков в '{seq_col}': {n_missing}")
-
     return df
@@ -0,0 +1,112 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable
+
+from src.utils.paths import CACHE_DIR
+
+# поднять, если меняется разбор ответов: старые записи станут устаревшими
+CACHE_VERSION = 1
+
+DAY = 24 * 60 * 60
+
+
+class SequenceCache:
+    """
+    Постоянный кэш последовательностей между запусками пайплайна (SQLite).
+
+    - ключ — (источник, ID), как в SequenceFetcher: "PDB:1ABC" → ("PDB", "1ABC");
+    - None тоже кэшируется («не найдено», например 404), но живёт меньше:
+      negative_ttl вместо ttl;
+    - записи другой версии (CACHE_VERSION) или старше TTL считаются промахом.
+    """
+
+    def __init__(
+            self,
+            path: str | Path = CACHE_DIR / "sequences.sqlite",
+            ttl: float | None = 90 * DAY,
+            negative_ttl: float | None = 7 * DAY,
+            version: int = CACHE_VERSION,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.version = version
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sequences (
+                source     TEXT NOT NULL,
+                id         TEXT NOT NULL,
+                sequence   TEXT,
+                fetched_at REAL NOT NULL,
+                version    INTEGER NOT NULL,
+                PRIMARY KEY (source, id)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str | None]:
+        """
+        Свежие записи для ключей; ключей без свежей записи в ответе нет
+        """
+        by_source: dict[str, list[str]] = {}
+        for key in dict.fromkeys(keys):
+            source, _, ident = key.partition(":")
+            by_source.setdefault(source, []).append(ident)
+
+        now = time.time()
+        found: dict[str, str | None] = {}
+        for source, ids in by_source.items():
+            # SQLite ограничивает число параметров в одном запросе
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT id, sequence, fetched_at, version FROM sequences "
+                    f"WHERE source = ? AND id IN ({marks})",
+                    [source, *chunk],
+                )
+                for ident, sequence, fetched_at, version in rows:
+                    if self._fresh(sequence, fetched_at, version, now):
+                        found[f"{source}:{ident}"] = sequence
+        return found
+
+    def put_many(self, items: dict[str, str | None]) -> None:
+        now = time.time()
+        rows = []
+        for key, sequence in items.items():
+            source, _, ident = key.partition(":")
+            rows.append((source, ident, sequence, now, self.version))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sequences VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def invalidate(self, source: str | None = None) -> None:
+        """
+        Удаляет все записи (или только одного источника)
+        """
+        with self.conn:
+            if source is None:
+                self.conn.execute("DELETE FROM sequences")
+            else:
+                self.conn.execute("DELETE FROM sequences WHERE source = ?", (source,))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _fresh(self, sequence: str | None, fetched_at: float, version: int, now: float) -> bool:
+        if version != self.version:
+            return False
+        ttl = self.ttl if sequence is not None else self.negative_ttl
+        return ttl is None or now - fetched_at < ttl
@@ -0,0 +1,426 @@
+import asyncio
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Iterator, Protocol
+from urllib.parse import quote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.metrics import METRICS
+
+# ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+UNIPROT_ACCESSION = re.compile(
+    r"^(?:[OPQ][0-9][A-Z0-9]{3}[0-9]|[A-NR-Z][0-9](?:[A-Z][A-Z0-9]{2}[0-9]){1,2})$"
+)
+
+
+@dataclass
+class Response:
+    status: int
+    text: str
+    retry_after: float | None = None
+
+
+class Transport(Protocol):
+    """
+    Всё, что умеет асинхронно выполнить GET. В тестах сюда подставляется
+    фейковый сервер вместо сети.
+    """
+
+    async def get(self, url: str, timeout: float) -> Response:
+        ...
+
+
+class RequestsTransport:
+    """
+    Транспорт по умолчанию: одна requests.Session с пулом keep-alive
+    соединений, блокирующие вызовы уходят в потоки
+    """
+
+    def __init__(self, pool_size: int = 16):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    async def get(self, url: str, timeout: float) -> Response:
+        return await asyncio.to_thread(self._get, url, timeout)
+
+    def _get(self, url: str, timeout: float) -> Response:
+        r = self.session.get(url, timeout=timeout)
+        return Response(r.status_code, r.text, _parse_retry_after(r.headers.get("Retry-After")))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты: rate запросов в секунду, всплеск до capacity
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass(frozen=True)
+class Source:
+    """
+    Как получить последовательность по ID источника.
+
+    Если задан batch_url, ID, для которых batch_id не None, запрашиваются
+    пачками: batch_url строит URL для списка таких ID, parse_batch
+    разбирает ответ в {ID: последовательность}. Источники с одним и тем же
+    batch_url попадают в общие пачки.
+    """
+
+    url: Callable[[str], str | None]
+    parse: Callable[[str], str | None]
+    batch_id: Callable[[str], str | None] | None = None
+    batch_url: Callable[[list[str]], str] | None = None
+    parse_batch: Callable[[str], dict[str, str]] | None = None
+
+
+def fasta_sequence(text: str) -> str | None:
+    """
+    Склеивает все строки FASTA, кроме заголовков
+    (у PDB это все цепи записи подряд, как и раньше)
+    """
+    lines = text.strip().split("\n")
+    return "".join(l.strip() for l in lines if not l.startswith(">"))
+
+
+def iter_fasta(text: str) -> Iterator[tuple[str, str]]:
+    """
+    (заголовок без '>', последовательность) для каждой записи, за один проход
+    """
+    header = None
+    parts: list[str] = []
+    for line in text.splitlines():
+        if line.startswith(">"):
+            if header is not None:
+                yield header, "".join(parts)
+            header = line[1:]
+            parts = []
+        elif header is not None:
+            parts.append(line.strip())
+    if header is not None:
+        yield header, "".join(parts)
+
+
+def _uniprot_records(text: str) -> dict[str, str]:
+    # >sp|P12345|NAME_HUMAN ...
+    records = {}
+    for header, seq in iter_fasta(text):
+        fields = header.split("|")
+        accession = fields[1] if len(fields) > 2 else header.split()[0]
+        records[accession.upper()] = seq
+    return records
+
+
+def _pdb_records(text: str) -> dict[str, str]:
+    # >1ABC_1|Chains A, B|...; цепи одной записи склеиваются, как в fasta_sequence
+    records: dict[str, str] = {}
+    for header, seq in iter_fasta(text):
+        entry = header.split("_", 1)[0].upper()
+        records[entry] = records.get(entry, "") + seq
+    return records
+
+
+def _pdb_url(pdb_id: str) -> str:
+    return f"https://www.rcsb.org/fasta/entry/{pdb_id}"
+
+
+def _uniprot_url(uniprot_id: str) -> str:
+    return f"https://rest.uniprot.org/uniprotkb/{uniprot_id}.fasta"
+
+
+def _alphafold_url(af_id: str) -> str | None:
+    m = re.match(r"AF-([A-Za-z0-9]+)-F1", af_id)
+    return _uniprot_url(m.group(1)) if m else None
+
+
+def _pdb_batch_id(pdb_id: str) -> str | None:
+    return pdb_id.upper() if re.match(r"^[0-9][A-Za-z0-9]{3}$", pdb_id) else None
+
+
+def _uniprot_batch_id(uniprot_id: str) -> str | None:
+    accession = uniprot_id.strip().upper()
+    return accession if UNIPROT_ACCESSION.match(accession) else None
+
+
+def _alphafold_batch_id(af_id: str) -> str | None:
+    m = re.match(r"AF-([A-Za-z0-9]+)-F1", af_id)
+    return _uniprot_batch_id(m.group(1)) if m else None
+
+
+def _pdb_batch_url(pdb_ids: list[str]) -> str:
+    return f"https://www.rcsb.org/fasta/entry/{','.join(pdb_ids)}"
+
+
+def _uniprot_batch_url(accessions: list[str]) -> str:
+    query = " OR ".join(f"accession:{a}" for a in accessions)
+    return f"https://rest.uniprot.org/uniprotkb/stream?format=fasta&query={quote(query)}"
+
+
+SOURCES: dict[str, Source] = {
+    "PDB": Source(_pdb_url, fasta_sequence,
+                  _pdb_batch_id, _pdb_batch_url, _pdb_records),
+    "AF": Source(_alphafold_url, fasta_sequence,
+                 _alphafold_batch_id, _uniprot_batch_url, _uniprot_records),
+    "UniProt": Source(_uniprot_url, fasta_sequence,
+                      _uniprot_batch_id, _uniprot_batch_url, _uniprot_records),
+}
+
+
+class SequenceFetcher:
+    """
+    Загружает последовательности по ключам вида "PDB:1ABC", "AF:AF-P12345-F1",
+    "UniProt:P12345".
+
+    - каждый уникальный ключ запрашивается один раз;
+    - где источник умеет, ID идут пачками по batch_size разных ID в одном
+      запросе (batch_size=1 — по одному); отвергнутая целиком пачка и ID,
+      которых нет в её ответе, перезапрашиваются по одному: вторичный или
+      объединённый accession UniProt возвращает в пачке запись под основным
+      ID, а отдельный запрос доходит до неё через перенаправление;
+    - одновременно выполняется не больше concurrency запросов;
+    - на каждый хост свой TokenBucket вместо фиксированного sleep;
+    - 429/5xx и сетевые ошибки повторяются с экспоненциальной задержкой,
+      остальные ответы (например, 404) сразу дают None.
+
+    Ключи, которые так и не удалось загрузить (в отличие от честного
+    «не найдено»), после запуска лежат в failed — их нельзя кэшировать.
+    Транспорт, созданный самим fetcher'ом, закрывается в close().
+    """
+
+    def __init__(
+            self,
+            transport: Transport | None = None,
+            concurrency: int = 8,
+            requests_per_second: float = 5.0,
+            retries: int = 3,
+            backoff: float = 0.5,
+            timeout: float = 10.0,
+            batch_size: int = 100,
+    ):
+        self._own_transport = transport is None
+        self.transport = transport if transport is not None else RequestsTransport(pool_size=concurrency)
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._buckets: dict[str, TokenBucket] = {}
+        self.failed: set[str] = set()
+
+    def close(self) -> None:
+        """
+        Закрывает сессию и пул соединений, если транспорт создан здесь
+        """
+        if self._own_transport:
+            self.transport.close()
+
+    def fetch_all(self, keys: Iterable[str]) -> dict[str, str | None]:
+        """
+        Синхронная обёртка над fetch_many
+        """
+        return run_sync(self.fetch_many(keys))
+
+    async def fetch_many(self, keys: Iterable[str]) -> dict[str, str | None]:
+        unique = list(dict.fromkeys(keys))
+        # новые ограничители на каждый запуск: asyncio.Lock привязан к циклу
+        self._buckets = {}
+        self.failed = set()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        # пакетные ключи группируются по общему batch_url, остальные идут по одному
+        singles: list[str] = []
+        # batch_url -> {ID для пачки: ключи с этим ID}
+        groups: dict[Callable, dict[str, list[str]]] = {}
+        for key in unique:
+            source_name, _, ident = key.partition(":")
+            source = SOURCES.get(source_name)
+            batch_id = None
+            if self.batch_size > 1 and source is not None and source.batch_url is not None:
+                batch_id = source.batch_id(ident)
+            if batch_id is None:
+                singles.append(key)
+            else:
+                groups.setdefault(source.batch_url, {}).setdefault(batch_id, []).append(key)
+
+        tasks = [self._fetch(key, semaphore) for key in singles]
+        for members in groups.values():
+            ids = list(members)
+            for start in range(0, len(ids), self.batch_size):
+                part = {batch_id: members[batch_id] for batch_id in ids[start:start + self.batch_size]}
+                tasks.append(self._fetch_batch(part, semaphore))
+
+        results: dict[str, str | None] = {}
+        for found in await asyncio.gather(*tasks):
+            results.update(found)
+        return {key: results.get(key) for key in unique}
+
+    async def _fetch(self, key: str, semaphore: asyncio.Semaphore) -> dict[str, str | None]:
+        source_name, _, ident = key.partition(":")
+        source = SOURCES.get(source_name)
+        url = source.url(ident) if source is not None else None
+        if url is None:
+            return {key: None}
+
+        response = await self._request(url, key, semaphore)
+        if response is None:
+            self.failed.add(key)
+            return {key: None}
+        if response.status != 200:
+            print(f"Ошибка для {key}: HTTP {response.status}")
+            return {key: None}
+        return {key: source.parse(response.text)}
+
+    async def _fetch_batch(self, members: dict[str, list[str]],
+                           semaphore: asyncio.Semaphore) -> dict[str, str | None]:
+        """
+        Одна пачка: members — {ID для пачки: ключи с этим ID}
+        """
+        first = next(iter(members.values()))[0]
+        source = SOURCES[first.partition(":")[0]]
+        ids = list(members)
+        label = f"пачки из {len(ids)} ID ({first}, ...)"
+
+        response = await self._request(source.batch_url(ids), label, semaphore)
+        if response is None:
+            keys = [key for keys in members.values() for key in keys]
+            self.failed.update(keys)
+            return dict.fromkeys(keys)
+
+        found: dict[str, str | None] = {}
+        if response.status == 200:
+            records = source.parse_batch(response.text)
+            for batch_id, keys in members.items():
+                if batch_id in records:
+                    found.update(dict.fromkeys(keys, records[batch_id]))
+            # не вернулись под своим ID — спрашиваем по одному, прежде чем считать «не найдено»
+            retry = [keys for batch_id, keys in members.items() if batch_id not in records]
+        elif len(ids) == 1:
+            print(f"Ошибка для {first}: HTTP {response.status}")
+            return dict.fromkeys(members[ids[0]])
+        else:
+            # пачку могли отвергнуть из-за одного ID — пробуем по одному
+            retry = list(members.values())
+
+        for part in await asyncio.gather(*(self._fetch_shared(keys, semaphore) for keys in retry)):
+            found.update(part)
+        return found
+
+    async def _fetch_shared(self, keys: list[str],
+                            semaphore: asyncio.Semaphore) -> dict[str, str | None]:
+        """
+        Ключи с одним ID источника: один запрос по первому, ответ — всем
+        """
+        sequence = (await self._fetch(keys[0], semaphore))[keys[0]]
+        if keys[0] in self.failed:
+            self.failed.update(keys)
+        return dict.fromkeys(keys, sequence)
+
+    async def _request(self, url: str, label: str,
+                       semaphore: asyncio.Semaphore) -> Response | None:
+        return await request_with_retries(
+            self.transport, url, label, semaphore,
+            retries=self.retries, backoff=self.backoff, timeout=self.timeout,
+            before=self._bucket(url).acquire,
+        )
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.requests_per_second)
+        return bucket
+
+
+async def request_with_retries(
+        transport: Transport,
+        url: str,
+        label: object,
+        semaphore: asyncio.Semaphore,
+        retries: int,
+        backoff: float,
+        timeout: float,
+        before: Callable[[], Awaitable[None]] | None = None,
+) -> Response | None:
+    """
+    GET с повторами; None, если ответа так и не получили.
+
+    Каждая попытка занимает место в semaphore и перед запросом ждёт
+    before() (например, TokenBucket.acquire). 429/5xx и сетевые ошибки
+    повторяются retries раз с экспоненциальной задержкой или Retry-After
+    сервера, любой другой ответ возвращается сразу. Время и статусы
+    ответов пишутся в METRICS по хосту.
+    """
+    host = urlsplit(url).netloc
+    error: object = None
+    for attempt in range(retries + 1):
+        retry_after = None
+        async with semaphore:
+            if before is not None:
+                await before()
+            start = time.perf_counter()
+            try:
+                response = await transport.get(url, timeout)
+            except Exception as e:
+                error = e
+                METRICS.count(f"http.{host}.errors")
+            else:
+                METRICS.observe(f"http.{host}", time.perf_counter() - start, lane=host, start=start)
+                METRICS.count(f"http.{host}.status.{response.status}")
+                if response.status not in RETRY_STATUSES:
+                    return response
+                error = f"HTTP {response.status}"
+                retry_after = response.retry_after
+        if attempt < retries:
+            delay = retry_after if retry_after is not None else backoff * 2 ** attempt
+            await asyncio.sleep(delay * (1 + random.random() / 2))
+
+    print(f"Ошибка для {label}: {error}")
+    return None
+
+
+def run_sync(coro):
+    """
+    asyncio.run, который работает и внутри уже запущенного цикла (Jupyter)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
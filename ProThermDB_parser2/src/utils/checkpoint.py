@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from src.utils.paths import CACHE_DIR
+
+# поднять, если меняется логика этапов: старые результаты станут промахом
+STAGE_VERSION = 1
+
+
+def file_hash(path) -> str:
+    """
+    sha256 содержимого файла (читается блоками, без загрузки в память)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Кэш результатов этапов пайплайна на диске.
+
+    Ключ этапа — хэш от имени этапа, ключа входа и параметров. Ключом входа
+    служит хэш исходного файла (для первого этапа) или ключ предыдущего
+    этапа: одинаковый вход с одинаковыми параметрами даёт тот же результат,
+    поэтому содержимое таблиц между этапами перехэшировать не нужно.
+
+    Результаты хранятся в pickle и пишутся атомарно (временный файл +
+    os.replace), так что оборванный запуск не оставляет битых записей.
+    enabled=False отключает кэш: этапы просто выполняются.
+    """
+
+    def __init__(self, directory: str | Path = CACHE_DIR / "stages", enabled: bool = True):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        if enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, name: str, input_key: str, params: dict | None = None) -> str:
+        payload = json.dumps(
+            [STAGE_VERSION, name, input_key, params or {}], sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def run(
+            self,
+            name: str,
+            input_key: str,
+            params: dict | None,
+            fn: Callable[[], Any],
+            valid: Callable[[Any], bool] | None = None,
+    ) -> tuple[Any, str]:
+        """
+        Результат этапа (из кэша или выполнив fn) и ключ этапа для следующего.
+
+        valid проверяет результат (например, что файл по пути ещё существует
+        или что загрузка прошла без сбоев): результат, не прошедший проверку,
+        не берётся из кэша и не сохраняется в него. None не кэшируется.
+        """
+        key = self.key(name, input_key, params)
+        if not self.enabled:
+            return fn(), key
+
+        result = self.load(name, key, valid)
+        if result is not None:
+            print(f"Этап {name}: результат из кэша")
+            return result, key
+
+        result = fn()
+        if valid is None or valid(result):
+            self.store(name, key, result)
+        return result, key
+
+    def load(self, name: str, key: str, valid: Callable[[Any], bool] | None = None) -> Any:
+        """
+        Сохранённый результат этапа или None
+        """
+        path = self._path(name, key)
+        if not self.enabled or not path.exists():
+            return None
+        result = pd.read_pickle(path)
+        if valid is not None and not valid(result):
+            return None
+        return result
+
+    def store(self, name: str, key: str, result: Any) -> None:
+        if not self.enabled or result is None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        os.close(fd)
+        try:
+            pd.to_pickle(result, tmp)
+            os.replace(tmp, self._path(name, key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.pkl"):
+            path.unlink()
+
+    def _path(self, name: str, key: str) -> Path:
+        return self.directory / f"{name}-{key[:16]}.pkl"
@@ -0,0 +1,187 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# верхние границы корзин гистограммы задержек, мс (последняя — всё, что дольше)
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# сколько событий держать для Chrome trace; старые отбрасываются
+MAX_EVENTS = 100_000
+
+
+class Metrics:
+    """
+    Счётчики, таймеры этапов и гистограммы задержек пайплайна.
+
+    - count: счётчики (попадания в кэш, строки, ошибки);
+    - stage / timed: время этапа и, если известно число строк, строк в секунду;
+    - observe: одна задержка (например, HTTP-запрос к хосту) в гистограмму.
+
+    Отчёт — report() / write_json(); write_chrome_trace() пишет этапы и
+    запросы как события для chrome://tracing или Perfetto (у каждого хоста
+    своя дорожка).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters: dict[str, int] = {}
+            # имя -> [вызовов, сумма с, минимум с, максимум с]
+            self.timers: dict[str, list[float]] = {}
+            self.histograms: dict[str, list[int]] = {}
+            self.rows: dict[str, int] = {}
+            # (имя, начало с, длительность с, дорожка)
+            self.events: list[tuple[str, float, float, str]] = []
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float, lane: str | None = None,
+                start: float | None = None) -> None:
+        """
+        Задержка в гистограмму name и событие на дорожке lane
+        """
+        if start is None:
+            start = time.perf_counter() - seconds
+        bucket = bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            histogram[bucket] += 1
+        self._record(name, start, seconds, lane or name)
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None):
+        """
+        Время тела with; rows — сколько строк обработал этап
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter() - start, "stages")
+            if rows is not None:
+                with self._lock:
+                    self.rows[name] = self.rows.get(name, 0) + rows
+
+    def timed(self, name: str):
+        """
+        Декоратор этапа: время каждого вызова, строк — длина первого аргумента
+        (таблицы)
+        """
+
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(df, *args, **kwargs):
+                with self.stage(name, rows=len(df)):
+                    return func(df, *args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def _record(self, name: str, start: float, seconds: float, lane: str) -> None:
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                self.timers[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = min(stats[2], seconds)
+                stats[3] = max(stats[3], seconds)
+            if len(self.events) >= MAX_EVENTS:
+                del self.events[: MAX_EVENTS // 10]
+            self.events.append((name, start, seconds, lane))
+
+    def report(self) -> dict:
+        with self._lock:
+            timers = {
+                name: {
+                    "calls": int(calls),
+                    "total_s": total,
+                    "mean_s": total / calls,
+                    "min_s": low,
+                    "max_s": high,
+                }
+                for name, (calls, total, low, high) in self.timers.items()
+            }
+            for name, rows in self.rows.items():
+                total = timers[name]["total_s"]
+                timers[name]["rows"] = rows
+                timers[name]["rows_per_s"] = rows / total if total else None
+
+            labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+            histograms = {
+                name: dict(zip(labels, counts)) for name, counts in self.histograms.items()
+            }
+
+            hits = self.counters.get("cache.hits", 0)
+            misses = self.counters.get("cache.misses", 0)
+            hit_rate = hits / (hits + misses) if hits + misses else None
+
+            return {
+                "counters": dict(self.counters),
+                "timers": timers,
+                "latency_histograms": histograms,
+                "cache_hit_rate": hit_rate,
+            }
+
+    def write_json(self, path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    def write_chrome_trace(self, path) -> None:
+        pid = os.getpid()
+        with self._lock:
+            lanes: dict[str, int] = {}
+            events = []
+            for name, start, seconds, lane in self.events:
+                tid = lanes.setdefault(lane, len(lanes))
+                events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": seconds * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                })
+            # подписи дорожек
+            events.extend(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": lane}}
+                for lane, tid in lanes.items()
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# общий экземпляр, в который пишут fetcher, add_sequences и apply_mutations
+METRICS = Metrics()
+
+
+def setup_from_env() -> None:
+    """
+    Включает выгрузку метрик по переменным окружения:
+
+    - PROTHERM_METRICS=путь.json — отчёт METRICS при выходе;
+    - PROTHERM_TRACE=путь.json — Chrome trace при выходе.
+
+    Профиль всего запуска снимается самим Python: python -m cProfile.
+    """
+    metrics_path = os.environ.get("PROTHERM_METRICS")
+    if metrics_path:
+        atexit.register(METRICS.write_json, metrics_path)
+    trace_path = os.environ.get("PROTHERM_TRACE")
+    if trace_path:
+        atexit.register(METRICS.write_chrome_trace, trace_path)
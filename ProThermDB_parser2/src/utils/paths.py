@@ -3,3 +3,4 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parents[2]
 RAW_DATA_DIR = BASE_DIR / "data" / "raw"
 FINAL_DATA_DIR = BASE_DIR / "data" / "final"
+CACHE_DIR = BASE_DIR / "data" / "cache"
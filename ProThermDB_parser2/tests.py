@@ -0,0 +1,514 @@
+import asyncio
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from src.mutations.mutation_add import apply_mutations
+from src.parser.protherm_http import FIELDS, ProThermDownloader, Query
+from src.pipeline.stream import run_streaming
+from src.sequences.add_sequences import add_sequences
+from src.sequences.cache import SequenceCache
+from src.sequences.fetcher import Response, SequenceFetcher
+from src.utils.checkpoint import StageCache, file_hash
+from src.utils.metrics import Metrics
+
+
+class FakeTransport:
+    """
+    Сервер-заглушка для UniProt и RCSB: отвечает FASTA по словарям
+    последовательностей и запоминает запросы.
+
+    errors — статусы (или исключения), которые отдаются первыми, по одному
+    на запрос, до нормальных ответов; запросы с ID из down всегда получают
+    503 (с Retry-After: 0, чтобы повторы не ждали). merged — {вторичный
+    accession: основной}: как и UniProt, запись отдаётся под основным.
+    """
+
+    def __init__(self, uniprot=None, pdb=None, errors=(), down=(), merged=None):
+        self.uniprot = uniprot or {}
+        self.pdb = pdb or {}
+        self.merged = merged or {}
+        self.errors = list(errors)
+        self.down = set(down)
+        self.urls = []
+
+    async def get(self, url: str, timeout: float) -> Response:
+        self.urls.append(url)
+        await asyncio.sleep(0)
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return Response(error, "")
+        if "rest.uniprot.org" in url:
+            ids = re.findall(r"accession:(\w+)", unquote(url))
+            single = not ids
+            if single:
+                ids = [url.rsplit("/", 1)[-1].removesuffix(".fasta")]
+            primary = [self.merged.get(a, a) for a in ids]
+            records = {a: self.uniprot[a] for a in primary if a in self.uniprot}
+            text = "".join(f">sp|{a}|TEST\n{seq}\n" for a, seq in records.items())
+        else:
+            ids = url.rsplit("/", 1)[-1].split(",")
+            single = len(ids) == 1
+            records = {p: self.pdb[p] for p in ids if p in self.pdb}
+            text = "".join(f">{p}_1|Chain A|TEST\n{seq}\n" for p, seq in records.items())
+        if self.down.intersection(ids):
+            return Response(503, "", retry_after=0.0)
+        if single and not records:
+            return Response(404, "")
+        return Response(200, text)
+
+
+class DownloadTransport:
+    """
+    Заглушка download.php: выгрузка по паре (organism, protein), для
+    остальных — только заголовок. Считает одновременные запросы.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.urls = []
+        self.active = 0
+        self.peak = 0
+
+    async def get(self, url: str, timeout: float) -> Response:
+        self.urls.append(url)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.active -= 1
+        params = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        key = (params["organism"][0], params["protein"][0])
+        return Response(200, self.tables.get(key, "PROTEIN\tORGANISM\n"))
+
+
+def make_fetcher(transport, **options):
+    options.setdefault("requests_per_second", 1e6)
+    options.setdefault("backoff", 0.0)
+    return SequenceFetcher(transport=transport, **options)
+
+
+def test_fetcher_batches_unique_ids():
+    uniprot = {f"P0000{i}": "ACDE"[: i % 4 + 1] for i in range(5)}
+    transport = FakeTransport(uniprot=uniprot, pdb={"1ABC": "MKV"})
+    keys = [f"UniProt:{a}" for a in uniprot] + ["UniProt:P00001", "PDB:1ABC"]
+    found = make_fetcher(transport, batch_size=2).fetch_all(keys)
+    assert found == {**{f"UniProt:{a}": s for a, s in uniprot.items()}, "PDB:1ABC": "MKV"}
+    # 5 accession по 2 на запрос плюс один запрос к RCSB
+    batches = [re.findall(r"accession:(\w+)", unquote(u)) for u in transport.urls]
+    assert sorted(len(b) for b in batches if b) == [1, 2, 2]
+    assert len(transport.urls) == 4
+
+
+def test_fetcher_batches_distinct_ids_and_retries_missing_ones():
+    transport = FakeTransport(uniprot={"P12345": "MKV", "Q99999": "GGG"},
+                              merged={"O11111": "P12345"})
+    keys = ["UniProt:P12345", "AF:AF-P12345-F1", "UniProt:O11111",
+            "UniProt:Q99999", "UniProt:Q00000"]
+    fetcher = make_fetcher(transport, batch_size=3)
+    assert fetcher.fetch_all(keys) == {
+        "UniProt:P12345": "MKV", "AF:AF-P12345-F1": "MKV", "UniProt:O11111": "MKV",
+        "UniProt:Q99999": "GGG", "UniProt:Q00000": None,
+    }
+    assert not fetcher.failed
+    # 4 разных ID по 3 на запрос; P12345 двух ключей — один ID пачки
+    batches = [re.findall(r"accession:(\w+)", unquote(u)) for u in transport.urls]
+    assert sorted(len(b) for b in batches if b) == [1, 3]
+    # объединённый O11111 и несуществующий Q00000 пачка не вернула — по одному
+    singles = sorted(u.rsplit("/", 1)[-1] for u, b in zip(transport.urls, batches) if not b)
+    assert singles == ["O11111.fasta", "Q00000.fasta"]
+
+
+def test_fetcher_retries_throttling_and_server_errors():
+    transport = FakeTransport(uniprot={"P12345": "MKV"},
+                              errors=[429, 503, ConnectionError("reset")])
+    fetcher = make_fetcher(transport, retries=3)
+    assert fetcher.fetch_all(["UniProt:P12345"]) == {"UniProt:P12345": "MKV"}
+    assert len(transport.urls) == 4 and not fetcher.failed
+
+    transport = FakeTransport(uniprot={"P12345": "MKV"}, errors=[502] * 3)
+    fetcher = make_fetcher(transport, retries=2)
+    assert fetcher.fetch_all(["UniProt:P12345"]) == {"UniProt:P12345": None}
+    assert len(transport.urls) == 3 and fetcher.failed == {"UniProt:P12345"}
+
+
+def test_fetcher_separates_not_found_from_failures():
+    transport = FakeTransport(pdb={"1ABC": "MKV"})
+    fetcher = make_fetcher(transport, batch_size=1)
+    # 404 — честное «не найдено», повторять его незачем
+    assert fetcher.fetch_all(["PDB:9ZZZ", "PDB:1ABC"]) == {"PDB:9ZZZ": None, "PDB:1ABC": "MKV"}
+    assert len(transport.urls) == 2 and not fetcher.failed
+
+
+def test_add_sequences_caches_not_found_but_not_failures():
+    df = pd.DataFrame({
+        "PDB_Chain_Mutation": ["A1G", "A2G", "A3G"],
+        "PDB_wild": ["1ABC", "9ZZZ", "2XYZ"],
+        "UniProt_ID": ["P1", "P2", "P3"],
+    })
+    pdb = {"1ABC": "MKV", "2XYZ": "GGG"}
+    with tempfile.TemporaryDirectory() as tmp:
+        with SequenceCache(os.path.join(tmp, "seq.sqlite")) as cache:
+            # 2XYZ всё время отвечает 503: это сбой, а не «не найдено»
+            transport = FakeTransport(pdb=pdb, down={"2XYZ"})
+            out = add_sequences(df.copy(), transport=transport, cache=cache, batch_size=1)
+            assert out.attrs["failed_keys"] == ["PDB:2XYZ"]
+            assert cache.get_many(["PDB:1ABC", "PDB:9ZZZ", "PDB:2XYZ"]) == {
+                "PDB:1ABC": "MKV", "PDB:9ZZZ": None,
+            }
+
+            # второй запуск загружает только то, что не удалось
+            transport = FakeTransport(pdb=pdb)
+            out = add_sequences(df.copy(), transport=transport, cache=cache, batch_size=1)
+            assert out["sequence"].fillna("").tolist() == ["MKV", "", "GGG"]
+            assert transport.urls == ["https://www.rcsb.org/fasta/entry/2XYZ"]
+
+
+def test_sequence_cache_round_trip_and_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "seq.sqlite")
+        with SequenceCache(path) as cache:
+            cache.put_many({"PDB:1ABC": "MKV", "UniProt:P12345": "GGG", "PDB:9ZZZ": None})
+        # новое соединение видит то же, None — тоже запись
+        with SequenceCache(path) as cache:
+            assert cache.get_many(["PDB:1ABC", "UniProt:P12345", "PDB:9ZZZ", "PDB:2XYZ"]) == {
+                "PDB:1ABC": "MKV", "UniProt:P12345": "GGG", "PDB:9ZZZ": None,
+            }
+            cache.invalidate("UniProt")
+            assert cache.get_many(["UniProt:P12345"]) == {}
+
+        # «не найдено» устаревает раньше, чем найденное
+        with SequenceCache(path, ttl=3600, negative_ttl=0) as cache:
+            assert cache.get_many(["PDB:1ABC", "PDB:9ZZZ"]) == {"PDB:1ABC": "MKV"}
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("UPDATE sequences SET fetched_at = fetched_at - 7200")
+        conn.close()
+        with SequenceCache(path, ttl=3600) as cache:
+            assert cache.get_many(["PDB:1ABC"]) == {}
+        # записи другой версии разбора — промах
+        with SequenceCache(path, ttl=None, version=2) as cache:
+            assert cache.get_many(["PDB:1ABC"]) == {}
+
+
+def _mutate_row_reference(seq, field):
+    """
+    Построчная apply_mutations до векторизации — эталон для сравнения
+    """
+    mut_field = str(field).strip()
+    if pd.isna(seq):
+        return None
+    if mut_field.lower() in ["wild-type", "none", "", "nan"]:
+        return seq
+    mutated_seq = seq
+    for mut in (m.strip() for m in mut_field.split(",")):
+        match = re.match(r"([A-Za-z])(\d+)([A-Za-z])", mut)
+        if not match:
+            return None
+        wt_aa, pos, mut_aa = match.groups()
+        pos = int(pos)
+        if pos < 1 or pos > len(mutated_seq):
+            return None
+        if mutated_seq[pos - 1] != wt_aa:
+            return None
+        mutated_seq = mutated_seq[:pos - 1] + mut_aa + mutated_seq[pos:]
+    return mutated_seq
+
+
+def _mutation_frame(seed: int, rows: int = 400) -> pd.DataFrame:
+    rng = random.Random(seed)
+    amino = "ACDEFGHIKLMNPQRSTVWY"
+    sequences = ["".join(rng.choices(amino, k=rng.randrange(3, 30))) for _ in range(15)]
+    records = []
+    for _ in range(rows):
+        seq = rng.choice(sequences + [None])
+        length = len(seq) if seq else 10
+
+        def point(wrong_wt=False, beyond=False):
+            pos = length + rng.randrange(1, 5) if beyond else rng.randrange(1, length + 1)
+            wt = seq[pos - 1] if seq and pos <= length else rng.choice(amino)
+            if wrong_wt:
+                wt = "W" if wt != "W" else "A"
+            return f"{wt}{pos}{rng.choice(amino)}"
+
+        kind = rng.choice(["wild", "dash", "none", "ok", "ok", "mismatch", "range",
+                           "bad", "repeat", "lower"])
+        if kind == "wild":
+            mutation = rng.choice(["wild-type", "Wild-Type", " none "])
+        elif kind == "dash":
+            mutation = "-"
+        elif kind == "none":
+            mutation = None
+        elif kind == "mismatch":
+            mutation = f"{point()}, {point(wrong_wt=True)}"
+        elif kind == "range":
+            mutation = point(beyond=True)
+        elif kind == "bad":
+            mutation = rng.choice(["?", "del12", f"{point()}, X", "12AG"])
+        elif kind == "repeat":
+            # вторая замена той же позиции сверяется с уже изменённой буквой
+            first = point()
+            pos = first[1:-1]
+            second_wt = rng.choice([first[-1], "W"])
+            mutation = f"{first}, {second_wt}{pos}{rng.choice(amino)}"
+        elif kind == "lower":
+            mutation = point().lower()
+        else:
+            mutation = ", ".join(point() for _ in range(rng.randrange(1, 4)))
+        records.append({"sequence": seq, "MUTATION": mutation})
+    df = pd.DataFrame.from_records(records)
+    # PDB-запись мутации: с цепью впереди или без неё
+    df["PDB_Chain_Mutation"] = [
+        rng.choice([m, f"A_{m}", f"A {m}"]) if isinstance(m, str) else "wild-type"
+        for m in df["MUTATION"]
+    ]
+    return df
+
+
+def test_apply_mutations_matches_row_wise_reference():
+    for seed in range(4):
+        df = _mutation_frame(seed)
+        for source, column in (("UniProt", "MUTATION"), ("PDB", "PDB_Chain_Mutation")):
+            out = apply_mutations(df.copy(), source=source)
+            expected = [_mutate_row_reference(seq, field)
+                        for seq, field in zip(df["sequence"], df[column])]
+            assert out["mutation_seq"].tolist() == expected, (seed, source)
+            # причина есть ровно у строк, где мутацию применить не удалось
+            failed = [e is None for e in expected]
+            assert out["mutation_reason"].notna().tolist() == failed, (seed, source)
+
+
+def test_apply_mutations_mixes_good_and_unparsable_rows():
+    df = pd.DataFrame({
+        "sequence": ["MKVA", "MKVA", "MKVA", None, "MKVA", "MKVA"],
+        "MUTATION": ["M1A", "X", "K2R, ?", "M1A", "Q9A", "wild-type"],
+        "PDB_Chain_Mutation": [None] * 6,
+    })
+    out = apply_mutations(df)
+    assert out["mutation_seq"].tolist() == ["AKVA", None, None, None, None, "MKVA"]
+    assert out["mutation_reason"].tolist() == [
+        None, "bad_format", "bad_format", "no_sequence", "out_of_range", None,
+    ]
+
+
+def _values(column: pd.Series) -> list:
+    """
+    Значения колонки с None на месте любого пропуска (NaN, None, pd.NA):
+    после Parquet/Feather строковые пропуски зависят от версии pandas
+    """
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def test_run_streaming_round_trip_in_chunks():
+    header = ["PROTEIN", "ORGANISM", "UniProt_ID", "PDB_wild", "MUTATION",
+              "PDB_Chain_Mutation", "pH", "Tm_(C)"]
+    rows = [
+        ["Kinase", "E. coli", "P12345", "1ABC", "M1A", "A_M1A", "7.0", "-"],
+        ["Kinase", "E. coli", "P12345", "1ABC", "wild-type", "-", "7.5", "55.1"],
+        ["Lysozyme", "H. sapiens", "Q99999", "2XYZ", "G2C", "A_G2C", "6.0", "61.0"],
+        ["Lysozyme", "H. sapiens", "Q99999", "2XYZ", "A2C", "A_A2C", "6.5", "-"],
+        # повтор первой строки в другом куске
+        ["Kinase", "E. coli", "P12345", "1ABC", "M1A", "A_M1A", "7.0", "-"],
+        ["Unknown", "E. coli", "P00000", "3DEF", "M1A", "A_M1A", "8.0", "40.0"],
+        ["Kinase", "E. coli", "P12345", "1ABC", "K2R, V3L", "A_K2R", "7.0", "50.5"],
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        tsv = os.path.join(tmp, "export.tsv")
+        with open(tsv, "w", encoding="utf-8") as f:
+            f.writelines("\t".join(line) + "\n" for line in [header, *rows])
+        for fmt, read in (("parquet", pd.read_parquet), ("feather", pd.read_feather)):
+            transport = FakeTransport(uniprot={"P12345": "MKVA", "Q99999": "GGGG"})
+            out = os.path.join(tmp, f"out.{fmt}")
+            with SequenceCache(os.path.join(tmp, f"{fmt}.sqlite")) as cache:
+                written = run_streaming(tsv, out, fmt=fmt, chunksize=3, cache=cache,
+                                        transport=transport, requests_per_second=1e6)
+            assert written == 6 and not os.path.exists(out + ".part")
+
+            result = read(out)
+            assert _values(result["sequence"]) == ["MKVA", "MKVA", "GGGG", "GGGG", None, "MKVA"]
+            assert _values(result["mutation_seq"]) == ["AKVA", "MKVA", "GCGG", None, None, "MRLA"]
+            assert _values(result["mutation_reason"]) == [
+                None, None, None, "wt_mismatch", "no_sequence", None,
+            ]
+            assert result["pH"].tolist() == [7.0, 7.5, 6.0, 6.5, 8.0, 7.0]
+            assert result["Tm_(C)"].isna().tolist() == [True, False, False, True, False, False]
+            # кэш общий для кусков: P12345 из третьего куска в сеть не ходил
+            assert sum("P12345" in unquote(url) for url in transport.urls) == 1
+
+
+def test_downloader_encodes_queries_limits_parallelism_and_skips_empty():
+    tables = {(f"Org {i}", "Alpha/beta"): f"PROTEIN\tORGANISM\nAlpha/beta\tOrg {i}\n"
+              for i in range(6)}
+    queries = [Query(f"Org {i}", "Alpha/beta") for i in range(6)] + [Query(None, "Nothing & more")]
+    transport = DownloadTransport(tables)
+    with tempfile.TemporaryDirectory() as tmp:
+        downloader = ProThermDownloader(transport=transport, out_dir=tmp, concurrency=2)
+        paths = downloader.download_all(queries + queries[:1])
+        # повтор запроса скачивается один раз, одновременно — не больше concurrency
+        assert len(transport.urls) == 7 and transport.peak == 2
+
+        url = next(u for u in transport.urls if "Nothing" in unquote(u))
+        params = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        assert params["organism"] == [""] and params["protein"] == ["Nothing & more"]
+        assert all(params[field] == ["on"] for field in FIELDS)
+
+        # пустая выгрузка (только заголовок) не сохраняется
+        assert paths[queries[-1]] is None
+        saved = paths[queries[0]]
+        assert saved.name == "ProTherm_Alpha-beta_Org 0.csv"
+        assert saved.read_text(encoding="utf-8") == tables[("Org 0", "Alpha/beta")]
+        # временных *.part не остаётся
+        assert sorted(os.listdir(tmp)) == sorted(paths[q].name for q in queries[:-1])
+
+
+def test_downloader_gives_distinct_queries_distinct_files():
+    tables = {
+        ("E. coli", "Lysozyme"): "PROTEIN\tORGANISM\nLysozyme\tE. coli\n",
+        ("", "Alpha/beta"): "PROTEIN\tORGANISM\nAlpha/beta\tX\n",
+        ("", "Alpha-beta"): "PROTEIN\tORGANISM\nAlpha-beta\tY\n",
+    }
+    same = [Query("E. coli", "Lysozyme"), Query("e. coli", "LYSOZYME")]
+    clashing = [Query(None, "Alpha/beta"), Query(None, "Alpha-beta")]
+    transport = DownloadTransport(tables)
+    with tempfile.TemporaryDirectory() as tmp:
+        downloader = ProThermDownloader(transport=transport, out_dir=tmp)
+        paths = downloader.download_all(same + clashing)
+        # отличие только в регистре — один запрос и общий файл
+        assert len(transport.urls) == 3
+        assert paths[same[0]] == paths[same[1]]
+        # одно имя файла у разных запросов — разные файлы, ничего не перезаписано
+        assert [paths[q].name for q in clashing] == ["ProTherm_Alpha-beta.csv",
+                                                     "ProTherm_Alpha-beta_2.csv"]
+        assert [paths[q].read_text(encoding="utf-8") for q in clashing] == [
+            tables[("", "Alpha/beta")], tables[("", "Alpha-beta")],
+        ]
+
+
+def test_stage_cache_keys_invalidation_and_validity():
+    calls = []
+
+    def stage():
+        calls.append(1)
+        return pd.DataFrame({"a": [len(calls)]})
+
+    def flaky():
+        df = stage()
+        df.attrs["failed_keys"] = ["UniProt:P12345"]
+        return df
+
+    def no_failures(df):
+        # та же проверка, что у этапа sequences в main.py
+        return not df.attrs.get("failed_keys")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stages = StageCache(tmp)
+        tsv = os.path.join(tmp, "export.tsv")
+        with open(tsv, "w", encoding="utf-8") as f:
+            f.write("a\tb\n1\t2\n")
+        input_key = file_hash(tsv)
+
+        # ключ зависит от этапа, входа и параметров, но не от порядка параметров
+        key = stages.key("clean", input_key, {"x": 1, "y": 2})
+        assert key == stages.key("clean", input_key, {"y": 2, "x": 1})
+        assert key != stages.key("clean", input_key, {"x": 1, "y": 3})
+        assert key != stages.key("mutations", input_key, {"x": 1, "y": 2})
+
+        first, key = stages.run("clean", input_key, {"x": 1}, stage)
+        again, again_key = stages.run("clean", input_key, {"x": 1}, stage)
+        assert len(calls) == 1 and again_key == key and again.equals(first)
+
+        # другие параметры — промах
+        stages.run("clean", input_key, {"x": 2}, stage)
+        assert len(calls) == 2
+
+        # изменившийся файл даёт новый хэш входа — промах
+        with open(tsv, "a", encoding="utf-8") as f:
+            f.write("3\t4\n")
+        changed = file_hash(tsv)
+        assert changed != input_key
+        _, changed_key = stages.run("clean", changed, {"x": 1}, stage)
+        assert changed_key != key and len(calls) == 3
+
+        # результат со сбоями загрузки не сохраняется, следующий запуск повторяет этап
+        stages.run("sequences", key, {}, flaky, no_failures)
+        stages.run("sequences", key, {}, flaky, no_failures)
+        assert len(calls) == 5
+        stages.run("sequences", key, {}, stage, no_failures)
+        result, _ = stages.run("sequences", key, {}, flaky, no_failures)
+        assert len(calls) == 6 and no_failures(result)
+
+        # сохранённый путь, файла по которому уже нет, не берётся из кэша
+        out = os.path.join(tmp, "out.parquet")
+
+        def write():
+            calls.append(1)
+            open(out, "w").close()
+            return out
+
+        stages.run("stream", key, {}, write, os.path.exists)
+        os.remove(out)
+        stages.run("stream", key, {}, write, os.path.exists)
+        assert len(calls) == 8
+
+        # выключенный кэш всегда выполняет этап и ничего не пишет
+        off = StageCache(os.path.join(tmp, "off"), enabled=False)
+        off.run("clean", input_key, {"x": 1}, stage)
+        off.run("clean", input_key, {"x": 1}, stage)
+        assert len(calls) == 10 and not os.path.exists(off.directory)
+
+
+def test_metrics_report_and_trace():
+    metrics = Metrics()
+    with metrics.stage("clean", rows=10):
+        pass
+    metrics.observe("http.rest.uniprot.org", 0.03, lane="rest.uniprot.org")
+    metrics.count("cache.hits", 3)
+    metrics.count("cache.misses")
+
+    report = metrics.report()
+    assert report["timers"]["clean"]["calls"] == 1 and report["timers"]["clean"]["rows"] == 10
+    assert report["timers"]["http.rest.uniprot.org"]["total_s"] == 0.03
+    assert report["latency_histograms"]["http.rest.uniprot.org"]["<=50ms"] == 1
+    assert report["cache_hit_rate"] == 0.75
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.json")
+        metrics.write_chrome_trace(path)
+        with open(path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+    # у этапов и у каждого хоста своя подписанная дорожка
+    lanes = {e["args"]["name"]: e["tid"] for e in events if e["ph"] == "M"}
+    assert {(e["name"], e["tid"]) for e in events if e["ph"] == "X"} == {
+        ("clean", lanes["stages"]), ("http.rest.uniprot.org", lanes["rest.uniprot.org"]),
+    }
+    metrics.reset()
+    assert metrics.report()["timers"] == {}
+
+
+def run_all():
+    test_fetcher_batches_unique_ids()
+    test_fetcher_batches_distinct_ids_and_retries_missing_ones()
+    test_fetcher_retries_throttling_and_server_errors()
+    test_fetcher_separates_not_found_from_failures()
+    test_add_sequences_caches_not_found_but_not_failures()
+    test_sequence_cache_round_trip_and_ttl()
+    test_apply_mutations_matches_row_wise_reference()
+    test_apply_mutations_mixes_good_and_unparsable_rows()
+    test_run_streaming_round_trip_in_chunks()
+    test_downloader_encodes_queries_limits_parallelism_and_skips_empty()
+    test_downloader_gives_distinct_queries_distinct_files()
+    test_stage_cache_keys_invalidation_and_validity()
+    test_metrics_report_and_trace()
+
+
+if __name__ == "__main__":
+    run_all()
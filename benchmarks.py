@@ -0,0 +1,438 @@
+"""Micro-benchmarks for the in-memory filesystem model.
+
+Run with ``python benchmarks.py``. The reproducible suite over generated
+wide, deep and skewed trees writes a JSON baseline and compares two of them::
+
+    python benchmarks.py suite --nodes 1000,10000,100000 --out baseline.json
+    python benchmarks.py compare baseline.json current.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src import ColumnarTree, Directory, File
+
+
+def build_tree(depth: int, width: int, files_per_dir: int) -> Directory:
+    root = Directory("root")
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for f in range(files_per_dir):
+                parent.add(File(f"file_{d}_{f}.bin", 100 + f))
+            for w in range(width):
+                child = Directory(f"dir_{d}_{w}")
+                parent.add(child)
+                next_level.append(child)
+        level = next_level
+    return root
+
+
+def recursive_size(node) -> int:
+    """Reference implementation of the uncached subtree walk."""
+    if isinstance(node, File):
+        return node.size_bytes
+    return sum(recursive_size(child) for child in node.children)
+
+
+def timed(label: str, func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:10.3f} ms")
+    return best
+
+
+def bench_size_cache() -> None:
+    root = build_tree(depth=6, width=4, files_per_dir=10)
+    print(f"tree: {root.file_count()} files, {root.size()} B")
+    uncached = timed("size() full walk", lambda: recursive_size(root))
+    cached = timed("size() cached", root.size)
+    print(f"speedup: {uncached / max(cached, 1e-9):.0f}x")
+    timed("tree()", root.tree, repeat=3)
+
+
+def bench_path_resolution() -> None:
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+    paths = [path.split("/", 1)[1] for path in root.list_paths()]
+    print(f"tree: {len(paths)} file paths")
+    timed("find_by_path() each", lambda: [root.find_by_path(p) for p in paths], repeat=3)
+    timed("resolve_many()", lambda: root.resolve_many(paths), repeat=3)
+
+
+def bench_name_index() -> None:
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+    root.find("warm-up")
+    names = [f"file_4_{i}.bin" for i in range(20)]
+    timed("find() via index", lambda: [root.find(n) for n in names])
+    timed("glob('*_19.bin')", lambda: root.glob("*_19.bin"))
+
+
+def peak_memory(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_streaming() -> None:
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+
+    def drain(iterator) -> None:
+        for _ in iterator:
+            pass
+
+    timed("list_paths()", root.list_paths, repeat=3)
+    timed("iter_paths() drained", lambda: drain(root.iter_paths()), repeat=3)
+    print(f"{'peak list_paths()':<40} {peak_memory(root.list_paths) / 1024:10.1f} KiB")
+    print(f"{'peak iter_paths() drained':<40} "
+          f"{peak_memory(lambda: drain(root.iter_paths())) / 1024:10.1f} KiB")
+    print(f"{'peak iter_tree_lines() drained':<40} "
+          f"{peak_memory(lambda: drain(root.iter_tree_lines())) / 1024:10.1f} KiB")
+
+
+def bench_memory_per_node(count: int = 100_000) -> None:
+    nodes: list = []
+
+    def build() -> None:
+        directory = Directory("bench")
+        nodes.append(directory)
+        for i in range(count):
+            # owners repeat, as they do in real inventories
+            node = File(f"file_{i}.bin", i, owner=f"user{i % 10}")
+            nodes.append(node)
+
+    peak = peak_memory(build)
+    # the list holding the nodes is not part of the per-node cost
+    per_node = (peak - 8 * len(nodes)) / count
+    print(f"{'bytes per File node':<40} {per_node:10.1f} B")
+
+
+def bench_columnar(count: int = 100_000) -> None:
+    def build() -> ColumnarTree:
+        store = ColumnarTree("bench")
+        for i in range(count):
+            store._append(0, 0, f"file_{i}.bin", i, f"user{i % 10}", 0)
+        return store
+
+    holder: list = []
+    peak = peak_memory(lambda: holder.append(build()))
+    print(f"{'bytes per columnar row':<40} {peak / count:10.1f} B")
+    store = holder[0]
+
+    def full_pass() -> None:
+        store._aggregates = None
+        store.root.size()
+
+    timed("columnar subtree-size pass", full_pass, repeat=3)
+    timed("columnar to_dict()", store.root.to_dict, repeat=3)
+
+
+def bench_snapshot() -> None:
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.fsnp")
+        timed("save()", lambda: root.save(path), repeat=3)
+        timed("load()", lambda: Directory.load(path), repeat=3)
+        data = json.loads(json.dumps(root.to_dict()))
+        timed("from_dict()", lambda: Directory.from_dict(data), repeat=3)
+        json_path = os.path.join(tmp, "tree.json")
+
+        def stream() -> None:
+            with open(json_path, "w", encoding="utf-8") as fp:
+                root.write_json(fp)
+
+        timed("write_json()", stream, repeat=3)
+
+
+def bench_bulk_import(count: int = 100_000) -> None:
+    def build(bulk: bool) -> None:
+        root = build_tree(depth=12, width=1, files_per_dir=0)
+        leaves = [root.find_by_path("/".join(f"dir_{d}_0" for d in range(12)))]
+        files = [File(f"import_{i}.bin", i) for i in range(count)]
+        if bulk:
+            with root.batch():
+                for i, node in enumerate(files):
+                    leaves[i % len(leaves)].add(node)
+        else:
+            for i, node in enumerate(files):
+                leaves[i % len(leaves)].add(node)
+
+    timed(f"import {count} files one by one", lambda: build(False), repeat=3)
+    timed(f"import {count} files in batch()", lambda: build(True), repeat=3)
+
+
+def bench_scan(dirs: int = 200, files_per_dir: int = 100) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for d in range(dirs):
+            sub = os.path.join(tmp, f"d{d // 20}", f"d{d}")
+            os.makedirs(sub)
+            for f in range(files_per_dir):
+                with open(os.path.join(sub, f"f{f}.bin"), "wb") as fh:
+                    fh.write(b"x" * f)
+        print(f"scan: {dirs * files_per_dir} files on disk")
+        timed("from_filesystem(workers=1)",
+              lambda: Directory.from_filesystem(tmp, workers=1), repeat=3)
+        timed("from_filesystem(workers=8)",
+              lambda: Directory.from_filesystem(tmp, workers=8), repeat=3)
+
+
+def bench_query() -> None:
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+    root.find_by_path("dir_0_3/dir_1_2/dir_2_1").add(File("huge.iso", 1 << 30))
+    root._subtree_stats()
+    timed("query size>1GB (pruned)", lambda: root.query().size(min=1 << 30).run())
+    timed("query size>1GB (no pruning)",
+          lambda: root.query().where(lambda n: n.size() >= 1 << 30).run(), repeat=3)
+
+
+def bench_snapshots() -> None:
+    from src.snapshot import diff
+
+    root = build_tree(depth=5, width=6, files_per_dir=20)
+    target = root.find_by_path("dir_0_3/dir_1_2/dir_2_1")
+    timed("to_dict() copy", root.to_dict, repeat=3)
+    timed("snapshot()", lambda: root.snapshot().release())
+    before = root.snapshot()
+    timed("add() x1000 while a snapshot lives",
+          lambda: [target.add(File(f"s_{i}.tmp", i)) or target.remove(f"s_{i}.tmp")
+                   for i in range(1000)], repeat=3)
+    target.add(File("late.bin", 1))
+    after = root.snapshot()
+    timed("diff() of one change", lambda: diff(before, after))
+    before.release()
+    after.release()
+
+
+def bench_locking() -> None:
+    # runs last: enabling locking anywhere switches on the lock lookups
+    root = build_tree(depth=4, width=5, files_per_dir=10)
+    paths = root.list_paths()[:2000]
+    lookups = [p.split("/", 1)[1] for p in paths]
+
+    def read_all():
+        for path in lookups:
+            root.find_by_path(path)
+
+    timed("2000 find_by_path() unlocked", read_all)
+    root.enable_locking()
+    timed("2000 find_by_path() read-locked", read_all)
+
+
+# --- Reproducible suite --------------------------------------------------
+# A spec is a list of (parent index, name, size or None for a directory);
+# index 0 is the root, node i + 1 is spec[i].
+
+DEEP_LEVELS = 200  # to_dict() recurses, so the chain stays well under the limit
+SUITE_OPS = ("add", "size", "find_cold", "find", "remove", "list_paths", "tree", "to_dict")
+
+
+def wide_spec(nodes: int) -> list:
+    """One level of directories with ten files each under the root."""
+    spec = []
+    for d in range(max(1, nodes // 11)):
+        spec.append((0, f"d{d}", None))
+        parent = len(spec)
+        spec.extend((parent, f"f{d}_{f}.bin", 100 + f) for f in range(10))
+    return spec
+
+
+def deep_spec(nodes: int) -> list:
+    """A chain of DEEP_LEVELS directories with the files spread along it."""
+    levels = min(DEEP_LEVELS, max(1, nodes // 2))
+    spec = [(d, f"d{d}", None) for d in range(levels)]
+    spec.extend((1 + i % levels, f"f{i}.bin", 100 + i % 1000) for i in range(nodes - levels))
+    return spec
+
+
+def skewed_spec(nodes: int, seed: int = 0) -> list:
+    """Nine in ten files in one hot directory, the rest in a random tree."""
+    rng = random.Random(seed)
+    spec = [(0, "hot", None)]
+    dirs = [0]
+    for i in range(nodes - 1):
+        if rng.random() < 0.9:
+            spec.append((1, f"f{i}.bin", rng.randrange(1, 1 << 20)))
+        elif rng.random() < 0.2:
+            spec.append((rng.choice(dirs), f"d{i}", None))
+            dirs.append(len(spec))
+        else:
+            spec.append((rng.choice(dirs), f"f{i}.bin", rng.randrange(1, 1 << 20)))
+    return spec
+
+
+SHAPES = {"wide": wide_spec, "deep": deep_spec, "skewed": skewed_spec}
+
+
+def make_nodes(spec: list) -> list:
+    nodes = [Directory("root")]
+    nodes.extend(Directory(name) if size is None else File(name, size) for _, name, size in spec)
+    return nodes
+
+
+def attach(spec: list, nodes: list) -> Directory:
+    for i, (parent, _, _) in enumerate(spec, 1):
+        nodes[parent].add(nodes[i])
+    return nodes[0]
+
+
+def best_of(repeat: int, run, setup=lambda: None) -> float:
+    """Best wall time of ``run(setup())``; setup is not timed."""
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        run(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_shape(shape: str, nodes: int, repeat: int = 3, seed: int = 0) -> dict:
+    """Seconds per workload (``<op>_s``) and ``bytes_per_node`` for one tree."""
+    spec = skewed_spec(nodes, seed) if shape == "skewed" else SHAPES[shape](nodes)
+    built = make_nodes(spec)
+    root = attach(spec, built)
+    directories = [n for n in built if isinstance(n, Directory)]
+    rng = random.Random(seed)
+    files = [name for _, name, size in spec if size is not None]
+    lookups = [rng.choice(files) for _ in range(1000)]
+    removals = [spec[i][:2] for i in rng.sample(range(len(spec)), min(1000, len(spec)))]
+
+    def remove_all(nodes: list) -> None:
+        for parent, name in removals:
+            nodes[parent].remove(name)
+
+    def fresh() -> list:
+        nodes = make_nodes(spec)
+        attach(spec, nodes)
+        return nodes
+
+    def size_all(_) -> None:
+        for directory in directories:
+            directory.size()
+
+    results = {
+        "add_s": best_of(repeat, lambda nodes: attach(spec, nodes), lambda: make_nodes(spec)),
+        "size_s": best_of(repeat, size_all),
+        # the first find builds the name index
+        "find_cold_s": best_of(repeat, lambda nodes: nodes[0].find(lookups[0]), fresh),
+        "find_s": best_of(repeat, lambda _: [root.find(name) for name in lookups]),
+        "remove_s": best_of(repeat, remove_all, fresh),
+        "list_paths_s": best_of(repeat, lambda _: root.list_paths()),
+        "tree_s": best_of(repeat, lambda _: root.tree()),
+        "to_dict_s": best_of(repeat, lambda _: root.to_dict()),
+    }
+    held: list = []
+    results["bytes_per_node"] = peak_memory(lambda: held.append(fresh())) / (len(spec) + 1)
+    return results
+
+
+def run_suite(shapes, sizes, repeat: int = 3, seed: int = 0) -> dict:
+    results = {}
+    for shape in shapes:
+        for nodes in sizes:
+            for metric, value in bench_shape(shape, nodes, repeat, seed).items():
+                key = f"{shape}/{nodes}/{metric}"
+                results[key] = value
+                unit = "B" if metric == "bytes_per_node" else "ms"
+                shown = value if unit == "B" else value * 1000
+                print(f"{key:<40} {shown:12.3f} {unit}")
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25,
+            min_seconds: float = 1e-4) -> list[str]:
+    """Keys that got more than ``threshold`` slower (or bigger) than the baseline.
+
+    Timings where both runs are under ``min_seconds`` are too noisy to judge.
+    """
+    regressions = []
+    old, new = baseline["results"], current["results"]
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        if key.endswith("_s") and max(before, after) < min_seconds:
+            continue
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<40} {before:12.6g} -> {after:12.6g}  x{ratio:5.2f}{flag}")
+    for key in sorted(old.keys() - new.keys()):
+        print(f"{key:<40} missing from the current run")
+    return regressions
+
+
+def run_micro() -> None:
+    bench_size_cache()
+    bench_path_resolution()
+    bench_name_index()
+    bench_streaming()
+    bench_memory_per_node()
+    bench_columnar()
+    bench_snapshot()
+    bench_bulk_import()
+    bench_scan()
+    bench_query()
+    bench_snapshots()
+    bench_locking()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command")
+    suite = commands.add_parser("suite", help="time generated trees and write a JSON baseline")
+    suite.add_argument("--shapes", default="wide,deep,skewed")
+    suite.add_argument("--nodes", default="1000,10000,100000",
+                       help="comma-separated node counts (10^7 needs several GB of RAM)")
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--out", help="write results to this JSON file")
+    cmp = commands.add_parser("compare", help="flag regressions between two JSON results")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if args.command == "suite":
+        report = run_suite(args.shapes.split(","), [int(n) for n in args.nodes.split(",")],
+                           args.repeat, args.seed)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        return 0
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        print(f"{len(regressions)} regression(s)")
+        return 1 if regressions else 0
+    run_micro()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
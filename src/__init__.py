@@ -1,6 +1,8 @@
 from .node import Node
 from .file import File
+from .link import Link
 from .directory import Directory
+from .columnar import ColumnarTree
 
-__all__ = ["Node", "File", "Directory"]
+__all__ = ["Node", "File", "Link", "Directory", "ColumnarTree"]
 
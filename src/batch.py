@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import heapq
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from src import versions
+
+_active: ContextVar[Optional["Batch"]] = ContextVar("filesystem_batch", default=None)
+
+
+def current_batch() -> Optional["Batch"]:
+    return _active.get()
+
+
+class Batch:
+    """Deferred metadata updates collected while a ``batch()`` block runs.
+
+    Aggregate deltas and largest-file / newest-mtime updates are parked on
+    the directory that received them and timestamps are only recorded;
+    ``flush`` pushes each kind up the tree once per ancestor and stamps all
+    touched nodes with one clock read.
+    """
+
+    __slots__ = ("stamp", "pending", "touched", "modified", "raised", "dropped", "roots")
+
+    def __init__(self) -> None:
+        self.stamp: int = time.time_ns()
+        self.pending: dict = {}
+        self.touched: dict = {}
+        # explicit timestamps that must survive the final touch
+        self.modified: dict = {}
+        # directory -> (max size, newest ns) to fold into / invalidate above it;
+        # a dropped None invalidates unconditionally
+        self.raised: dict = {}
+        self.dropped: dict = {}
+        # directory -> top of its tree, until a directory is attached or detached
+        self.roots: dict = {}
+
+    def set_modified(self, node, modified_ns: int) -> None:
+        self.modified[node] = modified_ns
+
+    def defer(self, directory, size_delta: int, count_delta: int, link_delta: int = 0) -> None:
+        totals = self.pending.get(directory)
+        if totals is None:
+            self.pending[directory] = [size_delta, count_delta, link_delta]
+        else:
+            totals[0] += size_delta
+            totals[1] += count_delta
+            totals[2] += link_delta
+
+    def raise_stats(self, directory, max_size: int, newest_ns: int) -> None:
+        stats = self.raised.get(directory)
+        self.raised[directory] = (max_size, newest_ns) if stats is None else _max_stats(
+            stats, (max_size, newest_ns))
+
+    def drop_stats(self, directory, max_size: int | None, newest_ns: int | None) -> None:
+        stats = (max_size, newest_ns) if max_size is not None else None
+        if directory in self.dropped:
+            stats = _merge_drops(self.dropped[directory], stats)
+        self.dropped[directory] = stats
+
+    def root_of(self, directory):
+        """The top of ``directory``'s tree, walking each ancestor once per batch."""
+        roots = self.roots
+        root = roots.get(directory)
+        if root is None:
+            path = []
+            current = directory
+            while root is None:
+                path.append(current)
+                if current.parent is None:
+                    root = current
+                else:
+                    current = current.parent
+                    root = roots.get(current)
+            for member in path:
+                roots[member] = root
+        return root
+
+    def forget_roots(self) -> None:
+        self.roots.clear()
+
+    def flush(self) -> None:
+        _settle(self.pending, _apply_totals, _add_totals)
+        stamp = time.time_ns()
+        # stamping a file moves the newest mtime above it; collect that here too
+        token = _active.set(self)
+        try:
+            for node in self.touched:
+                node._set_modified_ns(stamp)
+            for node, modified_ns in self.modified.items():
+                node._set_modified_ns(modified_ns)
+        finally:
+            _active.reset(token)
+        self.touched.clear()
+        self.modified.clear()
+        self.roots.clear()
+        # raises first: a later drop then invalidates whatever they may have overstated
+        _settle(self.raised, lambda d, stats: d._raise_stats_here(*stats), _max_stats)
+        _settle(self.dropped, lambda d, stats: d._drop_stats_here(stats), _merge_drops)
+
+
+@contextmanager
+def batch() -> Iterator[Batch]:
+    """Defer touching and aggregate propagation until the block exits.
+
+    Nested blocks join the outermost one. Cached sizes read inside the
+    block may be stale; they are exact again once it exits.
+    """
+    active = _active.get()
+    if active is not None:
+        yield active
+        return
+    active = Batch()
+    token = _active.set(active)
+    try:
+        yield active
+    finally:
+        _active.reset(token)
+        active.flush()
+
+
+def _settle(pending: dict, apply, merge) -> None:
+    """Run ``apply(directory, value)`` on each parked directory and its ancestors.
+
+    Directories are visited deepest first, so values meeting at a common
+    ancestor are combined with ``merge`` and every ancestor is applied once.
+    ``apply`` returns whether the value still has to go further up.
+    """
+    heap = []
+    for order, directory in enumerate(pending):
+        heap.append((-_depth(directory), order, directory))
+    heapq.heapify(heap)
+    order = len(heap)
+    while heap:
+        neg_depth, _, directory = heapq.heappop(heap)
+        value = pending.pop(directory)
+        if not apply(directory, value):
+            continue
+        parent = directory.parent
+        if parent is None:
+            continue
+        if parent in pending:
+            pending[parent] = merge(pending[parent], value)
+        else:
+            order += 1
+            pending[parent] = value
+            heapq.heappush(heap, (neg_depth + 1, order, parent))
+
+
+def _apply_totals(directory, totals: list[int]) -> bool:
+    size, count, links = totals
+    if not size and not count and not links:
+        return False
+    if versions.recording:
+        versions.preserve(directory)
+    directory._size += size
+    directory._file_count += count
+    directory._link_count += links
+    return True
+
+
+def _add_totals(a: list[int], b: list[int]) -> list[int]:
+    return [a[0] + b[0], a[1] + b[1], a[2] + b[2]]
+
+
+def _max_stats(a: tuple[int, int], b: tuple[int, int]) -> tuple[int, int]:
+    return max(a[0], b[0]), max(a[1], b[1])
+
+
+def _merge_drops(a: Optional[tuple[int, int]], b: Optional[tuple[int, int]]):
+    # either one reaching a cached maximum invalidates it, as does the larger pair
+    if a is None or b is None:
+        return None
+    return _max_stats(a, b)
+
+
+def _depth(node) -> int:
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import time
+from array import array
+from datetime import datetime
+from typing import Iterator, Optional
+
+from src.directory import Directory
+from src.file import File
+from src.node import Node
+
+_FILE = 0
+_DIR = 1
+# parent id of a row that was removed from the tree
+_DETACHED = -2
+
+
+class ColumnarTree:
+    """Array-backed storage for very large trees.
+
+    Every node is one row across parallel typed arrays. Rows are only ever
+    appended, so a parent always has a smaller row id than its children and
+    subtree aggregates are a single reverse pass over the arrays; after that
+    pass, a mutation only adjusts the rows on its path to the root. The
+    ``ColumnarDirectory`` / ``ColumnarFile`` views expose the usual
+    ``Directory`` / ``File`` API on top of row ids.
+    """
+
+    __slots__ = (
+        "_kind", "_parent", "_size", "_created", "_modified", "_owner",
+        "_name_start", "_name_end", "_names", "_owners", "_owner_ids",
+        "_first_child", "_last_child", "_next_sibling", "_aggregates",
+    )
+
+    def __init__(self, name: str, owner: Optional[str] = None) -> None:
+        self._kind = array("b")
+        self._parent = array("q")
+        self._size = array("q")
+        self._created = array("q")
+        self._modified = array("q")
+        self._owner = array("l")
+        # names are utf-8 slices of one shared buffer
+        self._name_start = array("q")
+        self._name_end = array("q")
+        self._names = bytearray()
+        self._owners: list[str] = []
+        self._owner_ids: dict[str, int] = {}
+        # children of a row as a singly linked list, in insertion order
+        self._first_child = array("q")
+        self._last_child = array("q")
+        self._next_sibling = array("q")
+        # (subtree sizes, subtree file counts), built on first use and then
+        # kept current by every mutation
+        self._aggregates: tuple[array, array] | None = None
+        self._append(_DIR, -1, name, 0, owner, time.time_ns())
+
+    @classmethod
+    def from_directory(cls, directory: Directory) -> ColumnarTree:
+        store = cls(directory.name, directory.owner)
+        store._created[0] = directory._created_ns
+        store._modified[0] = directory._modified_ns
+        for child in directory._children.values():
+            store._copy_in(child, 0)
+        return store
+
+    @property
+    def root(self) -> ColumnarDirectory:
+        return ColumnarDirectory(self, 0)
+
+    def __len__(self) -> int:
+        return len(self._kind)
+
+    # --- Row level ---------------------------------------------------------
+    def _append(self, kind: int, parent: int, name: str, size: int,
+                owner: Optional[str], stamp: int) -> int:
+        row = len(self._kind)
+        encoded = name.encode()
+        self._kind.append(kind)
+        self._parent.append(parent)
+        self._size.append(size)
+        self._created.append(stamp)
+        self._modified.append(stamp)
+        self._owner.append(self._owner_id(owner))
+        self._name_start.append(len(self._names))
+        self._names += encoded
+        self._name_end.append(len(self._names))
+        self._first_child.append(-1)
+        self._last_child.append(-1)
+        self._next_sibling.append(-1)
+        if parent >= 0:
+            last = self._last_child[parent]
+            if last < 0:
+                self._first_child[parent] = row
+            else:
+                self._next_sibling[last] = row
+            self._last_child[parent] = row
+        if self._aggregates is not None:
+            sizes, counts = self._aggregates
+            sizes.append(0)
+            counts.append(0)
+            self._fold(row, size, 1 - kind)
+        return row
+
+    def _owner_id(self, owner: Optional[str]) -> int:
+        if owner is None:
+            return -1
+        owner_id = self._owner_ids.get(owner)
+        if owner_id is None:
+            owner_id = self._owner_ids[owner] = len(self._owners)
+            self._owners.append(owner)
+        return owner_id
+
+    def _copy_in(self, node: Node, parent: int) -> int:
+        """Append ``node`` and its subtree under row ``parent``."""
+        top = -1
+        stack = [(node, parent)]
+        while stack:
+            current, parent_row = stack.pop()
+            if isinstance(current, Directory):
+                row = self._append(_DIR, parent_row, current.name, 0,
+                                   current.owner, current._created_ns)
+                stack.extend((child, row) for child in reversed(current._children.values()))
+            elif isinstance(current, File):
+                row = self._append(_FILE, parent_row, current.name, current.size_bytes,
+                                   current.owner, current._created_ns)
+            else:
+                raise TypeError(f"cannot store {type(current).__name__} in a ColumnarTree")
+            self._modified[row] = current._modified_ns
+            if top < 0:
+                top = row
+        return top
+
+    def _unlink(self, row: int) -> None:
+        parent = self._parent[row]
+        previous = -1
+        current = self._first_child[parent]
+        while current != row:
+            previous, current = current, self._next_sibling[current]
+        following = self._next_sibling[row]
+        if previous < 0:
+            self._first_child[parent] = following
+        else:
+            self._next_sibling[previous] = following
+        if self._last_child[parent] == row:
+            self._last_child[parent] = previous
+        if self._aggregates is not None:
+            sizes, counts = self._aggregates
+            self._fold(parent, -sizes[row], -counts[row])
+        self._parent[row] = _DETACHED
+        self._next_sibling[row] = -1
+
+    def _fold(self, row: int, size_delta: int, count_delta: int) -> None:
+        """Apply a change below ``row`` to its cached aggregates and its ancestors'."""
+        sizes, counts = self._aggregates
+        parents = self._parent
+        while row >= 0:
+            sizes[row] += size_delta
+            counts[row] += count_delta
+            row = parents[row]
+
+    def _name(self, row: int) -> str:
+        return self._names[self._name_start[row]:self._name_end[row]].decode()
+
+    def _children(self, row: int) -> Iterator[int]:
+        child = self._first_child[row]
+        while child >= 0:
+            yield child
+            child = self._next_sibling[child]
+
+    def _child_by_name(self, row: int, name: str) -> int:
+        encoded = name.encode()
+        for child in self._children(row):
+            if self._names[self._name_start[child]:self._name_end[child]] == encoded:
+                return child
+        return -1
+
+    def _view(self, row: int) -> ColumnarNode:
+        if self._kind[row] == _DIR:
+            return ColumnarDirectory(self, row)
+        return ColumnarFile(self, row)
+
+    # --- Whole-array passes -----------------------------------------------
+    def _subtree_aggregates(self) -> tuple[array, array]:
+        if self._aggregates is None:
+            sizes = array("q", self._size)
+            counts = array("q", (1 - kind for kind in self._kind))
+            parents = self._parent
+            # children come after parents, so one reverse sweep folds every row up
+            for row in range(len(sizes) - 1, 0, -1):
+                parent = parents[row]
+                if parent >= 0:
+                    sizes[parent] += sizes[row]
+                    counts[parent] += counts[row]
+            self._aggregates = (sizes, counts)
+        return self._aggregates
+
+    def _iter_paths(self, top: int, prefix: str) -> Iterator[str]:
+        """File paths below ``top`` in pre-order, as ``Directory.iter_paths`` yields them."""
+        base = f"{prefix}/{self._name(top)}" if prefix else self._name(top)
+        if self._kind[top] == _FILE:
+            yield base
+            return
+        kinds = self._kind
+        # one (path, pending children) frame per open directory; rows appended
+        # later to an earlier directory still come out under it
+        stack = [(base, self._children(top))]
+        while stack:
+            base, pending = stack[-1]
+            for row in pending:
+                path = f"{base}/{self._name(row)}"
+                if kinds[row] == _DIR:
+                    stack.append((path, self._children(row)))
+                    break
+                yield path
+            else:
+                stack.pop()
+
+    def _to_dict(self, top: int) -> dict:
+        parents = self._parent
+        built = {top: self._row_dict(top)}
+        for row in range(top + 1, len(self._kind)):
+            parent_dict = built.get(parents[row])
+            if parent_dict is None:
+                continue
+            built[row] = self._row_dict(row)
+            parent_dict["children"].append(built[row])
+        return built[top]
+
+    def _row_dict(self, row: int) -> dict:
+        owner_id = self._owner[row]
+        common = {
+            "name": self._name(row),
+            "owner": self._owners[owner_id] if owner_id >= 0 else None,
+            "created_at": _from_ns(self._created[row]).isoformat(),
+            "modified_at": _from_ns(self._modified[row]).isoformat(),
+        }
+        if self._kind[row] == _FILE:
+            return {"type": "file", "name": common.pop("name"), "size": self._size[row], **common}
+        return {"type": "dir", **common, "children": []}
+
+
+class ColumnarNode:
+    """Thin view over one row of a ``ColumnarTree``."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: ColumnarTree, row: int) -> None:
+        self._store = store
+        self._row = row
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, ColumnarNode)
+                and other._store is self._store and other._row == self._row)
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._row))
+
+    @property
+    def name(self) -> str:
+        return self._store._name(self._row)
+
+    @property
+    def owner(self) -> Optional[str]:
+        owner_id = self._store._owner[self._row]
+        return self._store._owners[owner_id] if owner_id >= 0 else None
+
+    @property
+    def parent(self) -> Optional[ColumnarDirectory]:
+        parent = self._store._parent[self._row]
+        return ColumnarDirectory(self._store, parent) if parent >= 0 else None
+
+    @property
+    def created_at(self) -> datetime:
+        return _from_ns(self._store._created[self._row])
+
+    @property
+    def modified_at(self) -> datetime:
+        return _from_ns(self._store._modified[self._row])
+
+    def _touch(self) -> None:
+        self._store._modified[self._row] = time.time_ns()
+
+    def rename(self, new_name: str) -> None:
+        if not isinstance(new_name, str) or new_name == "":
+            raise ValueError("new_name must be a non-empty string")
+        if new_name == self.name:
+            return
+        store = self._store
+        parent = store._parent[self._row]
+        if parent >= 0 and store._child_by_name(parent, new_name) >= 0:
+            raise ValueError(f"'{store._name(parent)}' already contains '{new_name}'")
+        # the old bytes stay in the buffer; names are append-only like rows
+        store._name_start[self._row] = len(store._names)
+        store._names += new_name.encode()
+        store._name_end[self._row] = len(store._names)
+        self._touch()
+
+    def size(self) -> int:
+        return self._store._subtree_aggregates()[0][self._row]
+
+    def file_count(self) -> int:
+        return self._store._subtree_aggregates()[1][self._row]
+
+    def list_paths(self, prefix: str = "") -> list[str]:
+        return list(self.iter_paths(prefix=prefix))
+
+    def iter_paths(self, prefix: str = "") -> Iterator[str]:
+        return self._store._iter_paths(self._row, prefix)
+
+    def tree(self, indent: int = 0) -> str:
+        return "\n".join(self.iter_tree_lines(indent=indent))
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        store = self._store
+        sizes = store._subtree_aggregates()[0]
+        stack = [(indent, iter((self._row,)))]
+        while stack:
+            depth, pending = stack[-1]
+            for row in pending:
+                if store._kind[row] == _DIR:
+                    yield (" " * depth) + f"{store._name(row)}/ ({sizes[row]} B)"
+                    stack.append((depth + 2, store._children(row)))
+                    break
+                yield (" " * depth) + f"{store._name(row)} ({store._size[row]} B)"
+            else:
+                stack.pop()
+
+    def to_dict(self) -> dict:
+        return self._store._to_dict(self._row)
+
+
+class ColumnarFile(ColumnarNode):
+    __slots__ = ()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._store._size[self._row]
+
+    def modify(self, new_size: Optional[int] = None) -> None:
+        if new_size is not None and int(new_size) != self.size_bytes:
+            store = self._store
+            old_size = store._size[self._row]
+            store._size[self._row] = int(new_size)
+            if store._aggregates is not None:
+                store._fold(self._row, store._size[self._row] - old_size, 0)
+            self._touch()
+
+
+class ColumnarDirectory(ColumnarNode):
+    __slots__ = ()
+
+    @property
+    def children(self) -> tuple[ColumnarNode, ...]:
+        store = self._store
+        return tuple(store._view(row) for row in store._children(self._row))
+
+    def add(self, node: Node) -> None:
+        """Copy an in-memory ``File`` / ``Directory`` (and its subtree) into the store."""
+        if not isinstance(node, Node):
+            raise TypeError("add() expects a Node")
+        if self._store._child_by_name(self._row, node.name) >= 0:
+            raise ValueError(f"'{self.name}' already contains '{node.name}'")
+        self._store._copy_in(node, self._row)
+        self._touch()
+
+    def remove(self, name: str) -> bool:
+        store = self._store
+        row = store._child_by_name(self._row, name)
+        if row < 0:
+            found = next((n for n in self._iter_nodes() if n.name == name and n != self), None)
+            if found is None:
+                return False
+            row = found._row
+        parent = store._parent[row]
+        store._unlink(row)
+        while parent >= 0:
+            store._modified[parent] = time.time_ns()
+            if parent == self._row:
+                break
+            parent = store._parent[parent]
+        return True
+
+    def find(self, name: str) -> Optional[ColumnarNode]:
+        return next((n for n in self._iter_nodes() if n.name == name), None)
+
+    def find_by_path(self, path: str) -> Optional[ColumnarNode]:
+        store = self._store
+        row = self._row
+        for part in path.split("/"):
+            if not part or part == ".":
+                continue
+            if part == "..":
+                row = store._parent[row]
+            elif store._kind[row] == _DIR:
+                row = store._child_by_name(row, part)
+            else:
+                row = -1
+            if row < 0:
+                return None
+        return store._view(row)
+
+    def _iter_nodes(self) -> Iterator[ColumnarNode]:
+        """Views of this directory and its subtree in pre-order."""
+        store = self._store
+        stack = [self._row]
+        while stack:
+            row = stack.pop()
+            yield store._view(row)
+            stack.extend(reversed(list(store._children(row))))
+
+
+def _from_ns(stamp: int) -> datetime:
+    return datetime.fromtimestamp(stamp / 1e9)
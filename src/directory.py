@@ -1,68 +1,541 @@
+from __future__ import annotations
+
+import heapq
+import os
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from fnmatch import fnmatchcase
+
+from src import instrument, versions
+from src.batch import Batch, batch, current_batch
 from src.file import File
+from src.link import Link
+from src.locking import (
+    RWLock, enable, read_locked, reading, write_locked, writing, writing_all,
+)
 from src.node import Node
 
 
 class Directory(Node):
+    __slots__ = ("_children", "_size", "_file_count", "_link_count",
+                 "_max_file_size", "_newest_ns", "_name_index", "_lock")
+
     def __init__(self, name: str, owner: str | None = None):
         super().__init__(name=name, owner=owner)
-        self.children: list[File | Directory] = []
+        # name -> child; dicts keep insertion order, so this is also the listing
+        self._children: dict[str, File | Directory] = {}
+        # aggregates of the whole subtree, kept current by _propagate()
+        self._size: int = 0
+        self._file_count: int = 0
+        self._link_count: int = 0
+        # largest file and newest file mtime below; None until computed or
+        # after a change that may have lowered them (see _subtree_stats)
+        self._max_file_size: int | None = None
+        self._newest_ns: int | None = None
+        # name -> nodes of the subtree, built lazily and only on a root
+        self._name_index: dict[str, dict[Node, None]] | None = None
+        # reader/writer lock of the whole tree, only on a root (enable_locking)
+        self._lock: RWLock | None = None
+
+    @property
+    def children(self) -> tuple[File | Directory, ...]:
+        """Read-only; change the listing with ``add`` / ``remove`` / ``move``."""
+        return tuple(self._children.values())
+
+    def _version_state(self) -> tuple:
+        return super()._version_state() + (self._size, self._file_count, self._link_count)
 
     # --- Mutations ---------------------------------------------------------
+    @write_locked
     def add(self, node: Node) -> None:
         if not isinstance(node, Node):
             raise TypeError("add() expects a Node")
+        existing = self._children.get(node.name)
+        if existing is node:
+            return
+        if existing is not None:
+            raise ValueError(f"'{self.name}' already contains '{node.name}'")
+        if isinstance(node, Directory):
+            if _is_within(self, node):
+                raise ValueError("cannot add a directory into its own subtree")
+            # only the top of a tree owns an index and a lock
+            node._name_index = None
+            node._lock = None
+        if node.parent is not None:
+            node.parent._detach(node)
+        if versions.recording:
+            versions.preserve(node)
+            versions.preserve(self, children=True)
         # attach parent and add to children
         node.parent = self
-        self.children.append(node)
+        self._children[node.name] = node
+        active = current_batch()
+        if active is not None and isinstance(node, Directory):
+            active.forget_roots()
+        self._propagate(node.size(), node.file_count(), node.link_count())
+        self._stats_raise(*_stats_of(node))
+        index = self._root()._name_index
+        if index is not None:
+            for member in _walk(node):
+                index.setdefault(member.name, {})[member] = None
         self._touch()
 
+    @write_locked
     def remove(self, name: str) -> bool:
-        for index, child in enumerate(self.children):
-            if child.name == name:
-                del self.children[index]
-                self._touch()
-                return True
-        # try recursively
-        for child in self.children:
-            if isinstance(child, Directory) and child.remove(name):
-                self._touch()
-                return True
-        return False
+        child = self._children.get(name)
+        if child is None:
+            # fall back to the first match deeper in the tree
+            child = next((n for n in self._find_all(name) if n is not self), None)
+            if child is None:
+                return False
+        parent = child.parent
+        parent._detach(child)
+        while parent is not None:
+            parent._touch()
+            if parent is self:
+                break
+            parent = parent.parent
+        return True
+
+    @write_locked
+    def add_many(self, nodes: Iterable[Node]) -> None:
+        with self.batch():
+            for node in nodes:
+                self.add(node)
+
+    @write_locked
+    def remove_many(self, names: Iterable[str]) -> int:
+        removed = 0
+        with self.batch():
+            for name in names:
+                removed += self.remove(name)
+        return removed
+
+    def move(self, name: str, to_dir: Directory) -> Node | None:
+        """Move the child ``name`` (or the first match below) into ``to_dir``."""
+        # both trees up front and in a fixed order; see writing_all
+        with writing_all(self, to_dir):
+            child = self._children.get(name)
+            if child is None:
+                child = next((n for n in self._find_all(name) if n is not self), None)
+                if child is None:
+                    return None
+            old_parent = child.parent
+            to_dir.add(child)
+            old_parent._touch()
+            return child
+
+    def batch(self) -> AbstractContextManager[Batch]:
+        """Group mutations; sizes and timestamps are settled once on exit."""
+        if self._root()._lock is None:
+            return batch()
+        return _locked_batch(self)
+
+    # --- Snapshots ---------------------------------------------------------
+    def snapshot(self):
+        """An O(1) read-only view of this subtree as it is now (see ``src.snapshot``).
+
+        Later changes save what they overwrite while the view is alive;
+        compare two views with ``src.snapshot.diff``.
+        """
+        from src.snapshot import take
+
+        if current_batch() is not None:
+            raise RuntimeError("cannot take a snapshot inside batch(); sizes are not settled")
+        return take(self)
+
+    # --- Locking -----------------------------------------------------------
+    def enable_locking(self) -> RWLock:
+        """Make this tree safe to share between threads (see ``src.locking``).
+
+        Queries then run in parallel while mutations take the tree alone.
+        Lazy iterators (``iter_paths``, ``iter_tree_lines``) do not lock;
+        consume them inside ``reading()``.
+        """
+        return enable(self)
+
+    def reading(self) -> AbstractContextManager[None]:
+        """Hold the tree's read lock across several calls."""
+        return reading(self)
+
+    def writing(self) -> AbstractContextManager[None]:
+        """Hold the tree's write lock across several calls."""
+        return writing(self)
+
+    def _detach(self, node: Node) -> None:
+        if versions.recording:
+            versions.preserve(node)
+            versions.preserve(self, children=True)
+        del self._children[node.name]
+        index = self._root()._name_index
+        if index is not None:
+            for member in _walk(node):
+                _index_discard(index, member.name, member)
+        node.parent = None
+        if isinstance(node, Directory):
+            active = current_batch()
+            if active is not None:
+                active.forget_roots()
+        self._propagate(-node.size(), -node.file_count(), -node.link_count())
+        self._stats_drop(*_stats_of(node))
+
+    def _rename_child(self, node: Node, new_name: str) -> None:
+        if new_name in self._children:
+            raise ValueError(f"'{self.name}' already contains '{new_name}'")
+        if versions.recording:
+            versions.preserve(self, children=True)
+        # rebuild to keep the child at its original position
+        self._children = {
+            (new_name if child is node else key): child
+            for key, child in self._children.items()
+        }
+        index = self._root()._name_index
+        if index is not None:
+            _index_discard(index, node.name, node)
+            index.setdefault(new_name, {})[node] = None
+
+    def _root(self) -> Directory:
+        active = current_batch()
+        if active is not None:
+            return active.root_of(self)
+        current = self
+        while current.parent is not None:
+            current = current.parent
+        return current
+
+    def _stats_raise(self, max_size: int | None, newest_ns: int | None) -> None:
+        """Fold a node that grew (or was added) into the cached maxima above it."""
+        if max_size is None:
+            self._stats_drop(None, None)
+            return
+        active = current_batch()
+        if active is not None:
+            active.raise_stats(self, max_size, newest_ns)
+            return
+        # inlined _raise_stats_here: this runs for every add outside a batch
+        current: Directory | None = self
+        while current is not None:
+            if current._max_file_size is not None:
+                if max_size <= current._max_file_size and newest_ns <= current._newest_ns:
+                    break
+                current._max_file_size = max(current._max_file_size, max_size)
+                current._newest_ns = max(current._newest_ns, newest_ns)
+            current = current.parent
+
+    def _stats_drop(self, max_size: int | None, newest_ns: int | None) -> None:
+        """Invalidate the maxima a shrinking (or removed) node may have defined."""
+        active = current_batch()
+        if active is not None:
+            active.drop_stats(self, max_size, newest_ns)
+            return
+        stats = (max_size, newest_ns) if max_size is not None else None
+        current: Directory | None = self
+        while current is not None and current._drop_stats_here(stats):
+            current = current.parent
+
+    def _raise_stats_here(self, max_size: int, newest_ns: int) -> bool:
+        """One step of ``_stats_raise``; False once the ancestors need no change."""
+        # a stale directory recomputes from its children; those above may not
+        if self._max_file_size is not None:
+            if max_size <= self._max_file_size and newest_ns <= self._newest_ns:
+                return False
+            self._max_file_size = max(self._max_file_size, max_size)
+            self._newest_ns = max(self._newest_ns, newest_ns)
+        return True
+
+    def _drop_stats_here(self, stats: tuple[int, int] | None) -> bool:
+        """One step of ``_stats_drop``; ``None`` invalidates unconditionally."""
+        if self._max_file_size is not None:
+            if (stats is not None and stats[0] < self._max_file_size
+                    and stats[1] < self._newest_ns):
+                # defined elsewhere, so nothing higher up depends on it
+                return False
+            self._max_file_size = None
+            self._newest_ns = None
+        return True
+
+    def _subtree_stats(self) -> tuple[int, int]:
+        """(largest file size, newest file mtime ns) below, -1 if there are no files."""
+        if self._max_file_size is None:
+            # post-order over the stale directories only
+            stack: list[tuple[Directory, bool]] = [(self, False)]
+            while stack:
+                directory, ready = stack.pop()
+                if not ready:
+                    stack.append((directory, True))
+                    stack.extend((child, False) for child in directory._children.values()
+                                 if isinstance(child, Directory) and child._max_file_size is None)
+                    continue
+                max_size = newest_ns = -1
+                for child in directory._children.values():
+                    stats = _stats_of(child)
+                    max_size = max(max_size, stats[0])
+                    newest_ns = max(newest_ns, stats[1])
+                directory._max_file_size = max_size
+                directory._newest_ns = newest_ns
+        return self._max_file_size, self._newest_ns
+
+    @write_locked
+    def rename(self, new_name: str) -> None:
+        old_name = self.name
+        super().rename(new_name)
+        if self._name_index is not None and self.name != old_name:
+            _index_discard(self._name_index, old_name, self)
+            self._name_index.setdefault(self.name, {})[self] = None
+
+    def _propagate(self, size_delta: int, count_delta: int, link_delta: int = 0) -> None:
+        """Apply aggregate deltas to this directory and every ancestor."""
+        if not size_delta and not count_delta and not link_delta:
+            return
+        active = current_batch()
+        if active is not None:
+            active.defer(self, size_delta, count_delta, link_delta)
+            return
+        if versions.recording:
+            versions.preserve(self)
+        current: Directory | None = self
+        while current is not None:
+            current._size += size_delta
+            current._file_count += count_delta
+            current._link_count += link_delta
+            current = current.parent
 
     # --- Queries -----------------------------------------------------------
+    @read_locked
     def find(self, name: str) -> Node | None:
-        if self.name == name:
-            return self
-        for child in self.children:
-            if child.name == name:
-                return child
-            if isinstance(child, Directory):
-                found = child.find(name)
-                if found is not None:
-                    return found
-        return None
+        return next(iter(self._find_all(name)), None)
+
+    @read_locked
+    def find_all(self, name: str) -> list[Node]:
+        """Every node in this subtree (itself included) called ``name``, in pre-order."""
+        return list(self._find_all(name))
+
+    @read_locked
+    def glob(self, pattern: str) -> list[Node]:
+        """Every node in this subtree whose name matches a shell-style pattern, in pre-order."""
+        index = self._root()._ensure_name_index()
+        matches: list[Node] = []
+        for name, nodes in index.items():
+            if fnmatchcase(name, pattern):
+                matches.extend(n for n in nodes if _is_within(n, self))
+        return _in_tree_order(matches)
+
+    def _find_all(self, name: str) -> Iterable[Node]:
+        # index buckets keep insertion order; results are always in tree pre-order
+        root = self._root()
+        candidates = root._ensure_name_index().get(name, {})
+        if root is self:
+            if instrument._enabled:
+                instrument.count("find.visits")
+            return _in_tree_order(candidates)
+        if len(candidates) > self._file_count:
+            # a common name in a small subtree: walking it is cheaper
+            nodes = _walk(self)
+            if instrument._enabled:
+                nodes = instrument.counting(nodes, "find.visits")
+            return [n for n in nodes if n.name == name]
+        if instrument._enabled:
+            instrument.count("find.visits", len(candidates))
+        return _in_tree_order(n for n in candidates if _is_within(n, self))
+
+    def _ensure_name_index(self) -> dict[str, dict[Node, None]]:
+        if self._name_index is None:
+            index: dict[str, dict[Node, None]] = {}
+            for node in _walk(self):
+                index.setdefault(node.name, {})[node] = None
+            self._name_index = index
+        return self._name_index
+
+    def query(self):
+        """Start a filter query over this subtree (see ``src.query.Query``)."""
+        from src.query import Query
+
+        return Query(self)
+
+    @read_locked
+    def find_by_path(self, path: str) -> Node | None:
+        """Resolve a '/'-separated path relative to this directory."""
+        node: Node | None = self
+        for part in _split_path(path):
+            node = _step(node, part)
+            if node is None:
+                return None
+        return node
+
+    @read_locked
+    def resolve_many(self, paths: Iterable[str]) -> dict[str, Node | None]:
+        """Resolve many paths at once, walking each shared prefix only once."""
+        # every resolved prefix, keyed by its raw spelling
+        resolved: dict[str, Node | None] = {"": self}
+        results: dict[str, Node | None] = {}
+        for path in paths:
+            pending: list[tuple[str, str]] = []
+            prefix = path
+            while prefix not in resolved:
+                head, _, part = prefix.rpartition("/")
+                pending.append((prefix, part))
+                prefix = head
+            node = resolved[prefix]
+            for prefix, part in reversed(pending):
+                if part and part != ".":
+                    node = _step(node, part)
+                resolved[prefix] = node
+            results[path] = node
+        return results
 
     # --- Introspection ----------------------------------------------------
-    def size(self) -> int:
-        total = 0
-        for child in self.children:
-            total += child.size()
-        return total
+    @read_locked
+    def size(self, follow_links: bool = False, count_links: str = "each") -> int:
+        """Cached subtree size; ``follow_links`` adds what links point at.
 
-    def list_paths(self, prefix: str = "") -> list[str]:
-        base = f"{prefix}/{self.name}" if prefix else self.name
-        paths: list[str] = []
-        for child in self.children:
-            paths.extend(child.list_paths(prefix=base))
+        ``count_links="each"`` counts a target once per link reaching it,
+        ``"once"`` counts every node reachable from here exactly once.
+        """
+        if not follow_links or not self._link_count:
+            if instrument._enabled:
+                instrument.count("size.visits")
+            return self._size
+        if count_links == "each":
+            return _linked_size(self, {}, set())
+        if count_links == "once":
+            return _reachable_size(self)
+        raise ValueError("count_links must be 'each' or 'once'")
+
+    def file_count(self) -> int:
+        return self._file_count
+
+    def link_count(self) -> int:
+        return self._link_count
+
+    @read_locked
+    def list_paths(self, prefix: str = "", follow_links: bool = False) -> list[str]:
+        paths = list(self.iter_paths(prefix=prefix, follow_links=follow_links))
+        if instrument._enabled:
+            instrument.count("list_paths.paths", len(paths))
         return paths
 
-    def tree(self, indent: int = 0) -> str:
-        lines: list[str] = []
-        lines.append((" " * indent) + f"{self.name}/ ({self.size()} B)")
-        for child in self.children:
-            lines.append(child.tree(indent=indent + 2))
-        return "\n".join(lines)
+    def iter_paths(self, prefix: str = "", follow_links: bool = False) -> Iterator[str]:
+        base = f"{prefix}/{self.name}" if prefix else self.name
+        return self._iter_paths_from(base, follow_links=follow_links)
+
+    def _iter_paths_from(self, base: str, follow_links: bool = False) -> Iterator[str]:
+        # one (path, pending children) frame per open directory
+        stack = [(base, iter(self._children.values()), self)]
+        # directories on the current stack; a link back into one is not expanded
+        active = {id(self)}
+        while stack:
+            base, pending, _ = stack[-1]
+            for child in pending:
+                if isinstance(child, Directory):
+                    stack.append((f"{base}/{child.name}", iter(child._children.values()), child))
+                    active.add(id(child))
+                    break
+                if isinstance(child, File):
+                    yield f"{base}/{child.name}"
+                    continue
+                target = child.resolve() if follow_links and isinstance(child, Link) else None
+                if isinstance(target, Directory) and id(target) not in active:
+                    stack.append((f"{base}/{child.name}", iter(target._children.values()), target))
+                    active.add(id(target))
+                    break
+                if isinstance(target, File) or isinstance(child, Link):
+                    yield f"{base}/{child.name}"
+                else:
+                    yield from child.iter_paths(prefix=base)
+            else:
+                _, _, directory = stack.pop()
+                active.discard(id(directory))
 
+    @read_locked
+    def tree(self, indent: int = 0, max_depth: int | None = None,
+             min_size: int | None = None) -> str:
+        return "\n".join(self.iter_tree_lines(indent=indent, max_depth=max_depth,
+                                               min_size=min_size))
+
+    def iter_tree_lines(self, indent: int = 0, max_depth: int | None = None,
+                        min_size: int | None = None) -> Iterator[str]:
+        """Lines of ``tree()``; children smaller than ``min_size`` are left out
+        and directories deeper than ``max_depth`` are listed but not opened."""
+        yield (" " * indent) + f"{self.name}/ ({self.size()} B)"
+        if max_depth is not None and max_depth < 1:
+            return
+        stack = [(indent + 2, iter(self._children.values()))]
+        while stack:
+            depth, pending = stack[-1]
+            for child in pending:
+                if min_size is not None and child.size() < min_size:
+                    continue
+                if isinstance(child, Directory):
+                    yield (" " * depth) + f"{child.name}/ ({child.size()} B)"
+                    if max_depth is None or len(stack) < max_depth:
+                        stack.append((depth + 2, iter(child._children.values())))
+                        break
+                    continue
+                yield from child.iter_tree_lines(indent=depth)
+            else:
+                stack.pop()
+
+    # --- Reports ----------------------------------------------------------
+    @read_locked
+    def top_files(self, k: int) -> list[File]:
+        """The ``k`` largest files below, largest first.
+
+        Best-first over the cached largest-file size of each directory, so
+        only subtrees that can still hold a top file are opened.
+        """
+        result: list[File] = []
+        heap: list[tuple[int, int, Node]] = []
+        order = 0
+        candidates: Iterable[Node] = self._children.values()
+        while True:
+            for node in candidates:
+                if isinstance(node, File):
+                    heapq.heappush(heap, (-node.size_bytes, order, node))
+                elif isinstance(node, Directory):
+                    largest = node._subtree_stats()[0]
+                    if largest >= 0:
+                        heapq.heappush(heap, (-largest, order, node))
+                order += 1
+            if not heap or len(result) >= k:
+                return result
+            _, _, node = heapq.heappop(heap)
+            if isinstance(node, File):
+                result.append(node)
+                candidates = ()
+            else:
+                candidates = node._children.values()
+
+    @read_locked
+    def top_dirs(self, k: int) -> list[Directory]:
+        """The ``k`` largest directories below (by cached size), largest first.
+
+        A directory is never larger than its parent, so a max-heap that
+        only opens popped directories yields them in order.
+        """
+        result: list[Directory] = []
+        heap: list[tuple[int, int, Directory]] = []
+        order = 0
+        directory: Directory = self
+        while True:
+            for child in directory._children.values():
+                if isinstance(child, Directory):
+                    heapq.heappush(heap, (-child._size, order, child))
+                    order += 1
+            if not heap or len(result) >= k:
+                return result
+            _, _, directory = heapq.heappop(heap)
+            result.append(directory)
+
+    @read_locked
+    def usage_by_owner(self) -> dict[str | None, int]:
+        """Bytes of files below, per owner, largest first."""
+        usage: dict[str | None, int] = {}
+        for node in _walk(self):
+            if isinstance(node, File):
+                usage[node.owner] = usage.get(node.owner, 0) + node.size_bytes
+        return dict(sorted(usage.items(), key=lambda item: item[1], reverse=True))
+
+    @read_locked
     def to_dict(self) -> dict:
         return {
             "type": "dir",
@@ -70,5 +543,186 @@ class Directory(Node):
             "owner": self.owner,
             "created_at": self.created_at.isoformat(),
             "modified_at": self.modified_at.isoformat(),
-            "children": [child.to_dict() for child in self.children],
+            "children": [child.to_dict() for child in self._children.values()],
         }
+
+    def sync(self, path: str | os.PathLike, check_files: bool = False,
+             follow_symlinks: bool = False, ignore: Iterable[str] = ()):
+        """Apply what changed on disk under ``path`` and return the ``Changes``."""
+        from src.scan import sync
+
+        return sync(self, path, check_files=check_files,
+                    follow_symlinks=follow_symlinks, ignore=ignore)
+
+    # --- Persistence ------------------------------------------------------
+    @classmethod
+    def from_filesystem(cls, path: str | os.PathLike, workers: int | None = None,
+                        follow_symlinks: bool = False,
+                        ignore: Iterable[str] = ()) -> Directory:
+        """Mirror a real directory tree (see ``src.scan``)."""
+        from src.scan import from_filesystem
+
+        return from_filesystem(path, workers=workers, follow_symlinks=follow_symlinks,
+                               ignore=ignore)
+
+    @read_locked
+    def save(self, path: str | os.PathLike) -> None:
+        """Write this tree as a binary snapshot (see ``src.storage``)."""
+        from src.storage import save
+
+        save(self, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, lazy: bool = False,
+             max_loaded: int | None = None) -> Directory:
+        """Read a snapshot; ``lazy`` keeps subtrees on disk until accessed."""
+        from src.storage import load, load_lazy
+
+        if lazy:
+            return load_lazy(path, max_loaded=max_loaded)
+        return load(path)
+
+    @read_locked
+    def write_json(self, fp) -> None:
+        """Stream ``to_dict()`` as JSON into a text file object."""
+        from src.storage import write_json
+
+        write_json(self, fp)
+
+
+instrument.register(Directory, "size", "find", "find_all", "list_paths")
+
+
+@contextmanager
+def _locked_batch(directory: Directory) -> Iterator[Batch]:
+    # flush runs before the write lock is let go
+    with writing(directory), batch() as active:
+        yield active
+
+
+def _stats_of(node: Node) -> tuple[int | None, int | None]:
+    if isinstance(node, File):
+        return node.size_bytes, node._modified_ns
+    if isinstance(node, Directory):
+        return node._max_file_size, node._newest_ns
+    return -1, -1
+
+
+def _linked_size(node: Node, memo: dict[int, int], active: set[int]) -> int:
+    """Size with every link counted per reference; memoized per call."""
+    if isinstance(node, Link):
+        node = node.resolve()
+        if node is None:
+            return 0
+    if not isinstance(node, Directory) or not node._link_count:
+        return node.size()
+    key = id(node)
+    if key in memo:
+        return memo[key]
+    if key in active:
+        # a link back into a directory being summed: the cycle adds nothing
+        return 0
+    active.add(key)
+    total = node._size
+    stack = [node]
+    visited = 0
+    while stack:
+        directory = stack.pop()
+        visited += 1
+        for child in directory._children.values():
+            if isinstance(child, Link):
+                total += _linked_size(child, memo, active)
+            elif isinstance(child, Directory) and child._link_count:
+                stack.append(child)
+    active.discard(key)
+    memo[key] = total
+    if instrument._enabled:
+        instrument.count("size.visits", visited)
+    return total
+
+
+def _reachable_size(top: Node) -> int:
+    """Size of every file reachable through children and links, each counted once."""
+    seen: set[int] = set()
+    total = 0
+    stack = [top]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Link):
+            node = node.resolve()
+            if node is None:
+                continue
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, Directory):
+            stack.extend(node._children.values())
+        else:
+            total += node.size()
+    if instrument._enabled:
+        instrument.count("size.visits", len(seen))
+    return total
+
+
+def _walk(node: Node) -> Iterator[Node]:
+    """Pre-order walk of ``node`` and its descendants without recursion."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        if isinstance(current, Directory):
+            stack.extend(reversed(current._children.values()))
+
+
+def _is_within(node: Node | None, directory: Directory) -> bool:
+    while node is not None:
+        if node is directory:
+            return True
+        node = node.parent
+    return False
+
+
+def _in_tree_order(nodes: Iterable[Node]) -> list[Node]:
+    """``nodes`` sorted the way a pre-order walk of their tree meets them."""
+    nodes = list(nodes)
+    if len(nodes) < 2:
+        return nodes
+    # position of each child, computed once per directory on the way up
+    positions: dict[Directory, dict[Node, int]] = {}
+
+    def key(node: Node) -> list[int]:
+        path = []
+        while node.parent is not None:
+            parent = node.parent
+            order = positions.get(parent)
+            if order is None:
+                order = positions[parent] = {
+                    child: i for i, child in enumerate(parent._children.values())}
+            path.append(order[node])
+            node = parent
+        path.reverse()
+        return path
+
+    return sorted(nodes, key=key)
+
+
+def _index_discard(index: dict[str, dict[Node, None]], name: str, node: Node) -> None:
+    nodes = index.get(name)
+    if nodes is not None:
+        nodes.pop(node, None)
+        if not nodes:
+            del index[name]
+
+
+def _split_path(path: str) -> list[str]:
+    return [part for part in path.split("/") if part and part != "."]
+
+
+def _step(node: Node | None, part: str) -> Node | None:
+    if node is None:
+        return None
+    if part == "..":
+        return node.parent
+    if isinstance(node, Directory):
+        return node._children.get(part)
+    return None
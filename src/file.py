@@ -1,35 +1,74 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Iterator, Optional
 
+from src import versions
+from src.locking import write_locked
 from src.node import Node
 
 
 class File(Node):
+    __slots__ = ("size_bytes",)
+
     def __init__(self, name: str, size_bytes: int = 0, owner: Optional[str] = None) -> None:
         super().__init__(name=name, owner=owner)
         self.size_bytes: int = int(size_bytes)
 
     # --- Mutations ---------------------------------------------------------
+    @write_locked
     def modify(self, new_size: Optional[int] = None) -> None:
         changed: bool = False
         if new_size is not None and int(new_size) != self.size_bytes:
+            old_size = self.size_bytes
+            if versions.recording:
+                versions.preserve(self)
             self.size_bytes = int(new_size)
+            if self.parent is not None:
+                self.parent._propagate(self.size_bytes - old_size, 0)
+                if self.size_bytes > old_size:
+                    self.parent._stats_raise(self.size_bytes, -1)
+                else:
+                    self.parent._stats_drop(old_size, -1)
             changed = True
         if changed:
             self._touch()
 
+    def _set_modified_ns(self, modified_ns: int) -> None:
+        if versions.recording:
+            versions.preserve(self)
+        old_ns = self._modified_ns
+        self._modified_ns = modified_ns
+        if self.parent is not None:
+            if modified_ns > old_ns:
+                self.parent._stats_raise(-1, modified_ns)
+            else:
+                self.parent._stats_drop(-1, old_ns)
+
+    def _version_state(self) -> tuple:
+        return super()._version_state() + (self.size_bytes,)
+
     # --- Introspection ----------------------------------------------------
     def size(self) -> int:
         return self.size_bytes
 
+    def file_count(self) -> int:
+        return 1
+
+    def link_count(self) -> int:
+        return 0
+
     def list_paths(self, prefix: str = "") -> list[str]:
-        base = f"{prefix}/{self.name}" if prefix else self.name
-        return [base]
+        return list(self.iter_paths(prefix=prefix))
+
+    def iter_paths(self, prefix: str = "") -> Iterator[str]:
+        yield f"{prefix}/{self.name}" if prefix else self.name
 
     def tree(self, indent: int = 0) -> str:
         return (" " * indent) + f"{self.name} ({self.size_bytes} B)"
 
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        yield self.tree(indent=indent)
+
     def to_dict(self) -> dict:
         return {
             "type": "file",
@@ -0,0 +1,242 @@
+"""Opt-in counters, timers and trace events for hot paths.
+
+Nothing is recorded until ``enable()`` (or ``FS_INSTRUMENT=1`` in the
+environment). Methods registered with ``register`` are only wrapped while
+enabled, so they cost nothing otherwise; ``count``/``span``/``timed``
+cost one global check.
+Results come out of ``report()`` as a plain dict, ``write_json`` or
+``write_chrome_trace`` (load the file in chrome://tracing or Perfetto).
+
+``FS_PROFILE=cprofile`` and/or ``FS_PROFILE=tracemalloc`` (comma-separated)
+profile the whole process from import to exit; output goes next to
+``FS_PROFILE_OUT`` (default ``fs_profile``) as ``.prof`` / ``.tracemalloc.txt``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, TypeVar
+
+# flipped by enable(); instrumented calls check it before anything else
+_enabled = False
+
+# trace events kept for write_chrome_trace; older ones are dropped past this
+MAX_EVENTS = 100_000
+
+F = TypeVar("F", bound=Callable)
+
+_guard = threading.Lock()
+_counters: dict[str, int] = {}
+# name -> [calls, total ns, min ns, max ns]
+_timers: dict[str, list[int]] = {}
+# (name, start ns, duration ns, thread id)
+_events: list[tuple[str, int, int, int]] = []
+_origin = time.perf_counter_ns()
+# (class, attribute, original function) for register()
+_methods: list[tuple[type, str, Callable]] = []
+
+
+def enable() -> None:
+    global _enabled
+    if not _enabled:
+        for owner, attr, original in _methods:
+            setattr(owner, attr, _timed(original, attr))
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    if _enabled:
+        for owner, attr, original in _methods:
+            setattr(owner, attr, original)
+    _enabled = False
+
+
+def register(owner: type, *attrs: str) -> None:
+    """Time ``owner.<attr>`` calls as ``"<attr>"`` while enabled.
+
+    The method is swapped for a timing wrapper on ``enable()`` and back on
+    ``disable()``, leaving the disabled path untouched.
+    """
+    for attr in attrs:
+        original = owner.__dict__[attr]
+        _methods.append((owner, attr, original))
+        if _enabled:
+            setattr(owner, attr, _timed(original, attr))
+
+
+def reset() -> None:
+    """Drop everything recorded so far."""
+    with _guard:
+        _counters.clear()
+        _timers.clear()
+        _events.clear()
+
+
+def count(name: str, n: int = 1) -> None:
+    if not _enabled:
+        return
+    with _guard:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def counting(items: Iterable, name: str) -> Iterator:
+    """Pass ``items`` through, counting each one under ``name``."""
+    n = 0
+    try:
+        for item in items:
+            n += 1
+            yield item
+    finally:
+        count(name, n)
+
+
+def _record(name: str, start: int, duration: int) -> None:
+    with _guard:
+        stats = _timers.get(name)
+        if stats is None:
+            _timers[name] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration < stats[2]:
+                stats[2] = duration
+            if duration > stats[3]:
+                stats[3] = duration
+        if len(_events) >= MAX_EVENTS:
+            del _events[: MAX_EVENTS // 10]
+        _events.append((name, start, duration, threading.get_ident()))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the ``with`` body under ``name`` (a no-op while disabled)."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _record(name, start, time.perf_counter_ns() - start)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator: time every call of the function under ``name``."""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(name, start, time.perf_counter_ns() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def _timed(func: Callable, name: str) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(name, start, time.perf_counter_ns() - start)
+
+    return wrapper
+
+
+def report() -> dict:
+    """Counters and per-name timer stats (milliseconds) recorded so far."""
+    with _guard:
+        timers = {
+            name: {
+                "calls": calls,
+                "total_ms": total / 1e6,
+                "mean_ms": total / calls / 1e6,
+                "min_ms": low / 1e6,
+                "max_ms": high / 1e6,
+            }
+            for name, (calls, total, low, high) in _timers.items()
+        }
+        return {"counters": dict(_counters), "timers": timers}
+
+
+def write_json(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, indent=2, sort_keys=True)
+
+
+def write_chrome_trace(path: str) -> None:
+    """Timed calls as complete ("X") events plus final counter values."""
+    pid = os.getpid()
+    with _guard:
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - _origin) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, duration, tid in _events
+        ]
+        end = max((e["ts"] + e["dur"] for e in events), default=0)
+        events.extend(
+            {"name": name, "ph": "C", "ts": end, "pid": pid, "args": {"value": value}}
+            for name, value in _counters.items()
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _profile_from_env() -> None:
+    modes = {m.strip() for m in os.environ.get("FS_PROFILE", "").split(",") if m.strip()}
+    if not modes:
+        return
+    out = os.environ.get("FS_PROFILE_OUT", "fs_profile")
+
+    if "cprofile" in modes:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def dump_profile() -> None:
+            profiler.disable()
+            profiler.dump_stats(f"{out}.prof")
+
+        atexit.register(dump_profile)
+
+    if "tracemalloc" in modes:
+        import tracemalloc
+
+        tracemalloc.start(int(os.environ.get("FS_TRACEMALLOC_FRAMES", "1")))
+
+        def dump_allocations() -> None:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+            tracemalloc.stop()
+            with open(f"{out}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"current: {current} B, peak: {peak} B\n")
+                f.writelines(f"{stat}\n" for stat in top)
+
+        atexit.register(dump_allocations)
+
+
+if os.environ.get("FS_INSTRUMENT"):
+    enable()
+_profile_from_env()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional
+
+from src.node import Node
+
+
+class Link(Node):
+    """Symbolic link to another node of the tree.
+
+    A link adds nothing to the cached size and file count of its
+    directories; traversals follow it only when asked to.
+    """
+
+    __slots__ = ("target",)
+
+    def __init__(self, name: str, target: Optional[Node], owner: Optional[str] = None) -> None:
+        super().__init__(name=name, owner=owner)
+        self.target: Optional[Node] = target
+
+    def resolve(self) -> Optional[Node]:
+        """The first non-link node along the chain, or None if it dangles or loops."""
+        seen: set[int] = set()
+        node: Optional[Node] = self
+        while isinstance(node, Link):
+            if id(node) in seen:
+                return None
+            seen.add(id(node))
+            node = node.target
+        return node
+
+    def _version_state(self) -> tuple:
+        return super()._version_state() + (self.target,)
+
+    # --- Introspection ----------------------------------------------------
+    def size(self, follow_links: bool = False, count_links: str = "each") -> int:
+        if not follow_links:
+            return 0
+        from src.directory import Directory
+
+        target = self.resolve()
+        if target is None:
+            return 0
+        if isinstance(target, Directory):
+            return target.size(follow_links=True, count_links=count_links)
+        return target.size()
+
+    def file_count(self) -> int:
+        return 0
+
+    def link_count(self) -> int:
+        return 1
+
+    def list_paths(self, prefix: str = "", follow_links: bool = False) -> list[str]:
+        return list(self.iter_paths(prefix=prefix, follow_links=follow_links))
+
+    def iter_paths(self, prefix: str = "", follow_links: bool = False) -> Iterator[str]:
+        path = f"{prefix}/{self.name}" if prefix else self.name
+        if follow_links:
+            from src.directory import Directory
+
+            target = self.resolve()
+            if isinstance(target, Directory):
+                yield from target._iter_paths_from(path, follow_links=True)
+                return
+        yield path
+
+    def tree(self, indent: int = 0) -> str:
+        target = self.target.path() if self.target is not None else "?"
+        return (" " * indent) + f"{self.name} -> {target}"
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        yield self.tree(indent=indent)
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "link",
+            "name": self.name,
+            "target": self.target.path() if self.target is not None else None,
+            "owner": self.owner,
+            "created_at": self.created_at.isoformat(),
+            "modified_at": self.modified_at.isoformat(),
+        }
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar
+
+# flipped by the first enable(); until then locked methods skip the lookup
+_enabled = False
+
+F = TypeVar("F", bound=Callable)
+
+
+class RWLock:
+    """Reentrant reader/writer lock.
+
+    Any number of threads may read at once; a writer waits for them to
+    leave and holds the lock alone. Waiting writers go before new readers.
+    A thread may nest reads and writes inside its own write, and reads
+    inside its own read, but cannot upgrade a read to a write.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        # per-thread read depth, so nested reads never wait on a queued writer
+        self._local = threading.local()
+
+    def acquire_read(self) -> None:
+        local = self._local
+        depth = getattr(local, "reads", 0)
+        if depth or self._writer == threading.get_ident():
+            local.reads = depth + 1
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        local.reads = 1
+
+    def release_read(self) -> None:
+        local = self._local
+        local.reads -= 1
+        if local.reads or self._writer == threading.get_ident():
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("cannot take the write lock while holding the read lock")
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        self._write_depth -= 1
+        if self._write_depth:
+            return
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+
+
+def enable(root) -> RWLock:
+    """Give the tree topped by ``root`` a lock (kept if it already has one)."""
+    global _enabled
+    if root.parent is not None:
+        raise ValueError("locking is enabled on the top of a tree")
+    if root._lock is None:
+        root._lock = RWLock()
+    _enabled = True
+    return root._lock
+
+
+def tree_lock(node) -> Optional[RWLock]:
+    while node.parent is not None:
+        node = node.parent
+    return getattr(node, "_lock", None)
+
+
+def _acquire(node, write: bool) -> Optional[RWLock]:
+    """Lock the tree ``node`` belongs to; None if that tree has no lock."""
+    while True:
+        lock = tree_lock(node)
+        if lock is None:
+            return None
+        lock.acquire_write() if write else lock.acquire_read()
+        # the node may have been moved to another tree while we waited
+        if tree_lock(node) is lock:
+            return lock
+        lock.release_write() if write else lock.release_read()
+
+
+@contextmanager
+def reading(node) -> Iterator[None]:
+    """Hold the read lock of the tree ``node`` belongs to, if it has one."""
+    lock = _acquire(node, write=False) if _enabled else None
+    try:
+        yield
+    finally:
+        if lock is not None:
+            lock.release_read()
+
+
+@contextmanager
+def writing(node) -> Iterator[None]:
+    """Hold the write lock of the tree ``node`` belongs to, if it has one."""
+    lock = _acquire(node, write=True) if _enabled else None
+    try:
+        yield
+    finally:
+        if lock is not None:
+            lock.release_write()
+
+
+@contextmanager
+def writing_all(*nodes) -> Iterator[None]:
+    """Hold the write locks of every tree ``nodes`` belong to.
+
+    The locks are taken in a fixed (``id``) order, so two threads locking
+    the same trees in opposite argument order cannot deadlock.
+    """
+    locks = _acquire_all(nodes) if _enabled else []
+    try:
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.release_write()
+
+
+def _acquire_all(nodes) -> list[RWLock]:
+    while True:
+        locks = _tree_locks(nodes)
+        for lock in locks:
+            lock.acquire_write()
+        # as in _acquire: a node may have changed trees while we waited
+        if _tree_locks(nodes) == locks:
+            return locks
+        for lock in reversed(locks):
+            lock.release_write()
+
+
+def _tree_locks(nodes) -> list[RWLock]:
+    locks = {id(lock): lock for lock in map(tree_lock, nodes) if lock is not None}
+    return [locks[key] for key in sorted(locks)]
+
+
+def read_locked(method: F) -> F:
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return method(self, *args, **kwargs)
+        lock = _acquire(self, write=False)
+        if lock is None:
+            return method(self, *args, **kwargs)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+
+    return wrapper  # type: ignore[return-value]
+
+
+def write_locked(method: F) -> F:
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return method(self, *args, **kwargs)
+        lock = _acquire(self, write=True)
+        if lock is None:
+            return method(self, *args, **kwargs)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+
+    return wrapper  # type: ignore[return-value]
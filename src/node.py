@@ -1,41 +1,117 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import sys
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
+
+from src import versions
+from src.batch import current_batch
+from src.locking import write_locked
 
 
 class Node:
     """Base filesystem node with common metadata and helpers."""
 
+    # timestamps are kept as integer nanoseconds since the epoch
+    __slots__ = ("name", "owner", "_created_ns", "_modified_ns", "parent")
+
     def __init__(self, name: str, owner: Optional[str] = None) -> None:
-        self.name: str = name
-        self.owner: Optional[str] = owner
-        self.created_at: datetime = datetime.now()
-        self.modified_at: datetime = datetime.now()
+        self.name: str = sys.intern(name)
+        self.owner: Optional[str] = sys.intern(owner) if owner is not None else None
+        active = current_batch()
+        self._created_ns: int = active.stamp if active is not None else time.time_ns()
+        self._modified_ns: int = self._created_ns
         self.parent: Optional["Directory"] = None
 
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self._created_ns / 1e9)
+
+    @created_at.setter
+    def created_at(self, value: datetime) -> None:
+        if versions.recording:
+            versions.preserve(self)
+        self._created_ns = int(value.timestamp() * 1e9)
+
+    @property
+    def modified_at(self) -> datetime:
+        return datetime.fromtimestamp(self._modified_ns / 1e9)
+
+    @modified_at.setter
+    def modified_at(self, value: datetime) -> None:
+        self._set_modified_ns(int(value.timestamp() * 1e9))
+
     # --- Metadata helpers -------------------------------------------------
     def _touch(self) -> None:
-        self.modified_at = datetime.now()
+        active = current_batch()
+        if active is not None:
+            active.touched[self] = None
+        else:
+            self._set_modified_ns(time.time_ns())
+
+    def _set_modified_ns(self, modified_ns: int) -> None:
+        if versions.recording:
+            versions.preserve(self)
+        self._modified_ns = modified_ns
+
+    def _version_state(self) -> tuple:
+        """What a snapshot keeps of this node (see ``src.versions``)."""
+        return (self.name, self.owner, self._created_ns, self._modified_ns, self.parent)
 
+    @write_locked
     def rename(self, new_name: str) -> None:
         if not isinstance(new_name, str) or new_name == "":
             raise ValueError("new_name must be a non-empty string")
         if new_name != self.name:
-            self.name = new_name
+            if self.parent is not None:
+                self.parent._rename_child(self, new_name)
+            if versions.recording:
+                versions.preserve(self)
+            self.name = sys.intern(new_name)
             self._touch()
 
+    def path(self) -> str:
+        """'/'-joined names from the top of the tree down to this node."""
+        names = []
+        node: Optional[Node] = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "/".join(reversed(names))
+
+    # --- Serialization ----------------------------------------------------
+    @classmethod
+    def from_dict(cls, data: dict) -> "Node":
+        from src.storage import from_dict
+
+        node = from_dict(data)
+        if not isinstance(node, cls):
+            raise ValueError(f"expected {cls.__name__} data, got type {data.get('type')!r}")
+        return node
+
     # --- Introspection ----------------------------------------------------
     def size(self) -> int:
         raise NotImplementedError("size() is not implemented for Node")
 
+    def file_count(self) -> int:
+        raise NotImplementedError("file_count() is not implemented for Node")
+
+    def link_count(self) -> int:
+        raise NotImplementedError("link_count() is not implemented for Node")
+
     def list_paths(self, prefix: str = "") -> list[str]:
         raise NotImplementedError("list_paths() is not implemented for Node")
 
+    def iter_paths(self, prefix: str = "") -> Iterator[str]:
+        raise NotImplementedError("iter_paths() is not implemented for Node")
+
     def tree(self, indent: int = 0) -> str:
         raise NotImplementedError("tree() is not implemented for Node")
 
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        raise NotImplementedError("iter_tree_lines() is not implemented for Node")
+
     def to_dict(self) -> dict:
         raise NotImplementedError("to_dict() is not implemented for Node")
 
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import heapq
+import re
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Callable, Iterator, Optional
+
+from src.directory import Directory
+from src.file import File
+from src.link import Link
+from src.locking import reading
+from src.node import Node
+
+_KINDS = {"file": File, "dir": Directory, "link": Link, "any": Node}
+
+_ORDER_KEYS: dict[str, Callable[[Node], object]] = {
+    "size": lambda node: node.size(),
+    "name": lambda node: node.name,
+    "modified": lambda node: node._modified_ns,
+    "created": lambda node: node._created_ns,
+    "path": lambda node: node.path(),
+}
+
+
+class Query:
+    """Filter builder over a subtree, run as one pruned pre-order walk.
+
+    Filters combine with AND. For file queries, directories whose cached
+    largest file or newest file mtime rule out every match are skipped
+    without being entered.
+    """
+
+    def __init__(self, root: Directory) -> None:
+        self._root = root
+        self._kind: type = File
+        self._min_size: Optional[int] = None
+        self._max_size: Optional[int] = None
+        self._owners: Optional[frozenset[Optional[str]]] = None
+        self._patterns: list[Callable[[str], bool]] = []
+        self._after_ns: Optional[int] = None
+        self._before_ns: Optional[int] = None
+        self._min_depth = 0
+        self._max_depth: Optional[int] = None
+        self._predicates: list[Callable[[Node], bool]] = []
+        self._limit: Optional[int] = None
+        self._order: Optional[tuple[Callable[[Node], object], bool]] = None
+
+    # --- Builder ----------------------------------------------------------
+    def kind(self, kind: str) -> Query:
+        if kind not in _KINDS:
+            raise ValueError(f"kind must be one of {sorted(_KINDS)}")
+        self._kind = _KINDS[kind]
+        return self
+
+    def size(self, min: Optional[int] = None, max: Optional[int] = None) -> Query:
+        self._min_size = min
+        self._max_size = max
+        return self
+
+    def owner(self, *owners: Optional[str]) -> Query:
+        self._owners = frozenset(owners)
+        return self
+
+    def name(self, pattern: str) -> Query:
+        self._patterns.append(lambda name: fnmatchcase(name, pattern))
+        return self
+
+    def regex(self, pattern: str) -> Query:
+        self._patterns.append(re.compile(pattern).search)
+        return self
+
+    def modified(self, after: Optional[datetime] = None,
+                 before: Optional[datetime] = None) -> Query:
+        self._after_ns = _to_ns(after) if after is not None else None
+        self._before_ns = _to_ns(before) if before is not None else None
+        return self
+
+    def depth(self, min: int = 0, max: Optional[int] = None) -> Query:
+        """Depth below the query root: its children are at depth 1."""
+        self._min_depth = min
+        self._max_depth = max
+        return self
+
+    def where(self, predicate: Callable[[Node], bool]) -> Query:
+        self._predicates.append(predicate)
+        return self
+
+    def limit(self, count: int) -> Query:
+        self._limit = count
+        return self
+
+    def order_by(self, key: str | Callable[[Node], object], descending: bool = False) -> Query:
+        if isinstance(key, str):
+            if key not in _ORDER_KEYS:
+                raise ValueError(f"order key must be one of {sorted(_ORDER_KEYS)}")
+            key = _ORDER_KEYS[key]
+        self._order = (key, descending)
+        return self
+
+    # --- Execution --------------------------------------------------------
+    def run(self) -> list[Node]:
+        with reading(self._root):
+            return self._run()
+
+    def _run(self) -> list[Node]:
+        matches = self._matches()
+        if self._order is None:
+            if self._limit is None:
+                return list(matches)
+            return [node for node, _ in zip(matches, range(self._limit))]
+        key, descending = self._order
+        if self._limit is not None:
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            return pick(self._limit, matches, key=key)
+        return sorted(matches, key=key, reverse=descending)
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.run())
+
+    def count(self) -> int:
+        with reading(self._root):
+            return sum(1 for _ in self._matches())
+
+    def paths(self) -> list[str]:
+        with reading(self._root):
+            return [node.path() for node in self._run()]
+
+    def _matches(self) -> Iterator[Node]:
+        files_only = self._kind is File
+        stack: list[tuple[Node, int]] = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth >= self._min_depth and self._accepts(node):
+                yield node
+            if not isinstance(node, Directory):
+                continue
+            if self._max_depth is not None and depth >= self._max_depth:
+                continue
+            if files_only and self._prunes(node):
+                continue
+            stack.extend((child, depth + 1) for child in reversed(node._children.values()))
+
+    def _prunes(self, directory: Directory) -> bool:
+        if self._min_size is None and self._after_ns is None:
+            return False
+        max_size, newest_ns = directory._subtree_stats()
+        if self._min_size is not None and max_size < self._min_size:
+            return True
+        return self._after_ns is not None and newest_ns < self._after_ns
+
+    def _accepts(self, node: Node) -> bool:
+        if not isinstance(node, self._kind):
+            return False
+        if self._min_size is not None or self._max_size is not None:
+            size = node.size()
+            if self._min_size is not None and size < self._min_size:
+                return False
+            if self._max_size is not None and size > self._max_size:
+                return False
+        if self._owners is not None and node.owner not in self._owners:
+            return False
+        if self._after_ns is not None and node._modified_ns < self._after_ns:
+            return False
+        if self._before_ns is not None and node._modified_ns >= self._before_ns:
+            return False
+        if any(not matches(node.name) for matches in self._patterns):
+            return False
+        return all(predicate(node) for predicate in self._predicates)
+
+
+def _to_ns(moment: datetime) -> int:
+    return int(moment.timestamp() * 1e9)
@@ -0,0 +1,232 @@
+"""Build a ``Directory`` tree that mirrors a directory on disk."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
+
+from src.batch import Batch
+from src.directory import Directory
+from src.file import File
+from src.node import Node
+
+try:
+    import pwd
+except ImportError:  # not available on Windows
+    pwd = None
+
+
+@dataclass
+class Changes:
+    """Paths (in ``list_paths`` form) touched by a ``sync``."""
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+    def extend(self, other: Changes) -> None:
+        self.added.extend(other.added)
+        self.removed.extend(other.removed)
+        self.modified.extend(other.modified)
+
+
+class Entry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    uid: int
+    mtime_ns: int
+    inode: tuple[int, int]
+
+
+def from_filesystem(
+        path: str | os.PathLike,
+        workers: Optional[int] = None,
+        follow_symlinks: bool = False,
+        ignore: Iterable[str] = (),
+) -> Directory:
+    """Scan ``path`` into a new tree, listing directories on a thread pool.
+
+    Only the listing and ``stat`` calls run on the workers; nodes are built
+    and attached on the calling thread inside one ``batch()``. Symlinks are
+    skipped unless ``follow_symlinks`` is set, in which case directories
+    already seen (by device and inode) are not entered twice. Entries whose
+    name matches one of the ``ignore`` glob patterns are left out.
+    """
+    top = os.path.abspath(path)
+    info = os.stat(top)
+    root = Directory(os.path.basename(top) or top, owner=_owner_name(info.st_uid))
+    patterns = tuple(ignore)
+    seen = {(info.st_dev, info.st_ino)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, root.batch() as active:
+        # adding children touches a directory, so its disk mtime is set through the batch
+        active.set_modified(root, info.st_mtime_ns)
+        pending: dict[Future, tuple[Directory, str]] = {
+            pool.submit(list_entries, top, follow_symlinks, patterns): (root, top),
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory, dir_path = pending.pop(future)
+                for entry in future.result():
+                    owner = _owner_name(entry.uid)
+                    if entry.is_dir:
+                        if follow_symlinks and entry.inode in seen:
+                            continue
+                        seen.add(entry.inode)
+                        node = Directory(entry.name, owner=owner)
+                        active.set_modified(node, entry.mtime_ns)
+                        child_path = os.path.join(dir_path, entry.name)
+                        task = pool.submit(list_entries, child_path, follow_symlinks, patterns)
+                        pending[task] = (node, child_path)
+                    else:
+                        node = File(entry.name, entry.size, owner=owner)
+                        node._modified_ns = entry.mtime_ns
+                    directory.add(node)
+    return root
+
+
+def sync(
+        root: Directory,
+        path: str | os.PathLike,
+        check_files: bool = False,
+        follow_symlinks: bool = False,
+        ignore: Iterable[str] = (),
+) -> Changes:
+    """Bring a tree built by ``from_filesystem`` up to date with ``path``.
+
+    A directory whose mtime still matches is not listed again; its known
+    subdirectories are still visited, because a change deep down does not
+    bump the mtime of its ancestors. Editing a file in place does not bump
+    its directory's mtime either, so ``check_files`` re-stats the files of
+    unchanged directories too. New directories are scanned in full.
+    """
+    changes = Changes()
+    patterns = tuple(ignore)
+    with root.batch() as active:
+        stack = [(root, os.path.abspath(path), root.name)]
+        while stack:
+            directory, dir_path, rel = stack.pop()
+            subdirs, _ = sync_directory(directory, dir_path, rel, changes, active,
+                                        check_files, follow_symlinks, patterns)
+            stack.extend(subdirs)
+    return changes
+
+
+def sync_directory(
+        directory: Directory,
+        dir_path: str,
+        rel: str,
+        changes: Changes,
+        active: Batch,
+        check_files: bool = False,
+        follow_symlinks: bool = False,
+        ignore: tuple[str, ...] = (),
+) -> tuple[list[tuple[Directory, str, str]], list[Directory]]:
+    """Reconcile one directory's children with the disk.
+
+    Returns the existing subdirectories still to visit and the directories
+    that were newly added (already scanned in full).
+    """
+    subdirs: list[tuple[Directory, str, str]] = []
+    added_dirs: list[Directory] = []
+    try:
+        info = os.stat(dir_path)
+    except OSError:
+        # gone: its parent's listing changed and will drop it
+        return subdirs, added_dirs
+
+    if info.st_mtime_ns == directory._modified_ns:
+        for child in directory.children:
+            child_path = os.path.join(dir_path, child.name)
+            child_rel = f"{rel}/{child.name}"
+            if isinstance(child, Directory):
+                subdirs.append((child, child_path, child_rel))
+            elif check_files and isinstance(child, File):
+                try:
+                    child_info = os.stat(child_path, follow_symlinks=follow_symlinks)
+                except OSError:
+                    continue
+                _refresh_file(child, child_info.st_size, child_info.st_mtime_ns,
+                              child_rel, changes, active)
+        return subdirs, added_dirs
+
+    entries = {entry.name: entry for entry in list_entries(dir_path, follow_symlinks, ignore)}
+    for child in directory.children:
+        child_rel = f"{rel}/{child.name}"
+        entry = entries.get(child.name)
+        if entry is None or entry.is_dir != isinstance(child, Directory):
+            directory.remove(child.name)
+            changes.removed.append(child_rel)
+            continue
+        del entries[child.name]
+        if entry.is_dir:
+            subdirs.append((child, os.path.join(dir_path, child.name), child_rel))
+        else:
+            _refresh_file(child, entry.size, entry.mtime_ns, child_rel, changes, active)
+
+    for name, entry in entries.items():
+        child_path = os.path.join(dir_path, name)
+        if entry.is_dir:
+            node: Node = from_filesystem(child_path, follow_symlinks=follow_symlinks,
+                                         ignore=ignore)
+            added_dirs.append(node)
+        else:
+            node = File(name, entry.size, owner=_owner_name(entry.uid))
+            node._modified_ns = entry.mtime_ns
+        directory.add(node)
+        changes.added.append(f"{rel}/{name}")
+    active.set_modified(directory, info.st_mtime_ns)
+    return subdirs, added_dirs
+
+
+def _refresh_file(node: File, size: int, mtime_ns: int, rel: str,
+                  changes: Changes, active: Batch) -> None:
+    if node.size_bytes == size and node._modified_ns == mtime_ns:
+        return
+    node.modify(size)
+    active.set_modified(node, mtime_ns)
+    changes.modified.append(rel)
+
+
+def list_entries(path: str, follow_symlinks: bool = False,
+                 ignore: tuple[str, ...] = ()) -> list[Entry]:
+    """One ``scandir`` pass over ``path``; unreadable entries are skipped."""
+    entries: list[Entry] = []
+    try:
+        iterator = os.scandir(path)
+    except OSError:
+        return entries
+    with iterator:
+        for entry in iterator:
+            if any(fnmatchcase(entry.name, pattern) for pattern in ignore):
+                continue
+            try:
+                if entry.is_symlink() and not follow_symlinks:
+                    continue
+                # DirEntry caches this stat, so the listing pays for it once
+                info = entry.stat(follow_symlinks=follow_symlinks)
+                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            except OSError:
+                continue
+            entries.append(Entry(entry.name, is_dir, info.st_size, info.st_uid,
+                                 info.st_mtime_ns, (info.st_dev, info.st_ino)))
+    return entries
+
+
+@lru_cache(maxsize=None)
+def _owner_name(uid: int) -> Optional[str]:
+    if pwd is None:
+        return None
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
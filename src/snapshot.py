@@ -0,0 +1,317 @@
+"""Read-only point-in-time views of a tree (see ``Directory.snapshot``)."""
+
+from __future__ import annotations
+
+import weakref
+from datetime import datetime
+from typing import Iterator, Optional
+
+from src import versions
+from src.directory import Directory, _split_path
+from src.file import File
+from src.link import Link
+from src.locking import reading
+from src.node import Node
+from src.scan import Changes
+
+# positions in Node._version_state() and its subclass extensions
+_NAME, _OWNER, _CREATED, _MODIFIED, _PARENT, _EXTRA = range(6)
+
+
+class Snapshot:
+    """Epoch of one ``snapshot()`` call; the history it needs lives until ``release``."""
+
+    __slots__ = ("epoch", "_finalizer", "__weakref__")
+
+    def __init__(self) -> None:
+        self.epoch = versions.begin()
+        self._finalizer = weakref.finalize(self, versions.end)
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self) -> None:
+        self._finalizer()
+
+
+def take(directory: Directory) -> SnapshotDirectory:
+    with reading(directory):
+        return SnapshotDirectory(directory, Snapshot())
+
+
+class SnapshotNode:
+    """A node as it was when its snapshot was taken. Views never change."""
+
+    __slots__ = ("_node", "_snapshot", "_state")
+
+    def __init__(self, node: Node, snapshot: Snapshot) -> None:
+        self._node = node
+        self._snapshot = snapshot
+        self._state = _state_at(node, snapshot)
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, SnapshotNode)
+                and other._node is self._node and other._snapshot is self._snapshot)
+
+    def __hash__(self) -> int:
+        return hash((id(self._node), id(self._snapshot)))
+
+    @property
+    def name(self) -> str:
+        return self._state[_NAME]
+
+    @property
+    def owner(self) -> Optional[str]:
+        return self._state[_OWNER]
+
+    @property
+    def parent(self) -> Optional[SnapshotDirectory]:
+        parent = self._state[_PARENT]
+        return SnapshotDirectory(parent, self._snapshot) if parent is not None else None
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self._state[_CREATED] / 1e9)
+
+    @property
+    def modified_at(self) -> datetime:
+        return datetime.fromtimestamp(self._state[_MODIFIED] / 1e9)
+
+    def path(self) -> str:
+        names = []
+        node: Optional[SnapshotNode] = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "/".join(reversed(names))
+
+    def release(self) -> None:
+        """Let go of the history kept for this snapshot; its views stop working."""
+        self._snapshot.release()
+
+    def __enter__(self) -> SnapshotNode:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def list_paths(self, prefix: str = "") -> list[str]:
+        return list(self.iter_paths(prefix=prefix))
+
+    def iter_paths(self, prefix: str = "") -> Iterator[str]:
+        yield f"{prefix}/{self.name}" if prefix else self.name
+
+    def tree(self, indent: int = 0) -> str:
+        return "\n".join(self.iter_tree_lines(indent=indent))
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        yield (" " * indent) + self.name
+
+    def _common_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "created_at": self.created_at.isoformat(),
+            "modified_at": self.modified_at.isoformat(),
+        }
+
+
+class SnapshotFile(SnapshotNode):
+    __slots__ = ()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._state[_EXTRA]
+
+    def size(self) -> int:
+        return self._state[_EXTRA]
+
+    def file_count(self) -> int:
+        return 1
+
+    def link_count(self) -> int:
+        return 0
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        yield (" " * indent) + f"{self.name} ({self.size_bytes} B)"
+
+    def to_dict(self) -> dict:
+        common = self._common_dict()
+        return {"type": "file", "name": common.pop("name"), "size": self.size_bytes, **common}
+
+
+class SnapshotLink(SnapshotNode):
+    __slots__ = ()
+
+    @property
+    def target(self) -> Optional[SnapshotNode]:
+        return _view(self._state[_EXTRA], self._snapshot)
+
+    def size(self) -> int:
+        return 0
+
+    def file_count(self) -> int:
+        return 0
+
+    def link_count(self) -> int:
+        return 1
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        target = self.target
+        yield (" " * indent) + f"{self.name} -> {target.path() if target is not None else '?'}"
+
+    def to_dict(self) -> dict:
+        target = self.target
+        return {
+            "type": "link",
+            "name": self.name,
+            "target": target.path() if target is not None else None,
+            **{k: v for k, v in self._common_dict().items() if k != "name"},
+        }
+
+
+class SnapshotDirectory(SnapshotNode):
+    __slots__ = ()
+
+    @property
+    def children(self) -> tuple[SnapshotNode, ...]:
+        snapshot = self._snapshot
+        return tuple(_view(child, snapshot) for child in _children_at(self._node, snapshot))
+
+    def size(self) -> int:
+        return self._state[_EXTRA]
+
+    def file_count(self) -> int:
+        return self._state[_EXTRA + 1]
+
+    def link_count(self) -> int:
+        return self._state[_EXTRA + 2]
+
+    def find_by_path(self, path: str) -> Optional[SnapshotNode]:
+        node: Optional[SnapshotNode] = self
+        for part in _split_path(path):
+            if part == "..":
+                node = node.parent
+            elif isinstance(node, SnapshotDirectory):
+                child = _children_map(node._node, self._snapshot).get(part)
+                node = _view(child, self._snapshot)
+            else:
+                node = None
+            if node is None:
+                return None
+        return node
+
+    def iter_paths(self, prefix: str = "") -> Iterator[str]:
+        base = f"{prefix}/{self.name}" if prefix else self.name
+        stack = [(base, iter(self.children))]
+        while stack:
+            base, pending = stack[-1]
+            for child in pending:
+                if isinstance(child, SnapshotDirectory):
+                    stack.append((f"{base}/{child.name}", iter(child.children)))
+                    break
+                yield f"{base}/{child.name}"
+            else:
+                stack.pop()
+
+    def iter_tree_lines(self, indent: int = 0) -> Iterator[str]:
+        stack = [(indent, iter((self,)))]
+        while stack:
+            depth, pending = stack[-1]
+            for child in pending:
+                if isinstance(child, SnapshotDirectory):
+                    yield (" " * depth) + f"{child.name}/ ({child.size()} B)"
+                    stack.append((depth + 2, iter(child.children)))
+                    break
+                yield from child.iter_tree_lines(indent=depth)
+            else:
+                stack.pop()
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "dir",
+            **self._common_dict(),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def diff(a: SnapshotDirectory, b: SnapshotDirectory) -> Changes:
+    """What changed from snapshot ``a`` to snapshot ``b``, in ``sync`` form.
+
+    Added and removed entries are reported at the top of the subtree that
+    appeared or went away; files whose size or mtime differ are modified.
+    Directories untouched between the two epochs are skipped unopened.
+    """
+    since, until = sorted((a._snapshot.epoch, b._snapshot.epoch))
+    changes = Changes()
+    stack = [(a._node, b._node, b.name)]
+    while stack:
+        old_dir, new_dir, rel = stack.pop()
+        if old_dir is new_dir and not versions.changed_between(new_dir, since, until):
+            continue
+        old_children = _children_map(old_dir, a._snapshot)
+        new_children = _children_map(new_dir, b._snapshot)
+        subdirs = []
+        for name in old_children:
+            if name not in new_children:
+                changes.removed.append(f"{rel}/{name}")
+        for name, new in new_children.items():
+            path = f"{rel}/{name}"
+            old = old_children.get(name)
+            if old is None:
+                changes.added.append(path)
+            elif _kind(old) != _kind(new):
+                changes.removed.append(path)
+                changes.added.append(path)
+            elif isinstance(new, Directory):
+                subdirs.append((old, new, path))
+            elif old is new and not versions.changed_between(new, since, until):
+                continue
+            elif _differs(_state_at(old, a._snapshot), _state_at(new, b._snapshot)):
+                changes.modified.append(path)
+        stack.extend(reversed(subdirs))
+    return changes
+
+
+def _differs(old: tuple, new: tuple) -> bool:
+    # files compare size and mtime, links their target and mtime
+    return old[_MODIFIED] != new[_MODIFIED] or old[_EXTRA] != new[_EXTRA]
+
+
+def _kind(node: Node) -> type:
+    for kind in (Directory, Link, File):
+        if isinstance(node, kind):
+            return kind
+    return Node
+
+
+def _view(node: Optional[Node], snapshot: Snapshot) -> Optional[SnapshotNode]:
+    if node is None:
+        return None
+    if isinstance(node, Directory):
+        return SnapshotDirectory(node, snapshot)
+    if isinstance(node, Link):
+        return SnapshotLink(node, snapshot)
+    return SnapshotFile(node, snapshot)
+
+
+def _state_at(node: Node, snapshot: Snapshot) -> tuple:
+    _check(snapshot)
+    with reading(node):
+        return versions.state_at(node, snapshot.epoch)
+
+
+def _children_at(node: Directory, snapshot: Snapshot) -> list[Node]:
+    return list(_children_map(node, snapshot).values())
+
+
+def _children_map(node: Directory, snapshot: Snapshot) -> dict[str, Node]:
+    _check(snapshot)
+    with reading(node):
+        return dict(versions.children_at(node, snapshot.epoch))
+
+
+def _check(snapshot: Snapshot) -> None:
+    if snapshot.released:
+        raise ValueError("snapshot was released")
@@ -0,0 +1,478 @@
+"""Binary snapshots and JSON (de)serialization for ``Directory`` trees.
+
+Snapshot layout (little endian)::
+
+    header   magic "FSNP", version, reserved, string count, node count,
+             string index offset, node table offset
+    strings  per string: u32 byte length + utf-8 bytes
+    index    u64 absolute offset of every string
+    nodes    one fixed-size record per node, in pre-order
+
+A node record holds its kind, name/owner string ids, parent row, the row
+just past its subtree, the subtree size, file and link counts, a link's
+target row, and both timestamps in nanoseconds, so a tree loads without
+recomputing anything.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import IO, Iterable, Optional
+
+from src.directory import Directory, _walk
+from src.file import File
+from src.link import Link
+from src.node import Node
+
+MAGIC = b"FSNP"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHQQQQ")
+STRING_LENGTH = struct.Struct("<I")
+STRING_OFFSET = struct.Struct("<Q")
+# kind, name id, owner id, parent row, subtree end, size, file count,
+# link count, link target row, created, modified
+RECORD = struct.Struct("<B3xIiiIQQQqqq")
+
+KIND_FILE = 0
+KIND_DIR = 1
+KIND_LINK = 2
+
+
+# --- Binary snapshots --------------------------------------------------------
+def save(root: Directory, path: str | os.PathLike) -> None:
+    """Write ``root`` as a binary snapshot; the file is replaced atomically."""
+    strings: dict[str, int] = {}
+
+    def string_id(value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        sid = strings.get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+        return sid
+
+    nodes: list[Node] = []
+    parents: list[int] = []
+    stack: list[tuple[Node, int]] = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        row = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+        if isinstance(node, Directory):
+            stack.extend((child, row) for child in reversed(node._children.values()))
+
+    # subtree node counts, folded up in reverse pre-order
+    spans = [1] * len(nodes)
+    for row in range(len(nodes) - 1, 0, -1):
+        spans[parents[row]] += spans[row]
+
+    rows = {id(node): row for row, node in enumerate(nodes)}
+    records = bytearray()
+    for row, node in enumerate(nodes):
+        target = -1
+        if isinstance(node, Directory):
+            kind = KIND_DIR
+        elif isinstance(node, Link):
+            kind = KIND_LINK
+            # links out of the saved tree are stored dangling
+            target = rows.get(id(node.target), -1)
+        else:
+            kind = KIND_FILE
+        records += RECORD.pack(
+            kind, string_id(node.name), string_id(node.owner), parents[row],
+            row + spans[row], node.size(), node.file_count(), node.link_count(),
+            target, node._created_ns, node._modified_ns,
+        )
+
+    blob = bytearray()
+    offsets: list[int] = []
+    for value in strings:
+        encoded = value.encode()
+        offsets.append(HEADER.size + len(blob))
+        blob += STRING_LENGTH.pack(len(encoded)) + encoded
+    index_offset = HEADER.size + len(blob)
+    nodes_offset = index_offset + STRING_OFFSET.size * len(offsets)
+
+    tmp_path = f"{os.fspath(path)}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, 0, len(offsets), len(nodes),
+                             index_offset, nodes_offset))
+        fh.write(blob)
+        fh.write(b"".join(STRING_OFFSET.pack(offset) for offset in offsets))
+        fh.write(records)
+    os.replace(tmp_path, path)
+
+
+def load(path: str | os.PathLike) -> Directory:
+    """Rebuild the tree stored by ``save`` straight from the mapped file."""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        n_strings, n_nodes, _, nodes_offset = read_header(mm)
+        strings = read_strings(mm, n_strings)
+        nodes: list[Node] = []
+        links: list[tuple[Link, int]] = []
+        for record in iter_records(mm, nodes_offset, 0, n_nodes):
+            kind, name_id, owner_id, parent, _, size, files, n_links, target, created, modified = record
+            name = strings[name_id]
+            owner = strings[owner_id] if owner_id >= 0 else None
+            if kind == KIND_DIR:
+                node = Directory(name, owner)
+                node._size = size
+                node._file_count = files
+                node._link_count = n_links
+            elif kind == KIND_LINK:
+                node = Link(name, None, owner)
+                links.append((node, target))
+            else:
+                node = File(name, size, owner)
+            node._created_ns = created
+            node._modified_ns = modified
+            if parent >= 0:
+                parent_node = nodes[parent]
+                node.parent = parent_node
+                parent_node._children[node.name] = node
+            nodes.append(node)
+    for link, target in links:
+        link.target = nodes[target] if target >= 0 else None
+    root = nodes[0]
+    if not isinstance(root, Directory):
+        raise ValueError(f"{os.fspath(path)} does not hold a directory tree")
+    return root
+
+
+def read_header(mm: mmap.mmap) -> tuple[int, int, int, int]:
+    magic, version, _, n_strings, n_nodes, index_offset, nodes_offset = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError("not a filesystem snapshot")
+    if version != VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+    return n_strings, n_nodes, index_offset, nodes_offset
+
+
+def read_strings(mm: mmap.mmap, count: int) -> list[str]:
+    strings: list[str] = []
+    offset = HEADER.size
+    for _ in range(count):
+        (length,) = STRING_LENGTH.unpack_from(mm, offset)
+        offset += STRING_LENGTH.size
+        strings.append(mm[offset:offset + length].decode())
+        offset += length
+    return strings
+
+
+def iter_records(mm: mmap.mmap, nodes_offset: int, start: int, stop: int):
+    """Unpack node records ``start`` .. ``stop - 1`` without copying the table."""
+    for row in range(start, stop):
+        yield RECORD.unpack_from(mm, nodes_offset + row * RECORD.size)
+
+
+# --- Lazy loading -------------------------------------------------------------
+def load_lazy(path: str | os.PathLike, max_loaded: Optional[int] = None) -> LazyDirectory:
+    """Open a snapshot whose directories read their children on first access.
+
+    ``max_loaded`` caps how many directories keep their children in memory;
+    the least recently used ones beyond it are dropped and re-read later.
+    """
+    reader = SnapshotReader(path, max_loaded)
+    reader.root = reader.node(0)
+    return reader.root
+
+
+class SnapshotReader:
+    """Random access to the records of one mapped snapshot file."""
+
+    def __init__(self, path: str | os.PathLike, max_loaded: Optional[int] = None) -> None:
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, self.n_nodes, self._index_offset, self._nodes_offset = read_header(self._mm)
+        self.max_loaded = max_loaded
+        self.root: Optional[LazyDirectory] = None
+        # materialized, evictable directories, least recently used first
+        self._loaded: OrderedDict[LazyDirectory, None] = OrderedDict()
+
+    def close(self) -> None:
+        self._loaded.clear()
+        self._mm.close()
+        self._file.close()
+
+    def string(self, sid: int) -> Optional[str]:
+        if sid < 0:
+            return None
+        (offset,) = STRING_OFFSET.unpack_from(self._mm, self._index_offset + STRING_OFFSET.size * sid)
+        (length,) = STRING_LENGTH.unpack_from(self._mm, offset)
+        start = offset + STRING_LENGTH.size
+        return self._mm[start:start + length].decode()
+
+    def record(self, row: int) -> tuple:
+        return RECORD.unpack_from(self._mm, self._nodes_offset + row * RECORD.size)
+
+    def node(self, row: int) -> Node:
+        kind, name_id, owner_id, _, end, size, files, n_links, target, created, modified = (
+            self.record(row))
+        name = self.string(name_id)
+        owner = self.string(owner_id)
+        if kind == KIND_DIR:
+            node: Node = LazyDirectory(self, row, end, name, owner)
+            node._size = size
+            node._file_count = files
+            node._link_count = n_links
+        elif kind == KIND_LINK:
+            node = LazyLink(self, target, name, owner)
+        else:
+            node = File(name, size, owner)
+        node._created_ns = created
+        node._modified_ns = modified
+        return node
+
+    def resolve_row(self, row: int) -> Optional[Node]:
+        """The current node object for ``row``, materializing its ancestors."""
+        names: list[str] = []
+        while row > 0:
+            record = self.record(row)
+            names.append(self.string(record[1]))
+            row = record[3]
+        node: Optional[Node] = self.root
+        for name in reversed(names):
+            if not isinstance(node, Directory):
+                return None
+            node = node._children.get(name)
+        return node
+
+    def children(self, directory: LazyDirectory) -> dict[str, Node]:
+        children: dict[str, Node] = {}
+        row = directory._row + 1
+        # siblings are consecutive subtrees, so hop from one subtree end to the next
+        while row < directory._end:
+            child = self.node(row)
+            child.parent = directory
+            children[child.name] = child
+            row = child._end if isinstance(child, LazyDirectory) else row + 1
+        return children
+
+    def used(self, directory: LazyDirectory) -> None:
+        if self.max_loaded is None or directory._pinned:
+            return
+        self._loaded[directory] = None
+        self._loaded.move_to_end(directory)
+        while len(self._loaded) > self.max_loaded:
+            # never drop the path that leads to the directory in use
+            victim = next((d for d in self._loaded
+                           if not d._row <= directory._row < d._end), None)
+            if victim is None:
+                break
+            self._evict(victim)
+
+    def pin(self, directory: LazyDirectory) -> None:
+        self._loaded.pop(directory, None)
+
+    def _evict(self, victim: LazyDirectory) -> None:
+        del self._loaded[victim]
+        self._unload(victim)
+        # its materialized descendants are unreachable now
+        inside = [d for d in self._loaded if victim._row < d._row < victim._end]
+        for directory in inside:
+            del self._loaded[directory]
+            self._unload(directory)
+
+    @staticmethod
+    def _unload(directory: LazyDirectory) -> None:
+        # children handed out earlier stay usable on their own, but a change
+        # to one must not reach the aggregates of the tree through its parent
+        for child in directory._loaded_children.values():
+            child.parent = None
+        directory._loaded_children = None
+
+
+class LazyDirectory(Directory):
+    """A ``Directory`` whose children stay in the snapshot file until touched.
+
+    Size and file count come from the snapshot, so they cost nothing. A
+    directory that is changed (or has a changed descendant) is pinned in
+    memory; an evicted one is re-read from the file on its next access, so
+    node objects taken from it before the eviction are detached (their
+    ``parent`` is ``None``) and no longer part of the tree.
+    """
+
+    __slots__ = ("_reader", "_row", "_end", "_loaded_children", "_pinned")
+
+    def __init__(self, reader: SnapshotReader, row: int, end: int,
+                 name: str, owner: Optional[str] = None) -> None:
+        self._reader = reader
+        self._row = row
+        self._end = end
+        self._pinned = False
+        super().__init__(name=name, owner=owner)
+        self._loaded_children: Optional[dict[str, Node]] = None
+
+    @property
+    def _children(self) -> dict[str, Node]:
+        children = self._loaded_children
+        if children is None:
+            children = self._loaded_children = self._reader.children(self)
+        self._reader.used(self)
+        return children
+
+    @_children.setter
+    def _children(self, value: dict[str, Node]) -> None:
+        self._loaded_children = value
+
+    def is_loaded(self) -> bool:
+        return self._loaded_children is not None
+
+    def close(self) -> None:
+        """Release the snapshot file shared by the whole lazy tree."""
+        self._reader.close()
+
+    def _pin(self) -> None:
+        current = self
+        while isinstance(current, LazyDirectory) and not current._pinned:
+            current._pinned = True
+            current._reader.pin(current)
+            current = current.parent
+
+    # every structural change pins the directory before it happens
+    def add(self, node: Node) -> None:
+        self._pin()
+        super().add(node)
+
+    def _detach(self, node: Node) -> None:
+        self._pin()
+        super()._detach(node)
+
+    def _rename_child(self, node: Node, new_name: str) -> None:
+        self._pin()
+        super()._rename_child(node, new_name)
+
+    def _propagate(self, size_delta: int, count_delta: int, link_delta: int = 0) -> None:
+        self._pin()
+        super()._propagate(size_delta, count_delta, link_delta)
+
+    # a name index would materialize the whole file, so queries walk instead
+    def _find_all(self, name: str) -> Iterable[Node]:
+        return [node for node in _walk(self) if node.name == name]
+
+    def glob(self, pattern: str) -> list[Node]:
+        return [node for node in _walk(self) if fnmatchcase(node.name, pattern)]
+
+
+class LazyLink(Link):
+    """A ``Link`` read from a lazy snapshot; its target is looked up on access."""
+
+    __slots__ = ("_reader", "_target_row", "_target_set", "_target_node")
+
+    def __init__(self, reader: SnapshotReader, target_row: int,
+                 name: str, owner: Optional[str] = None) -> None:
+        self._reader = reader
+        self._target_row = target_row
+        self._target_set = False
+        super().__init__(name=name, target=None, owner=owner)
+        self._target_set = False
+
+    @property
+    def target(self) -> Optional[Node]:
+        if self._target_set:
+            return self._target_node
+        if self._target_row < 0:
+            return None
+        # resolved by path each time, so an evicted target is simply re-read
+        return self._reader.resolve_row(self._target_row)
+
+    @target.setter
+    def target(self, value: Optional[Node]) -> None:
+        self._target_node = value
+        self._target_set = True
+
+
+# --- JSON ---------------------------------------------------------------------
+def from_dict(data: dict) -> Node:
+    """Inverse of ``to_dict``: rebuild a ``File`` or a whole ``Directory`` tree."""
+    root = _node_from_dict(data)
+    links: list[tuple[Link, Optional[str]]] = []
+    stack = [(root, data)]
+    while stack:
+        directory, entry = stack.pop()
+        for child_data in entry.get("children", ()):
+            child = _node_from_dict(child_data)
+            child.parent = directory
+            directory._children[child.name] = child
+            if isinstance(child, Directory):
+                stack.append((child, child_data))
+            elif isinstance(child, Link):
+                links.append((child, child_data.get("target")))
+    if isinstance(root, Directory):
+        _fold_aggregates(root)
+        # link targets are paths from the top of the tree, resolved once it exists
+        for link, target in links:
+            head, _, rest = (target or "").partition("/")
+            link.target = root.find_by_path(rest) if target and head == root.name else None
+    return root
+
+
+def _node_from_dict(data: dict) -> Node:
+    kind = data.get("type")
+    if kind == "file":
+        node: Node = File(data["name"], data.get("size", 0), data.get("owner"))
+    elif kind == "dir":
+        node = Directory(data["name"], data.get("owner"))
+    elif kind == "link":
+        node = Link(data["name"], None, data.get("owner"))
+    else:
+        raise ValueError(f"unknown node type: {kind!r}")
+    if data.get("created_at"):
+        node._created_ns = _to_ns(data["created_at"])
+    if data.get("modified_at"):
+        node._modified_ns = _to_ns(data["modified_at"])
+    return node
+
+
+def _fold_aggregates(root: Directory) -> None:
+    """Recompute directory aggregates bottom-up after a raw build."""
+    order: list[Directory] = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        order.append(directory)
+        directory._size = 0
+        directory._file_count = 0
+        directory._link_count = 0
+        stack.extend(c for c in directory._children.values() if isinstance(c, Directory))
+    for directory in reversed(order):
+        for child in directory._children.values():
+            directory._size += child.size()
+            directory._file_count += child.file_count()
+            directory._link_count += child.link_count()
+
+
+def _to_ns(stamp: str) -> int:
+    return round(datetime.fromisoformat(stamp).timestamp() * 1e9)
+
+
+def write_json(node: Node, fp: IO[str]) -> None:
+    """Stream ``node.to_dict()`` as JSON without building the dicts."""
+    stack: list = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            fp.write(item)
+            continue
+        if not isinstance(item, Directory):
+            fp.write(json.dumps(item.to_dict()))
+            continue
+        fp.write('{"type": "dir", "name": ' + json.dumps(item.name)
+                 + ', "owner": ' + json.dumps(item.owner)
+                 + ', "created_at": ' + json.dumps(item.created_at.isoformat())
+                 + ', "modified_at": ' + json.dumps(item.modified_at.isoformat())
+                 + ', "children": [')
+        stack.append("]}")
+        children = list(item._children.values())
+        for position in range(len(children) - 1, -1, -1):
+            stack.append(children[position])
+            if position:
+                stack.append(", ")
@@ -0,0 +1,95 @@
+"""Version history behind ``Directory.snapshot``.
+
+Taking a snapshot only records the current epoch and starts a new one.
+While any snapshot is alive, the first change to a node in an epoch
+saves the node's state from before it, tagged with that epoch, along
+with the states of its ancestors (path copying). A snapshot reads a node
+from the first entry tagged after its own epoch, or from the live node.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from operator import itemgetter
+
+# True while at least one snapshot is alive; mutations check it first
+recording = False
+
+_epoch = 0
+_live = 0
+_guard = threading.Lock()
+# node -> [[epoch, state before that epoch's first change, children or None], ...]
+_history: dict = {}
+_tag = itemgetter(0)
+
+
+def begin() -> int:
+    """Register a new snapshot and return its epoch."""
+    global _epoch, _live, recording
+    with _guard:
+        epoch = _epoch
+        _epoch += 1
+        _live += 1
+        recording = True
+    return epoch
+
+
+def end() -> None:
+    """Forget a snapshot; the history goes with the last one."""
+    global _live, recording
+    with _guard:
+        _live -= 1
+        if not _live:
+            recording = False
+            _history.clear()
+
+
+def preserve(node, children: bool = False) -> None:
+    """Save ``node`` (and its children dict if ``children``) before a change."""
+    entries = _history.get(node)
+    if entries is None:
+        entries = _history[node] = []
+    if not entries or entries[-1][0] != _epoch:
+        entries.append([_epoch, node._version_state(), None])
+    if children and entries[-1][2] is None:
+        entries[-1][2] = dict(node._children)
+    # every ancestor of a changed node changes too, so an untouched
+    # directory stands for an untouched subtree
+    parent = node.parent
+    while parent is not None:
+        entries = _history.get(parent)
+        if entries is None:
+            entries = _history[parent] = []
+        elif entries[-1][0] == _epoch:
+            break
+        entries.append([_epoch, parent._version_state(), None])
+        parent = parent.parent
+
+
+def state_at(node, epoch: int) -> tuple:
+    entries = _history.get(node)
+    if entries:
+        i = bisect_right(entries, epoch, key=_tag)
+        if i < len(entries):
+            return entries[i][1]
+    return node._version_state()
+
+
+def children_at(node, epoch: int) -> dict:
+    entries = _history.get(node)
+    if entries:
+        # the first later change to the children saved them as they were
+        for entry in entries[bisect_right(entries, epoch, key=_tag):]:
+            if entry[2] is not None:
+                return entry[2]
+    return node._children
+
+
+def changed_between(node, since: int, until: int) -> bool:
+    """Whether ``node`` (or anything below it) changed after epoch ``since`` up to ``until``."""
+    entries = _history.get(node)
+    if not entries:
+        return False
+    i = bisect_right(entries, since, key=_tag)
+    return i < len(entries) and entries[i][0] <= until
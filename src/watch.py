@@ -0,0 +1,136 @@
+"""Keep a mirrored tree live with Linux inotify instead of rescanning."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from typing import Iterable, Iterator, Optional
+
+from src.directory import Directory
+from src.scan import Changes, sync_directory
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+
+EVENT = struct.Struct("iIII")
+
+
+class Watcher:
+    """Apply inotify events for a tree built by ``Directory.from_filesystem``.
+
+    Every watched directory that reports an event is reconciled with
+    ``sync_directory`` once per ``poll``; new subdirectories are scanned and
+    watched, removed ones drop their watches. Linux only.
+    """
+
+    def __init__(self, root: Directory, path: str | os.PathLike,
+                 follow_symlinks: bool = False, ignore: Iterable[str] = ()) -> None:
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self.path = os.path.abspath(path)
+        self.follow_symlinks = follow_symlinks
+        self.ignore = tuple(ignore)
+        # watch descriptor -> (directory node, its path on disk)
+        self._watches: dict[int, tuple[Directory, str]] = {}
+        self._watch_tree(root, self.path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._watches.clear()
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[Changes]:
+        while self._fd >= 0:
+            changes = self.poll()
+            if changes:
+                yield changes
+
+    def poll(self, timeout: Optional[float] = None) -> Changes:
+        """Wait up to ``timeout`` seconds for events and apply them."""
+        changes = Changes()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changes
+        dirty: dict[int, None] = {}
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                elif wd in self._watches:
+                    dirty[wd] = None
+        if overflow:
+            # events were lost, fall back to a full incremental rescan
+            changes.extend(self.root.sync(self.path, check_files=True,
+                                          follow_symlinks=self.follow_symlinks,
+                                          ignore=self.ignore))
+            self._watch_tree(self.root, self.path)
+            return changes
+
+        with self.root.batch() as active:
+            for wd in dirty:
+                directory, dir_path = self._watches[wd]
+                if not _is_attached(directory, self.root):
+                    continue
+                _, added_dirs = sync_directory(
+                    directory, dir_path, directory.path(), changes, active,
+                    check_files=True, follow_symlinks=self.follow_symlinks, ignore=self.ignore)
+                for added in added_dirs:
+                    self._watch_tree(added, os.path.join(dir_path, added.name))
+        return changes
+
+    def _watch_tree(self, top: Directory, top_path: str) -> None:
+        stack = [(top, top_path)]
+        while stack:
+            directory, dir_path = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = (directory, dir_path)
+            stack.extend((child, os.path.join(dir_path, child.name))
+                         for child in directory.children if isinstance(child, Directory))
+
+
+def _is_attached(node: Directory, root: Directory) -> bool:
+    return any(ancestor is root for ancestor in _ancestors(node))
+
+
+def _ancestors(node) -> Iterator:
+    while node is not None:
+        yield node
+        node = node.parent
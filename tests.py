@@ -1,6 +1,12 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
 from datetime import datetime, timedelta
 
-from src import Directory, File
+from src import ColumnarTree, Directory, File, Link
 
 
 def build_sample_tree() -> Directory:
@@ -83,6 +89,808 @@ def test_file_modify_updates_size_and_mtime():
     assert f.modified_at >= before
 
 
+def test_size_cache_follows_mutations():
+    root = build_sample_tree()
+    assert root.size() == 2150
+    assert root.file_count() == 3
+    docs = root.find("docs")
+    docs.add(File("notes.txt", 25))
+    assert docs.size() == 175
+    assert root.size() == 2175
+    readme = root.find("readme.md")
+    readme.modify(10)
+    assert docs.size() == 85
+    assert root.size() == 2085
+    root.remove("img")
+    assert root.size() == 85
+    assert root.file_count() == 3
+
+
+def test_add_reparents_node():
+    root = build_sample_tree()
+    docs = root.find("docs")
+    img = root.find("img")
+    logo = root.find("logo.png")
+    docs.add(logo)
+    assert logo.parent is docs
+    assert img.size() == 0 and img.file_count() == 0
+    assert docs.size() == 2150
+    assert root.size() == 2150
+    assert root.file_count() == 3
+
+
+def test_add_rejects_duplicate_names():
+    root = build_sample_tree()
+    try:
+        root.add(Directory("docs"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate name was accepted")
+    guide = root.find("guide.txt")
+    try:
+        guide.rename("readme.md")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("rename onto a sibling was accepted")
+    guide.rename("howto.txt")
+    assert [c.name for c in root.find("docs").children] == ["readme.md", "howto.txt"]
+    assert root.find_by_path("docs/howto.txt") is guide
+    # the listing is a read-only copy; changes go through add/remove
+    try:
+        root.find("docs").children.append(File("stray.txt", 1))
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("children accepted a direct append")
+
+
+def test_find_by_path():
+    root = build_sample_tree()
+    assert root.find_by_path("docs/readme.md").size() == 100
+    assert root.find_by_path("/img/./logo.png").name == "logo.png"
+    assert root.find_by_path("docs/../img") is root.find("img")
+    assert root.find_by_path("") is root
+    assert root.find_by_path("docs/missing.txt") is None
+    assert root.find_by_path("docs/readme.md/x") is None
+
+
+def test_resolve_many_matches_find_by_path():
+    root = build_sample_tree()
+    paths = ["img/logo.png", "docs/readme.md", "docs", "docs/guide.txt",
+             "docs/nope", "nope/readme.md", "img/logo.png"]
+    resolved = root.resolve_many(paths)
+    assert set(resolved) == set(paths)
+    for path in paths:
+        assert resolved[path] is root.find_by_path(path)
+
+
+def test_name_index_tracks_mutations():
+    root = build_sample_tree()
+    assert root.find_all("readme.md") == [root.find_by_path("docs/readme.md")]
+    img = root.find("img")
+    copy = File("readme.md", 1)
+    img.add(copy)
+    assert len(root.find_all("readme.md")) == 2
+    assert img.find_all("readme.md") == [copy]
+    copy.rename("copy.md")
+    assert root.find("copy.md") is copy
+    assert len(root.find_all("readme.md")) == 1
+    root.remove("img")
+    assert root.find("copy.md") is None
+    assert root.find("logo.png") is None
+    assert img.find("copy.md") is copy
+
+
+def test_find_results_follow_tree_order():
+    def tree_with_copies():
+        root = build_sample_tree()
+        root.find("img").add(File("notes.txt", 1))
+        return root
+
+    fresh = tree_with_copies()
+    indexed = tree_with_copies()
+    indexed.find("logo.png")
+    # added after the index exists, but first in pre-order
+    for root in (fresh, indexed):
+        root.find("docs").add(File("notes.txt", 2))
+        assert [n.path() for n in root.find_all("notes.txt")] == [
+            "root/docs/notes.txt", "root/img/notes.txt"]
+        assert root.find("notes.txt").size() == 2
+    # moving the later copy's directory in front does not keep index order
+    indexed.move("img", indexed.find("docs"))
+    assert indexed.find("notes.txt").path() == "root/docs/notes.txt"
+    assert [n.name for n in indexed.glob("*.txt")] == ["guide.txt", "notes.txt", "notes.txt"]
+    indexed.remove("notes.txt")
+    assert indexed.find("notes.txt").path() == "root/docs/img/notes.txt"
+
+
+def test_glob_queries():
+    root = build_sample_tree()
+    root.find("img").add(File("icon.png", 10))
+    assert sorted(n.name for n in root.glob("*.png")) == ["icon.png", "logo.png"]
+    assert [n.name for n in root.find("docs").glob("*.png")] == []
+    assert sorted(n.name for n in root.glob("*.??")) == ["readme.md"]
+
+
+def test_add_rejects_cycles():
+    root = build_sample_tree()
+    docs = root.find("docs")
+    try:
+        docs.add(root)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("directory was added into its own subtree")
+
+
+def test_tree_layout():
+    root = build_sample_tree()
+    root.add(Directory("empty"))
+    assert root.tree().splitlines() == [
+        "root/ (2150 B)",
+        "  docs/ (150 B)",
+        "    readme.md (100 B)",
+        "    guide.txt (50 B)",
+        "  img/ (2000 B)",
+        "    logo.png (2000 B)",
+        "  empty/ (0 B)",
+    ]
+
+
+def test_iterators_handle_deep_trees():
+    root = Directory("root")
+    current = root
+    for level in range(5000):
+        child = Directory(f"d{level}")
+        current.add(child)
+        current = child
+    current.add(File("leaf.txt", 7))
+    paths = list(root.iter_paths())
+    assert len(paths) == 1
+    assert paths[0].count("/") == 5001
+    assert paths[0].endswith("d4999/leaf.txt")
+    lines = list(root.iter_tree_lines())
+    assert len(lines) == 5002
+    assert lines[-1] == (" " * 10002) + "leaf.txt (7 B)"
+
+
+def test_nodes_are_compact():
+    f = File("a.txt", 1, owner="alice")
+    assert not hasattr(f, "__dict__")
+    assert not hasattr(Directory("d"), "__dict__")
+    assert f.created_at <= f.modified_at
+    stamp = datetime(2024, 1, 2, 3, 4, 5)
+    f.modified_at = stamp
+    assert abs(f.modified_at - stamp) < timedelta(microseconds=1)
+    assert f.owner is File("b.txt", owner="ali" + "ce").owner
+
+
+def test_columnar_store_matches_objects():
+    root = build_sample_tree()
+    store = ColumnarTree.from_directory(root)
+    view = store.root
+    assert len(store) == 6
+    assert view.size() == root.size() == 2150
+    assert view.file_count() == 3
+    assert view.list_paths() == root.list_paths()
+    assert view.tree() == root.tree()
+    assert view.to_dict() == root.to_dict()
+    assert view.find_by_path("docs").size() == 150
+
+
+def test_columnar_store_mutations():
+    store = ColumnarTree.from_directory(build_sample_tree())
+    root = store.root
+    docs = root.find_by_path("docs")
+    docs.add(File("notes.txt", 5))
+    root.find("readme.md").modify(1)
+    assert docs.size() == 56
+    assert root.remove("img") is True
+    assert root.size() == 56
+    assert root.find("logo.png") is None
+    root.find("guide.txt").rename("howto.txt")
+    assert sorted(root.list_paths()) == [
+        "root/docs/howto.txt", "root/docs/notes.txt", "root/docs/readme.md",
+    ]
+    assert [c.name for c in root.children] == ["docs"]
+
+
+def test_columnar_paths_follow_tree_order():
+    root = build_sample_tree()
+    store = ColumnarTree.from_directory(root)
+    for tree in (root, store.root):
+        docs = tree.find_by_path("docs")
+        docs.add(Directory("drafts"))
+        tree.find_by_path("docs/drafts").add(File("todo.txt", 7))
+        docs.add(File("notes.txt", 5))
+    # rows appended after "img" still list under "docs", in pre-order
+    assert store.root.list_paths() == root.list_paths()
+    assert (store.root.find_by_path("docs").list_paths(prefix="x")
+            == root.find_by_path("docs").list_paths(prefix="x"))
+
+
+def test_columnar_aggregates_follow_mutations():
+    store = ColumnarTree.from_directory(build_sample_tree())
+    root = store.root
+    docs = root.find_by_path("docs")
+    assert root.size() == 2150
+    docs.add(Directory("drafts"))
+    root.find_by_path("docs/drafts").add(File("todo.txt", 7))
+    root.find("logo.png").modify(20)
+    assert root.remove("readme.md") is True
+    # the cached aggregates were updated in place, not rebuilt
+    kept = store._aggregates
+    assert (root.size(), root.file_count(), docs.size()) == (77, 3, 57)
+    assert store._aggregates is kept
+    store._aggregates = None
+    assert (root.size(), root.file_count(), docs.size()) == (77, 3, 57)
+
+
+def test_snapshot_round_trip():
+    root = build_sample_tree()
+    root.find("readme.md").modify(123)
+    root.find("docs").add(Directory("drafts", owner="alice"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.fsnp")
+        root.save(path)
+        loaded = Directory.load(path)
+    assert loaded.to_dict() == root.to_dict()
+    assert loaded.size() == root.size() == 2173
+    assert loaded.file_count() == 3
+    assert loaded.find_by_path("docs/drafts").owner == "alice"
+    loaded.find("logo.png").modify(0)
+    assert loaded.size() == 173
+
+
+def test_from_dict_and_streaming_json():
+    root = build_sample_tree()
+    buffer = io.StringIO()
+    root.write_json(buffer)
+    assert buffer.getvalue() == json.dumps(root.to_dict())
+    rebuilt = Directory.from_dict(json.loads(buffer.getvalue()))
+    assert rebuilt.to_dict() == root.to_dict()
+    assert rebuilt.find_by_path("img").size() == 2000
+    assert File.from_dict(root.find("guide.txt").to_dict()).size() == 50
+    try:
+        File.from_dict(root.to_dict())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("directory data accepted as a File")
+
+
+def test_lazy_load_materializes_on_demand():
+    root = build_sample_tree()
+    root.find("docs").add(Directory("drafts"))
+    root.find("drafts").add(File("todo.txt", 7))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.fsnp")
+        root.save(path)
+        lazy = Directory.load(path, lazy=True, max_loaded=1)
+        assert lazy.size() == 2157 and not lazy.is_loaded()
+        docs = lazy.find_by_path("docs")
+        assert docs.size() == 157 and not docs.is_loaded()
+        assert sorted(lazy.list_paths()) == sorted(root.list_paths())
+        assert lazy.tree() == root.tree()
+        # the budget of one directory forced earlier ones out
+        assert not lazy.find_by_path("docs").is_loaded()
+        lazy.find_by_path("docs/drafts/todo.txt").modify(70)
+        lazy.list_paths()
+        assert lazy.find_by_path("docs/drafts/todo.txt").size() == 70
+        assert lazy.size() == 2220
+        lazy.close()
+
+
+def test_lazy_eviction_detaches_held_nodes():
+    root = build_sample_tree()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.fsnp")
+        root.save(path)
+        lazy = Directory.load(path, lazy=True, max_loaded=1)
+        guide = lazy.find_by_path("docs/guide.txt")
+        lazy.find_by_path("img/logo.png")
+        assert not lazy.find_by_path("docs").is_loaded() and guide.parent is None
+        # the held node changes alone; the tree keeps the snapshot's state
+        guide.modify(1000)
+        assert lazy.size() == 2150
+        assert lazy.size() == sum(child.size() for child in lazy.children)
+        assert lazy.find_by_path("docs/guide.txt").size() == 50
+        lazy.close()
+
+
+def test_batch_defers_and_settles_aggregates():
+    root = build_sample_tree()
+    docs = root.find("docs")
+    fresh = Directory("fresh")
+    with root.batch():
+        fresh.add_many(File(f"f{i}.txt", 10) for i in range(5))
+        docs.add(fresh)
+        root.find("logo.png").modify(1000)
+        with root.batch():
+            assert docs.remove_many(["readme.md", "missing"]) == 1
+        # aggregates are only settled on exit
+        assert root.size() == 2150
+    assert fresh.size() == 50
+    assert docs.size() == 100 and docs.file_count() == 6
+    assert root.size() == 1100 and root.file_count() == 7
+    assert root.find("img").size() == 1000
+    assert docs.modified_at == fresh.modified_at == root.find("logo.png").modified_at
+
+
+def test_batch_defers_subtree_stats():
+    root = build_sample_tree()
+    img = root.find("img")
+    assert root._subtree_stats()[0] == 2000
+    with root.batch():
+        img.add(File("big.bin", 5000))
+        # the cached maxima are only raised on exit
+        assert root._max_file_size == 2000
+    assert root._subtree_stats()[0] == 5000
+    assert [f.name for f in root.top_files(1)] == ["big.bin"]
+    with root.batch():
+        img.remove("big.bin")
+        root.find("logo.png").modify(10)
+        root.find("docs").add(File("late.txt", 1))
+    files = [n for n in root.glob("*") if isinstance(n, File)]
+    assert root._subtree_stats() == (100, max(f._modified_ns for f in files))
+
+
+def test_batch_keeps_name_index_across_trees():
+    root = build_sample_tree()
+    other = Directory("other")
+    assert root.find("guide.txt") is not None and other.find("guide.txt") is None
+    with root.batch():
+        docs = root.find("docs")
+        docs.add(File("early.txt", 1))
+        root.move("docs", other)
+        # the batch's cached roots must follow the move
+        docs.add(File("late.txt", 2))
+        other.find("docs").add(Directory("sub"))
+        other.find("sub").add(File("deep.txt", 3))
+    assert [root.find(n) for n in ("guide.txt", "early.txt", "late.txt")] == [None] * 3
+    assert other.find("late.txt").parent is docs
+    assert other.find("deep.txt").path() == "other/docs/sub/deep.txt"
+    assert other.size() == 156 and root.size() == 2000
+
+
+def test_batch_settles_after_error():
+    root = build_sample_tree()
+    try:
+        with root.batch():
+            root.find("img").add(File("extra.png", 500))
+            raise RuntimeError("import failed")
+    except RuntimeError:
+        pass
+    assert root.size() == 2650
+
+
+def _make_disk_tree(base: str) -> None:
+    os.makedirs(os.path.join(base, "docs", "drafts"))
+    os.makedirs(os.path.join(base, "img"))
+    os.makedirs(os.path.join(base, ".git"))
+    for rel, size in [("docs/readme.md", 100), ("docs/drafts/todo.txt", 7),
+                      ("img/logo.png", 2000), (".git/HEAD", 20), ("notes.tmp", 3)]:
+        with open(os.path.join(base, rel), "wb") as fh:
+            fh.write(b"x" * size)
+
+
+def test_from_filesystem_mirrors_disk():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "project")
+        _make_disk_tree(base)
+        os.symlink(os.path.join(base, "docs"), os.path.join(base, "docs-link"))
+        root = Directory.from_filesystem(base, workers=4, ignore=[".git", "*.tmp"])
+        assert root.name == "project"
+        assert sorted(root.list_paths()) == [
+            "project/docs/drafts/todo.txt",
+            "project/docs/readme.md",
+            "project/img/logo.png",
+        ]
+        assert root.size() == 2107
+        logo = root.find_by_path("img/logo.png")
+        assert logo.modified_at == datetime.fromtimestamp(
+            os.stat(os.path.join(base, "img", "logo.png")).st_mtime_ns / 1e9)
+        drafts_mtime = os.stat(os.path.join(base, "docs", "drafts")).st_mtime_ns
+        assert root.find_by_path("docs/drafts")._modified_ns == drafts_mtime
+
+        followed = Directory.from_filesystem(base, follow_symlinks=True, ignore=[".git"])
+        assert followed.size() == 2110
+        # docs and docs-link are the same directory, so only one is entered
+        assert len(followed.find_all("readme.md")) == 1
+
+
+def test_sync_applies_disk_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "project")
+        _make_disk_tree(base)
+        root = Directory.from_filesystem(base)
+        assert not root.sync(base, check_files=True)
+
+        with open(os.path.join(base, "docs", "drafts", "todo.txt"), "ab") as fh:
+            fh.write(b"more")
+        os.remove(os.path.join(base, "img", "logo.png"))
+        os.makedirs(os.path.join(base, "img", "icons"))
+        with open(os.path.join(base, "img", "icons", "a.png"), "wb") as fh:
+            fh.write(b"x" * 5)
+        changes = root.sync(base, check_files=True)
+        assert changes.added == ["project/img/icons"]
+        assert changes.removed == ["project/img/logo.png"]
+        assert changes.modified == ["project/docs/drafts/todo.txt"]
+        assert root.find_by_path("docs/drafts/todo.txt").size() == 11
+        assert root.find_by_path("img").size() == 5
+        assert root.size() == 139
+        assert root.find_by_path("img")._modified_ns == os.stat(
+            os.path.join(base, "img")).st_mtime_ns
+        assert not root.sync(base, check_files=True)
+
+
+def test_watcher_applies_events():
+    if not sys.platform.startswith("linux"):
+        return
+    from src.watch import Watcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "project")
+        _make_disk_tree(base)
+        root = Directory.from_filesystem(base)
+        with Watcher(root, base) as watcher:
+            with open(os.path.join(base, "docs", "new.txt"), "wb") as fh:
+                fh.write(b"x" * 9)
+            os.makedirs(os.path.join(base, "img", "icons"))
+            changes = watcher.poll(timeout=2)
+            while watcher.poll(timeout=0.2):
+                pass
+            assert "project/docs/new.txt" in changes.added
+            assert root.find_by_path("docs/new.txt").size() == 9
+            assert root.find_by_path("img/icons") is not None
+            # the new directory is watched as well
+            with open(os.path.join(base, "img", "icons", "b.png"), "wb") as fh:
+                fh.write(b"x" * 4)
+            changes = watcher.poll(timeout=2)
+            assert changes.added == ["project/img/icons/b.png"]
+            assert root.find_by_path("img").size() == 2004
+
+
+def build_linked_tree() -> Directory:
+    root = build_sample_tree()
+    docs = root.find("docs")
+    img = root.find("img")
+    img.add(Link("docs-link", docs))
+    img.add(Link("also-docs", docs))
+    docs.add(Link("up", root))
+    docs.add(Link("readme-link", root.find("readme.md")))
+    return root
+
+
+def test_link_sizes_are_cycle_safe():
+    root = build_linked_tree()
+    assert root.size() == 2150
+    assert root.link_count() == 4 and root.file_count() == 3
+    # per reference: docs twice through img, readme once more, "up" closes a cycle
+    assert root.size(follow_links=True) == 2150 + 2 * 250 + 100
+    assert root.size(follow_links=True, count_links="once") == 2150
+    assert root.find("img").size(follow_links=True, count_links="once") == 2150
+    assert root.find("readme-link").size(follow_links=True) == 100
+    assert root.find("readme-link").size() == 0
+    # through "up", docs reaches the whole tree
+    assert root.find("docs-link").size(follow_links=True, count_links="once") == 2150
+    try:
+        root.size(follow_links=True, count_links="twice")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown count_links mode accepted")
+
+
+def test_link_paths_and_tree():
+    root = build_linked_tree()
+    assert "root/img/docs-link" in root.list_paths()
+    followed = root.list_paths(follow_links=True)
+    assert "root/img/docs-link/guide.txt" in followed
+    assert "root/img/also-docs/readme-link" in followed
+    # the link back to root is listed, not expanded
+    assert "root/docs/up" in followed
+    assert "root/img/docs-link/up" in followed
+    assert len(followed) == len(set(followed)) == 13
+    assert "    docs-link -> root/docs" in root.tree().splitlines()
+    assert root.find("readme-link").resolve() is root.find("readme.md")
+
+
+def test_links_survive_serialization():
+    root = build_linked_tree()
+    rebuilt = Directory.from_dict(root.to_dict())
+    assert rebuilt.find("docs-link").target is rebuilt.find("docs")
+    assert rebuilt.link_count() == 4
+    assert rebuilt.size(follow_links=True) == root.size(follow_links=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.fsnp")
+        root.save(path)
+        loaded = Directory.load(path)
+        assert loaded.find("up").target is loaded
+        assert loaded.size(follow_links=True) == root.size(follow_links=True)
+        lazy = Directory.load(path, lazy=True, max_loaded=2)
+        assert lazy.find_by_path("img/docs-link").target.name == "docs"
+        assert sorted(lazy.list_paths(follow_links=True)) == sorted(
+            root.list_paths(follow_links=True))
+        lazy.close()
+
+
+def build_report_tree() -> Directory:
+    root = Directory("root", owner="root")
+    for team, owner in [("alpha", "alice"), ("beta", "bob")]:
+        team_dir = Directory(team, owner=owner)
+        root.add(team_dir)
+        for i in range(1, 6):
+            team_dir.add(File(f"{team}_{i}.bin", i * 100, owner=owner))
+    root.find("beta").add(Directory("archive", owner="bob"))
+    root.find("archive").add(File("old.tar", 5000, owner="bob"))
+    return root
+
+
+def test_query_filters_and_ordering():
+    root = build_report_tree()
+    assert root.query().size(min=400).owner("alice").paths() == [
+        "root/alpha/alpha_4.bin", "root/alpha/alpha_5.bin",
+    ]
+    biggest = root.query().order_by("size", descending=True).limit(3).run()
+    assert [n.size() for n in biggest] == [5000, 500, 500]
+    assert root.query().name("*_1.bin").count() == 2
+    assert root.query().regex(r"^beta_[12]").count() == 2
+    assert root.query().depth(max=2).count() == 10
+    assert [n.name for n in root.query().kind("dir").depth(min=1).run()] == [
+        "alpha", "beta", "archive",
+    ]
+    assert root.query().where(lambda n: n.size() % 200 == 0).count() == 5
+
+
+def test_query_prunes_with_cached_stats():
+    root = build_report_tree()
+    alpha = root.find("alpha")
+    visited = []
+    query = root.query().size(min=1000).where(lambda n: visited.append(n.name) or True)
+    assert [n.name for n in query.run()] == ["old.tar"]
+    # alpha and beta's own files were never even offered to the predicate
+    assert visited == ["old.tar"]
+    assert alpha._subtree_stats()[0] == 500
+    alpha.find("alpha_5.bin").modify(50)
+    assert alpha._max_file_size is None
+    assert alpha._subtree_stats()[0] == 400
+    alpha.add(File("huge.iso", 9000))
+    assert root.query().size(min=1000).count() == 2
+    root.find("old.tar").modify(1)
+    assert root._subtree_stats()[0] == 9000
+
+    stamp = datetime.now()
+    root.find("beta_2.bin").modify(201)
+    recent = root.query().modified(after=stamp).run()
+    assert [n.name for n in recent] == ["beta_2.bin"]
+    assert root.query().modified(after=datetime.now() + timedelta(days=1)).count() == 0
+
+
+def test_reports_and_filtered_tree():
+    root = build_report_tree()
+    assert [f.name for f in root.top_files(3)] == ["old.tar", "beta_5.bin", "alpha_5.bin"]
+    assert len(root.top_files(100)) == 11
+    assert [d.name for d in root.top_dirs(2)] == ["beta", "archive"]
+    assert root.usage_by_owner() == {"bob": 6500, "alice": 1500}
+    root.find("alpha_1.bin").modify(8000)
+    assert root.top_files(1)[0].name == "alpha_1.bin"
+    assert root.top_dirs(1)[0].name == "alpha"
+
+    shallow = root.tree(max_depth=1)
+    assert "alpha/" in shallow and "alpha_1.bin" not in shallow
+    big = root.tree(min_size=1000).splitlines()
+    assert big == [
+        "root/ (15900 B)",
+        "  alpha/ (9400 B)",
+        "    alpha_1.bin (8000 B)",
+        "  beta/ (6500 B)",
+        "    archive/ (5000 B)",
+        "      old.tar (5000 B)",
+    ]
+    assert root.tree(max_depth=0) == "root/ (15900 B)"
+
+
+def test_move_between_directories():
+    root = build_report_tree()
+    archive = root.find("archive")
+    assert root.move("alpha_2.bin", archive).parent is archive
+    assert root.find("alpha").size() == 1300
+    assert archive.size() == 5200 and root.size() == 8000
+    assert root.move("missing", archive) is None
+    root.find("alpha").add(File("old.tar", 1))
+    try:
+        root.find("alpha").move("old.tar", archive)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert root.find("alpha").size() == 1301 and root.size() == 8001
+
+
+def test_opposite_moves_between_locked_trees():
+    left, right = Directory("left"), Directory("right")
+    left.enable_locking()
+    right.enable_locking()
+    for i in range(50):
+        left.add(File(f"l{i}", 1))
+        right.add(File(f"r{i}", 1))
+
+    def shuttle(source, target, prefix):
+        for _ in range(20):
+            for i in range(50):
+                source.move(f"{prefix}{i}", target)
+            for i in range(50):
+                target.move(f"{prefix}{i}", source)
+
+    workers = [threading.Thread(target=shuttle, args=(left, right, "l"), daemon=True),
+               threading.Thread(target=shuttle, args=(right, left, "r"), daemon=True)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert not any(worker.is_alive() for worker in workers), "moves deadlocked"
+    assert left.size() == right.size() == 50
+
+
+def test_readers_do_not_block_each_other():
+    root = build_report_tree()
+    root.enable_locking()
+    readers = 4
+    barrier = threading.Barrier(readers, timeout=5)
+    results = []
+
+    def reader():
+        with root.reading():
+            # every reader is inside the read lock at once, or this times out
+            barrier.wait()
+            results.append((root.size(), len(root.list_paths()), root.find("old.tar").name))
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not barrier.broken
+    assert results == [(6500 + 1500, 11, "old.tar")] * readers
+
+    # a writer waits for the readers to leave
+    released = threading.Event()
+    wrote = []
+
+    def writer():
+        root.add(File("late.txt", 7))
+        wrote.append(released.is_set())
+
+    with root.reading():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+        released.set()
+    thread.join()
+    assert wrote == [True]
+    with root.reading():
+        try:
+            root.add(File("upgrade.txt"))
+            assert False, "expected RuntimeError"
+        except RuntimeError:
+            pass
+
+
+def test_locked_tree_survives_concurrent_writers():
+    root = Directory("root")
+    root.enable_locking()
+    bins = [Directory(f"bin{i}") for i in range(4)]
+    root.add_many(bins)
+
+    def churn(worker):
+        for step in range(200):
+            name = f"w{worker}_{step}.dat"
+            bins[step % 4].add(File(name, step))
+            if step % 3 == 0:
+                bins[step % 4].move(name, bins[(step + 1) % 4])
+            if step % 5 == 0:
+                root.remove(name)
+            root.size()
+            root.top_files(3)
+
+    threads = [threading.Thread(target=churn, args=(w,)) for w in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    files = [n for n in root.query().run()]
+    assert root.file_count() == len(files) == 6 * (200 - 40)
+    assert root.size() == sum(f.size_bytes for f in files)
+    assert all(b.size() == sum(f.size_bytes for f in b.children) for b in bins)
+
+
+def test_snapshots_keep_old_state():
+    from src import versions
+    from src.snapshot import diff
+
+    root = build_report_tree()
+    before_dict = root.to_dict()
+    snap = root.snapshot()
+    alpha = root.find("alpha")
+    alpha.find("alpha_1.bin").modify(1000)
+    root.find("beta").remove("archive")
+    alpha.add(File("new.txt", 5))
+    root.find("beta_5.bin").rename("beta_five.bin")
+    assert snap.to_dict() == before_dict
+    assert snap.size() == 8000 and root.size() == 8000 - 5000 + 900 + 5
+    assert snap.find_by_path("beta/archive/old.tar").size() == 5000
+    assert snap.find_by_path("beta/archive/old.tar").path() == "root/beta/archive/old.tar"
+    assert "root/alpha/new.txt" not in snap.list_paths()
+
+    later = root.snapshot()
+    assert later.to_dict() == root.to_dict()
+    changes = diff(snap, later)
+    assert changes.added == ["root/alpha/new.txt", "root/beta/beta_five.bin"]
+    assert sorted(changes.removed) == ["root/beta/archive", "root/beta/beta_5.bin"]
+    assert changes.modified == ["root/alpha/alpha_1.bin"]
+
+    # an untouched subtree is skipped without being opened
+    root.add(Directory("gamma"))
+    root.find("gamma").add(File("g.txt", 1))
+    third = root.snapshot()
+    root.find("g.txt").modify(2)
+    fourth = root.snapshot()
+    assert not versions.changed_between(alpha, third._snapshot.epoch, fourth._snapshot.epoch)
+    assert diff(third, fourth).modified == ["root/gamma/g.txt"]
+    assert not diff(fourth, root.snapshot())
+
+    for view in (snap, later, third, fourth):
+        view.release()
+    try:
+        snap.size() and snap.children
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    import gc
+    gc.collect()
+    assert not versions.recording and not versions._history
+
+
+def test_instrumentation_counts_and_exports():
+    from src import instrument
+
+    root = build_report_tree()
+    instrument.reset()
+    instrument.enable()
+    try:
+        assert root.size() == 8000
+        alpha = root.find("alpha")
+        assert alpha.find("alpha_1.bin").size() == 100
+        assert len(root.list_paths()) == 11
+    finally:
+        instrument.disable()
+    root.size()  # not recorded once disabled
+
+    report = instrument.report()
+    assert report["timers"]["size"]["calls"] == 1
+    assert report["timers"]["find"]["calls"] == 2
+    assert report["timers"]["list_paths"]["calls"] == 1
+    assert report["counters"] == {"size.visits": 1, "find.visits": 2, "list_paths.paths": 11}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "metrics.json")
+        trace_path = os.path.join(tmp, "trace.json")
+        instrument.write_json(json_path)
+        instrument.write_chrome_trace(trace_path)
+        with open(json_path, encoding="utf-8") as f:
+            assert json.load(f)["counters"]["list_paths.paths"] == 11
+        with open(trace_path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+    assert sorted(e["name"] for e in events if e["ph"] == "X") == [
+        "find", "find", "list_paths", "size",
+    ]
+    instrument.reset()
+    assert instrument.report() == {"counters": {}, "timers": {}}
+
+
 def run_all():
     test_modified_at_updates_on_add()
     test_list_paths_returns_all_paths()
@@ -90,6 +898,45 @@ def run_all():
     test_to_dict_recursive()
     test_find_and_remove()
     test_file_modify_updates_size_and_mtime()
+    test_size_cache_follows_mutations()
+    test_add_reparents_node()
+    test_add_rejects_duplicate_names()
+    test_find_by_path()
+    test_resolve_many_matches_find_by_path()
+    test_name_index_tracks_mutations()
+    test_find_results_follow_tree_order()
+    test_glob_queries()
+    test_add_rejects_cycles()
+    test_tree_layout()
+    test_iterators_handle_deep_trees()
+    test_nodes_are_compact()
+    test_columnar_store_matches_objects()
+    test_columnar_store_mutations()
+    test_columnar_paths_follow_tree_order()
+    test_columnar_aggregates_follow_mutations()
+    test_snapshot_round_trip()
+    test_from_dict_and_streaming_json()
+    test_lazy_load_materializes_on_demand()
+    test_lazy_eviction_detaches_held_nodes()
+    test_batch_defers_and_settles_aggregates()
+    test_batch_defers_subtree_stats()
+    test_batch_keeps_name_index_across_trees()
+    test_batch_settles_after_error()
+    test_from_filesystem_mirrors_disk()
+    test_sync_applies_disk_changes()
+    test_watcher_applies_events()
+    test_link_sizes_are_cycle_safe()
+    test_link_paths_and_tree()
+    test_links_survive_serialization()
+    test_query_filters_and_ordering()
+    test_query_prunes_with_cached_stats()
+    test_reports_and_filtered_tree()
+    test_move_between_directories()
+    test_opposite_moves_between_locked_trees()
+    test_readers_do_not_block_each_other()
+    test_locked_tree_survives_concurrent_writers()
+    test_snapshots_keep_old_state()
+    test_instrumentation_counts_and_exports()
     print("All tests passed.")
 
 